@@ -1,7 +1,7 @@
 '''Basic CustomVariable class object tests.
 '''
 import unittest
-from custom_variable_sets import IntegerV
+from custom_variable_sets import IntegerV, CustomVariableSet
 from custom_variable_sets import NotValidError, UpdateError, UnMatchedValuesError
 
 
@@ -359,5 +359,63 @@ class TestIntegerV(unittest.TestCase):
         self.assertEqual(int_var.disp(), display)
 
 
+class TestIntegerCoercer(unittest.TestCase):
+    '''Test the compiled IntegerV validation and conversion function.
+    '''
+    def test_coercer_rebuilt(self):
+        '''Verify that changing a limit rebuilds the coercer.
+        '''
+        int_var = IntegerV(5, max_value=10)
+        int_var.value = 10
+        int_var.max_value = 20
+        int_var.value = 15
+        self.assertEqual(int_var.value, 15)
+        int_var.min_value = 12
+        with self.assertRaises(NotValidError):
+            int_var.value = 11
+
+    def test_value_set_rebuilt(self):
+        '''Verify that adding to the value set rebuilds the coercer.
+        '''
+        int_var = IntegerV(value_set=[1, 2])
+        int_var.value = '2'
+        with self.assertRaises(NotValidError):
+            int_var.value = 3
+        int_var.add_items(3)
+        int_var.value = 3.0
+        self.assertEqual(int_var.value, 3)
+
+    def test_message_on_failure(self):
+        '''Verify that the error message uses the variable's name.
+        '''
+        int_var = IntegerV(name='count', max_value=10)
+        with self.assertRaisesRegex(NotValidError, '11 is greater'):
+            int_var.value = 11
+        with self.assertRaisesRegex(NotValidError, 'invalid value for count'):
+            int_var.value = 'x'
+
+    def test_shared_coercer(self):
+        '''Verify that variable sets of the same class share coercers.
+        '''
+        class IntegerSet(CustomVariableSet):
+            '''A CustomVariableSet with one IntegerV variable.
+            '''
+            variable_definitions = [
+                {'name': 'count', 'variable_type': IntegerV,
+                 'max_value': 10, 'default': 0}]
+        set1 = IntegerSet()
+        set2 = IntegerSet()
+        self.assertIs(set1['count'].get_coercer(),
+                      set2['count'].get_coercer())
+        set1.set_values(count='4')
+        self.assertEqual(set1['count'].value, 4)
+        with self.assertRaises(NotValidError):
+            set2.set_values(count=11)
+        set2['count'].max_value = 20
+        set2.set_values(count=11)
+        self.assertIsNot(set1['count'].get_coercer(),
+                         set2['count'].get_coercer())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -21,7 +21,7 @@ PathP tests
 
 import unittest
 from pathlib import Path
-from custom_variable_sets import PathV
+from custom_variable_sets import PathV, CustomVariableSet
 from custom_variable_sets import NotValidError, UpdateError
 from file_utilities import FileTypeError
 from Testing.test_files_setup import build_test_directory, remove_test_dir
@@ -142,6 +142,65 @@ class TestPathVTypeCheck(unittest.TestCase):
         self.assertEqual(self.path_param, text_file)
 
 
+class PathSet(CustomVariableSet):
+    '''A CustomVariableSet with several PathV variables.
+    '''
+    variable_definitions = [
+        {'name': 'text_path', 'variable_type': PathV,
+         'file_types': 'All Files', 'default': 'test_file.txt',
+         'base_directory': Path.cwd() / 'Testing' / 'test folder'},
+        {'name': 'log_path', 'variable_type': PathV,
+         'file_types': 'All Files', 'default': 'test.log',
+         'base_directory': Path.cwd() / 'Testing' / 'test folder'},
+        {'name': 'excel_path', 'variable_type': PathV,
+         'file_types': 'Excel Files', 'default': 'test_excel.xls',
+         'base_directory': Path.cwd() / 'Testing' / 'test folder'}
+        ]
+
+
+class TestPathVBatchCheck(unittest.TestCase):
+    '''Test reuse of path checks and batch checks in a CustomVariableSet.
+    '''
+    def setUp(self):
+        '''Make txt and xls files.'''
+        self.files = build_test_directory()
+        self.path_param = PathV(file_types='Text File')
+
+    def tearDown(self):
+        '''Remove the test directory.'''
+        remove_test_dir(self.files)
+
+    def test_check_reused(self):
+        '''Verify that set_value uses the result of check_validity.
+        '''
+        text_file = self.files['text_file']
+        self.assertTrue(self.path_param.check_validity(str(text_file)))
+        self.path_param.value = str(text_file)
+        self.assertEqual(self.path_param.value, text_file)
+        self.assertIsNone(self.path_param.take_check(str(text_file)))
+
+    def test_check_not_reused(self):
+        '''Verify that a check is not reused after the file types change.
+        '''
+        dir_path = self.files['test_dir']
+        self.assertFalse(self.path_param.check_validity(dir_path))
+        self.path_param.file_types = 'directory'
+        self.assertIsNone(self.path_param.take_check(dir_path))
+        self.path_param.value = dir_path
+        self.assertEqual(self.path_param.value, dir_path)
+
+    def test_set_batch(self):
+        '''Verify that PathV values in a set are checked together.
+        '''
+        path_set = PathSet()
+        path_set.set_values(text_path='test.log', log_path='test_file.txt')
+        self.assertEqual(path_set['text_path'].value, self.files['log_file'])
+        self.assertEqual(path_set['log_path'].value, self.files['text_file'])
+        with self.assertRaises(FileTypeError):
+            path_set.set_values(text_path='test.log',
+                                excel_path='test_file.txt')
+
+
 class FutureTests(unittest.TestCase):
     '''Tests of future functionality.
     '''
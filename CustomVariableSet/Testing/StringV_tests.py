@@ -1,7 +1,7 @@
 '''StringV CustomVariable class object tests.
 '''
 import unittest
-from custom_variable_sets import StringV
+from custom_variable_sets import StringV, LazyMessage
 from custom_variable_sets import NotValidError, UpdateError, UnMatchedValuesError
 
 
@@ -223,5 +223,91 @@ class TestStringV(unittest.TestCase):
         self.assertEqual(string_var.disp(), display)
 
 
+class TestSlottedStringV(unittest.TestCase):
+    '''Test the slotted StringV attribute and message storage.
+    '''
+    def test_no_instance_dict(self):
+        '''Verify that StringV instances do not have a __dict__.
+        '''
+        string_var = StringV('Test String')
+        self.assertFalse(hasattr(string_var, '__dict__'))
+
+    def test_shared_messages(self):
+        '''Verify that message templates are shared until overridden.
+        '''
+        string_var1 = StringV('Test String')
+        string_var2 = StringV('Other String')
+        self.assertIs(string_var1._messages, string_var2._messages)
+        string_var2.update_messages({'too_long': '{new_value} is too long.'})
+        self.assertIsNot(string_var1._messages, string_var2._messages)
+        self.assertNotEqual(string_var1._messages['too_long'],
+                            string_var2._messages['too_long'])
+
+    def test_custom_message(self):
+        '''Verify that messages passed at init override the templates.
+        '''
+        string_var = StringV(max_length=3,
+                             messages={'too_long': '{new_value} is too long.'})
+        with self.assertRaisesRegex(NotValidError, 'abcd is too long.'):
+            string_var.value = 'abcd'
+        self.assertTrue(StringV('a')._messages['too_long'].startswith(
+            '{new_value} is longer'))
+
+    def test_extra_attributes(self):
+        '''Verify that attributes not in __slots__ can still be set by
+        keyword and used in messages.
+        '''
+        string_var = StringV('Test String', units='mm',
+                             messages={'units': 'Units are {units}'})
+        self.assertEqual(string_var.units, 'mm')
+        self.assertEqual(string_var.build_message('units'), 'Units are mm')
+        string_var.set_attributes(units='cm')
+        self.assertEqual(string_var.units, 'cm')
+        with self.assertRaises(AttributeError):
+            string_var.not_an_attribute
+
+    def test_read_only_property(self):
+        '''Verify that read-only properties can not be set.
+        '''
+        string_var = StringV('Test String')
+        with self.assertRaises(AttributeError):
+            string_var.name = 'new name'
+
+
+class TestLazyMessage(unittest.TestCase):
+    '''Test the error messages formatted on demand.
+    '''
+    def test_lazy_error(self):
+        '''Verify that the error holds an unformatted message with only the
+        fields used by the template.
+        '''
+        string_var = StringV('abc', name='test', value_set=['abc', 'def'])
+        with self.assertRaises(NotValidError) as context:
+            string_var.value = 'xyz'
+        message = context.exception.args[0]
+        self.assertIsInstance(message, LazyMessage)
+        self.assertSetEqual(set(message.values),
+                            {'new_value', 'name', 'value_set'})
+        self.assertTrue(str(context.exception).startswith(
+            'xyz is an invalid value for test.'))
+
+    def test_captured_values(self):
+        '''Verify that the message is not changed by later updates.
+        '''
+        string_var = StringV('abc', value_set=['abc'])
+        with self.assertRaises(NotValidError) as context:
+            string_var.value = 'def'
+        string_var.add_item('def')
+        self.assertNotIn('def', str(context.exception).rsplit(':', 1)[-1])
+
+    def test_no_added_attributes(self):
+        '''Verify that building a message does not add attributes.
+        '''
+        string_var = StringV('abc', max_length=5)
+        attributes = string_var.attribute_dict()
+        string_var.build_message('too_long', new_value='abcdef')
+        self.assertDictEqual(attributes, string_var.attribute_dict())
+
+
 if __name__ == '__main__':
     unittest.main()
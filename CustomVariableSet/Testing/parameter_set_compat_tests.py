@@ -0,0 +1,69 @@
+'''ParameterSet compatibility with CustomVariableSet.
+    i. Verify that the Parameter classes are the CustomVariable classes.
+    ii. Define a ParameterSet with parameter_definitions
+        - verify that 'parameter_type' definitions create parameters
+        - verify that 'parameter' definitions use the existing parameter
+        - verify that values are set and checked
+    iii. Verify that the Parameter exceptions are the CustomVariable
+        exceptions.
+'''
+import unittest
+from custom_variable_sets import CustomVariable, StringV, IntegerV
+from custom_variable_sets import CustomVariableSet, NoVariableError
+from parameters import Parameter, StringP, IntegerP, ParameterSet
+from parameters import NotValidError, NoParameterError, NotParameterError
+
+
+class TestParameterSet(ParameterSet):
+    '''A ParameterSet defined with parameter_definitions.
+    '''
+    parameter_definitions = [
+        {'name': 'text', 'parameter_type': StringP, 'default': 'abc'},
+        {'parameter': IntegerP(name='count', max_value=10, default=1)}
+        ]
+
+
+class TestParameterCompatibility(unittest.TestCase):
+    '''Test the Parameter names for the CustomVariable classes.
+    '''
+    def setUp(self):
+        self.parameter_set = TestParameterSet(text='xyz')
+
+    def test_classes(self):
+        '''Verify that the Parameter classes are CustomVariable classes.
+        '''
+        self.assertIs(Parameter, CustomVariable)
+        self.assertIs(StringP, StringV)
+        self.assertIs(IntegerP, IntegerV)
+        self.assertIsInstance(self.parameter_set, CustomVariableSet)
+
+    def test_definitions(self):
+        '''Verify that parameter_definitions create the parameters.
+        '''
+        self.assertListEqual(list(self.parameter_set.keys()),
+                             ['text', 'count'])
+        self.assertIsInstance(self.parameter_set['count'], IntegerV)
+        self.assertDictEqual(self.parameter_set.to_dict(),
+                             {'text': 'xyz', 'count': 1})
+
+    def test_set_values(self):
+        '''Verify that parameter values are checked.
+        '''
+        self.parameter_set.set_values(count='5')
+        self.assertEqual(self.parameter_set.get_values('count'), 5)
+        with self.assertRaises(NotValidError):
+            self.parameter_set.set_values(count=11)
+        with self.assertRaises(NotParameterError):
+            self.parameter_set.set_values(other=1)
+
+    def test_exceptions(self):
+        '''Verify that the Parameter exceptions are the CustomVariable
+        exceptions.
+        '''
+        self.assertIs(NoParameterError, NoVariableError)
+        with self.assertRaises(NoParameterError):
+            self.parameter_set.get_values('other')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+'''ValueIndex tests.
+    i. IntegerIndex
+        - verify that values are stored as merged intervals
+        - verify scalar and vectorised membership, with and without a bitmap
+        - verify union and without
+        - verify that invalid items are rejected
+    ii. StringIndex
+        - verify scalar and vectorised membership
+        - verify that invalid items are rejected
+    iii. Shared indexes
+        - verify that variables defined with the same tuple share an index
+        - verify that adding an item does not change the shared index
+'''
+import unittest
+import numpy as np
+import pandas as pd
+import custom_variable_sets
+from custom_variable_sets import IntegerIndex, StringIndex, value_index
+from custom_variable_sets import IntegerV, StringV, NotValidError
+
+
+class TestIntegerIndex(unittest.TestCase):
+    '''Test the interval based integer index.
+    '''
+    def setUp(self):
+        self.items = [1, 2, 3, 7, 9, 10, 5, 2]
+        self.index = IntegerIndex(self.items)
+
+    def test_intervals(self):
+        '''Verify that the items are merged into intervals.
+        '''
+        self.assertListEqual(self.index.starts.tolist(), [1, 5, 7, 9])
+        self.assertListEqual(self.index.ends.tolist(), [3, 5, 7, 10])
+        self.assertEqual(len(self.index), 7)
+        self.assertSetEqual(self.index, set(self.items))
+
+    def test_from_ranges(self):
+        '''Verify that overlapping ranges are merged.
+        '''
+        index = IntegerIndex.from_ranges([(10, 20), (1, 5), (6, 8), (15, 30)])
+        self.assertListEqual(index.starts.tolist(), [1, 10])
+        self.assertListEqual(index.ends.tolist(), [8, 30])
+        self.assertEqual(len(IntegerIndex(range(0, 10**9))), 10**9)
+
+    def test_contains(self):
+        '''Verify scalar membership.
+        '''
+        for value in range(12):
+            self.assertEqual(value in self.index, value in self.items)
+        self.assertIn(7.0, self.index)
+        self.assertNotIn(7.5, self.index)
+        self.assertNotIn('7', self.index)
+
+    def test_vectorised(self):
+        '''Verify that vectorised membership matches scalar membership,
+        with a bitmap and with a binary search.
+        '''
+        values = [0, 1, 4, 5, 7.0, 7.5, 10, 11, np.nan, None]
+        expected = [False, True, False, True, True, False, True, False,
+                    False, False]
+        self.assertListEqual(self.index.contains(values).tolist(), expected)
+        original_span = custom_variable_sets.BITMAP_SPAN
+        custom_variable_sets.BITMAP_SPAN = 0
+        try:
+            index = IntegerIndex(self.items)
+            self.assertIsNone(index.bitmap())
+            self.assertListEqual(index.contains(values).tolist(), expected)
+        finally:
+            custom_variable_sets.BITMAP_SPAN = original_span
+
+    def test_union_without(self):
+        '''Verify that union and without return new indexes.
+        '''
+        larger = self.index.union([4, 6, 8])
+        self.assertListEqual(larger.starts.tolist(), [1])
+        self.assertListEqual(larger.ends.tolist(), [10])
+        smaller = larger.without(5)
+        self.assertListEqual(smaller.starts.tolist(), [1, 6])
+        self.assertListEqual(smaller.ends.tolist(), [4, 10])
+        self.assertEqual(len(self.index), 7)
+
+    def test_invalid_item(self):
+        '''Verify that non-integer items raise TypeError.
+        '''
+        with self.assertRaises(TypeError):
+            IntegerIndex([1, 'two'])
+        with self.assertRaises(TypeError):
+            IntegerIndex([1, 2.5])
+
+
+class TestStringIndex(unittest.TestCase):
+    '''Test the hashed string index.
+    '''
+    def setUp(self):
+        self.index = StringIndex(['a', 'b', 'c'])
+
+    def test_contains(self):
+        '''Verify scalar and vectorised membership.
+        '''
+        self.assertIn('a', self.index)
+        self.assertNotIn('d', self.index)
+        values = pd.Series(['a', 'd', 5, None, 'c'])
+        self.assertListEqual(self.index.contains(values).tolist(),
+                             [True, False, False, False, True])
+
+    def test_invalid_item(self):
+        '''Verify that non-string items raise TypeError.
+        '''
+        with self.assertRaises(TypeError):
+            StringIndex(['a', 1])
+
+
+class TestSharedIndex(unittest.TestCase):
+    '''Test sharing one index between variables.
+    '''
+    def setUp(self):
+        self.structure_ids = tuple(range(0, 50000, 3))
+
+    def test_shared(self):
+        '''Verify that variables defined with the same tuple share an index.
+        '''
+        first = IntegerV(value_set=self.structure_ids)
+        second = IntegerV(value_set=self.structure_ids)
+        self.assertIs(first.value_set, second.value_set)
+        self.assertIs(value_index(self.structure_ids, IntegerIndex),
+                      first.value_set)
+
+    def test_add_item_copies(self):
+        '''Verify that adding an item does not change the shared index.
+        '''
+        first = IntegerV(value_set=self.structure_ids)
+        second = IntegerV(value_set=self.structure_ids)
+        first.add_items(1)
+        first.value = 1
+        with self.assertRaises(NotValidError):
+            second.value = 1
+
+    def test_invalid_item(self):
+        '''Verify that invalid items raise NotValidError.
+        '''
+        with self.assertRaises(NotValidError):
+            StringV(value_set=('a', 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -25,10 +25,18 @@ Make subclass of CustomVariable that accepts a string
                 - verify that value is returned
                 - verify that the CustomVariableSet instance includes dictionary
                     entries for the non-CustomVariable arguments.
+            v. Shared schema
+                - verify that the schema is built once for the class
+                - verify that each set has its own CustomVariables
+                - verify that instance variable definitions do not change
+                    the class variable definitions
+                - verify that the schema is rebuilt when a definition is
+                    changed in place
 '''
 import unittest
 from custom_variable_sets import StringV, CustomVariableSet
 from custom_variable_sets import NotValidError, UpdateError, UnMatchedValuesError
+from custom_variable_sets import IntegerV
 
 
 class OneStringV(CustomVariableSet):
@@ -238,5 +246,60 @@ class TestWithinvalidValues(unittest.TestCase):
             OneStringV(**test_string1_initial)
 
 
+class TestSharedSchema(unittest.TestCase):
+    '''Test the class schema shared by CustomVariableSet instances.
+    '''
+    def test_schema_cached(self):
+        '''Verify that the schema is built once for the class.
+        '''
+        first_set = OneStringV()
+        OneStringV()
+        self.assertIs(OneStringV.schema(), OneStringV.schema())
+        self.assertIsNot(first_set['test_string1'],
+                         OneStringV.schema().prototypes[0])
+
+    def test_independent_values(self):
+        '''Verify that each set has its own CustomVariables.
+        '''
+        first_set = OneStringV(test_string1='first')
+        second_set = OneStringV()
+        self.assertEqual(first_set['test_string1'].value, 'first')
+        self.assertEqual(second_set['test_string1'].value, 'string1 default')
+        self.assertIs(first_set['test_string1'].get_coercer(),
+                      second_set['test_string1'].get_coercer())
+
+    def test_instance_definitions(self):
+        '''Verify that instance variable definitions do not change the
+        class variable definitions.
+        '''
+        extra = [{'name': 'count', 'variable_type': IntegerV, 'default': 1}]
+        for _ in range(3):
+            extended_set = OneStringV(extra)
+        self.assertListEqual(list(extended_set.keys()),
+                             ['test_string1', 'count'])
+        self.assertEqual(len(OneStringV.variable_definitions), 1)
+        self.assertListEqual(list(OneStringV().keys()), ['test_string1'])
+
+    def test_edited_definitions(self):
+        '''Verify that changing a definition in place rebuilds the schema.
+        '''
+        class EditedSet(CustomVariableSet):
+            variable_definitions = [
+                {'name': 'count', 'variable_type': IntegerV, 'default': 1,
+                 'value_set': [1, 2]}]
+
+        self.assertEqual(EditedSet()['count'].value, 1)
+        schema = EditedSet.schema()
+        with self.assertRaises(TypeError):
+            schema.definitions[0]['default'] = 2
+        EditedSet.variable_definitions[0]['default'] = 2
+        self.assertEqual(EditedSet()['count'].value, 2)
+        with self.assertRaises(NotValidError):
+            EditedSet(count=3)
+        EditedSet.variable_definitions[0]['value_set'].append(3)
+        self.assertEqual(EditedSet(count=3)['count'].value, 3)
+        self.assertIsNot(EditedSet.schema(), schema)
+
+
 if __name__ == '__main__':
     unittest.main()
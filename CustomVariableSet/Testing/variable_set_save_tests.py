@@ -0,0 +1,278 @@
+'''Saving and restoring CustomVariableSet definitions and values.
+    i. Save as JSON and restore
+        - verify that the restored values match
+        - verify that the variable definitions are restored
+        - verify that non-variable items are restored
+    ii. Save in binary form and restore
+    iii. Verify that a matching keyed checksum skips validation, and that
+        a changed payload or a payload saved without a key is validated.
+    iv. Verify that a set is restored onto the class variable definitions
+        and that data saved from a different class is rejected.
+    v. Verify that CustomVariable classes with the same name in different
+        modules are restored as the right class.
+    vi. Verify that a large integer value set is saved as its intervals.
+    vii. Verify that pack_data and unpack_data round trip basic data.
+'''
+import unittest
+import json
+import tempfile
+from pathlib import Path
+from custom_variable_sets import StringV, IntegerV, BoolV, CustomVariableSet
+from custom_variable_sets import NotValidError, pack_data, unpack_data
+from custom_variable_sets import NotVariableError, SetTypeError
+from custom_variable_sets import payload_checksum
+from custom_variable_sets import IntegerIndex
+
+
+class SavedSet(CustomVariableSet):
+    '''A CustomVariableSet used for save and restore tests.
+    '''
+    variable_definitions = [
+        {'name': 'count', 'variable_type': IntegerV,
+         'min_value': 0, 'max_value': 10},
+        {'name': 'label', 'variable_type': StringV, 'max_length': 8,
+         'default': 'none'},
+        {'name': 'choice', 'variable_type': StringV,
+         'value_set': ['a', 'b'], 'required': False},
+        {'name': 'flag', 'variable_type': BoolV}
+        ]
+
+
+class TestSaveSet(unittest.TestCase):
+    '''Test saving and restoring a CustomVariableSet.
+    '''
+    def setUp(self):
+        self.variable_set = SavedSet(count=5, choice='b', flag='N', extra=3)
+
+    def check_restored(self, restored):
+        '''Compare a restored CustomVariableSet with the original.
+        '''
+        self.assertDictEqual(restored.to_dict(), self.variable_set.to_dict())
+        self.assertFalse(restored['label'].is_initialized())
+        self.assertEqual(restored['count'].max_value, 10)
+        self.assertSetEqual(restored['choice'].value_set, {'a', 'b'})
+        self.assertFalse(restored['choice'].required)
+        self.assertEqual(restored['extra'], 3)
+
+    def test_json(self):
+        '''Verify that a set saved as JSON is restored.
+        '''
+        restored = SavedSet.from_json(self.variable_set.to_json())
+        self.check_restored(restored)
+
+    def test_bytes(self):
+        '''Verify that a set saved in binary form is restored.
+        '''
+        restored = SavedSet.from_bytes(self.variable_set.to_bytes())
+        self.check_restored(restored)
+
+    def test_dump_load(self):
+        '''Verify that both file forms are recognized by load.
+        '''
+        with tempfile.TemporaryDirectory() as temp_dir:
+            json_file = Path(temp_dir) / 'saved.json'
+            binary_file = Path(temp_dir) / 'saved.cvs'
+            self.variable_set.dump(json_file)
+            self.variable_set.dump(binary_file, binary=True)
+            self.check_restored(SavedSet.load(json_file))
+            self.check_restored(SavedSet.load(binary_file))
+
+    def test_changed_payload(self):
+        '''Verify that values are validated when the checksum does not
+        match.
+        '''
+        saved = json.loads(self.variable_set.to_json())
+        saved['data']['variables'][0]['value'] = 50
+        with self.assertLogs(SavedSet.logger, level='WARNING'):
+            with self.assertRaises(NotValidError):
+                SavedSet.from_json(json.dumps(saved))
+
+    def test_trusted_checksum(self):
+        '''Verify that values are not validated only when a key is given
+        and the checksum matches.
+        '''
+        for key in (b'secret', None):
+            saved = json.loads(self.variable_set.to_json(key))
+            saved['data']['variables'][0]['value'] = 50
+            body = json.dumps(saved['data'], sort_keys=True,
+                              separators=(',', ':'))
+            saved['checksum'] = payload_checksum(body.encode('utf-8'), key)
+            if key is None:
+                with self.assertRaises(NotValidError):
+                    SavedSet.from_json(json.dumps(saved))
+            else:
+                restored = SavedSet.from_json(json.dumps(saved), key)
+                self.assertEqual(restored['count'].value, 50)
+
+    def test_key(self):
+        '''Verify that a different key causes the values to be validated.
+        '''
+        saved = self.variable_set.to_bytes(key=b'secret')
+        restored = SavedSet.from_bytes(saved, key=b'secret')
+        self.check_restored(restored)
+        with self.assertLogs(SavedSet.logger, level='WARNING'):
+            restored = SavedSet.from_bytes(saved, key=b'other')
+        self.check_restored(restored)
+
+
+class HookSet(CustomVariableSet):
+    '''A CustomVariableSet with settings that are not saved.
+    '''
+    variable_definitions = [
+        {'name': 'count', 'variable_type': IntegerV, 'default': 0,
+         'on_update': 'count_updated'}
+        ]
+
+    def count_updated(self, variable_name: str):
+        '''Record the update of count.
+        '''
+        self.updates.append(variable_name)
+
+
+class TestRestoreClass(unittest.TestCase):
+    '''Test restoring a set onto the class variable definitions.
+    '''
+    def setUp(self):
+        extra_definitions = [{'name': 'note', 'variable_type': StringV}]
+        self.variable_set = HookSet(extra_definitions, count=2, note='hi')
+
+    def test_class_settings(self):
+        '''Verify that class settings that are not saved are kept.
+        '''
+        restored = HookSet.from_json(self.variable_set.to_json())
+        self.assertEqual(restored['count'].value, 2)
+        restored.updates = list()
+        restored['count'].value = 3
+        self.assertListEqual(restored.updates, ['count'])
+
+    def test_saved_definitions(self):
+        '''Verify that variables the class does not define are created
+        from the saved definitions.
+        '''
+        restored = HookSet.from_bytes(self.variable_set.to_bytes())
+        self.assertListEqual(list(restored), ['count', 'note'])
+        self.assertIsInstance(restored['note'], StringV)
+        self.assertEqual(restored['note'].value, 'hi')
+
+    def test_set_type(self):
+        '''Verify that data saved from a different class is rejected.
+        '''
+        with self.assertRaises(SetTypeError):
+            SavedSet.from_json(self.variable_set.to_json())
+        with self.assertRaises(SetTypeError):
+            HookSet.from_bytes(SavedSet(count=1, flag='Y').to_bytes())
+
+    def test_variable_type(self):
+        '''Verify that a saved type that differs from the class definition
+        is rejected.
+        '''
+        payload = self.variable_set.to_payload()
+        payload['variables'][0]['variable_type'] = 'StringV'
+        with self.assertRaises(NotVariableError):
+            HookSet.from_payload(payload)
+
+
+class TestVariableTypes(unittest.TestCase):
+    '''Test identifying CustomVariable classes in saved sets.
+    '''
+    def setUp(self):
+        self.first_type = type('LabelV', (StringV,),
+                               {'__module__': 'first_module'})
+        self.second_type = type('LabelV', (StringV,),
+                                {'__module__': 'second_module'})
+
+    def test_type_names(self):
+        '''Verify that classes from other modules include the module name.
+        '''
+        self.assertEqual(IntegerV(name='count').definition()['variable_type'],
+                         'IntegerV')
+        label = self.second_type(name='label')
+        self.assertEqual(label.definition()['variable_type'],
+                         'second_module.LabelV')
+
+    def test_same_name(self):
+        '''Verify that classes with the same name are restored as the
+        right class.
+        '''
+        variable_set = CustomVariableSet(
+            [{'name': 'first', 'variable_type': self.first_type},
+             {'name': 'second', 'variable_type': self.second_type}],
+            first='a', second='b')
+        restored = CustomVariableSet.from_json(variable_set.to_json())
+        self.assertIs(type(restored['first']), self.first_type)
+        self.assertIs(type(restored['second']), self.second_type)
+        self.assertEqual(restored['second'].value, 'b')
+
+
+class RangeSet(CustomVariableSet):
+    '''A CustomVariableSet with a large integer value set.
+    '''
+    variable_definitions = [
+        {'name': 'index', 'variable_type': IntegerV,
+         'value_set': IntegerIndex.from_ranges([(0, 5000000), (6000000,
+                                                               6000010)])}
+        ]
+
+
+class TestSaveRanges(unittest.TestCase):
+    '''Test saving a large IntegerIndex value set.
+    '''
+    def setUp(self):
+        self.variable_set = RangeSet(index=6000005)
+
+    def check_restored(self, restored):
+        '''Compare the restored value set with the original.
+        '''
+        value_set = restored['index'].value_set
+        self.assertIsInstance(value_set, IntegerIndex)
+        self.assertListEqual(value_set.starts.tolist(), [0, 6000000])
+        self.assertListEqual(value_set.ends.tolist(), [5000000, 6000010])
+        self.assertEqual(restored['index'].value, 6000005)
+
+    def test_json(self):
+        '''Verify that the value set is saved as intervals in JSON.
+        '''
+        saved = self.variable_set.to_json()
+        self.assertLess(len(saved), 1000)
+        self.check_restored(RangeSet.from_json(saved))
+
+    def test_bytes(self):
+        '''Verify that the value set is saved as intervals in binary form.
+        '''
+        saved = self.variable_set.to_bytes()
+        self.assertLess(len(saved), 1000)
+        self.check_restored(RangeSet.from_bytes(saved))
+
+    def test_validated(self):
+        '''Verify that the value set is rebuilt when values are validated.
+        '''
+        saved = json.loads(self.variable_set.to_json())
+        saved['checksum'] = ''
+        with self.assertLogs(RangeSet.logger, level='WARNING'):
+            restored = RangeSet.from_json(json.dumps(saved))
+        self.check_restored(restored)
+
+
+class TestPackData(unittest.TestCase):
+    '''Test the compact binary packing of basic data.
+    '''
+    def test_round_trip(self):
+        '''Verify that packed data is unpacked unchanged.
+        '''
+        data = {'none': None, 'true': True, 'false': False,
+                'small': -5, 'int': 300, 'big': 2**70, 'float': 1.5,
+                'text': 'abc', 'long_text': 'x' * 300,
+                'list': list(range(300)), 'nested': {'a': [1, 'b']}}
+        unpacked, offset = unpack_data(pack_data(data))
+        self.assertDictEqual(unpacked, data)
+        self.assertEqual(offset, len(pack_data(data)))
+
+    def test_invalid_type(self):
+        '''Verify that unsupported types raise TypeError.
+        '''
+        with self.assertRaises(TypeError):
+            pack_data({1, 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
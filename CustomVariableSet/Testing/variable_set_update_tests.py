@@ -0,0 +1,108 @@
+'''Tracking changes to CustomVariableSet values.
+    i. Verify that changed variables are marked as dirty and mark_clean
+        clears them.
+    ii. Verify that set_values increments the version once and calls the
+        observers once with all of the changed variable names.
+    iii. Verify that on_update is called for changed variables only.
+    iv. Verify that setting the current value again is not a change.
+    v. Verify that nested batches report changes once.
+'''
+import unittest
+from custom_variable_sets import StringV, IntegerV, CustomVariableSet
+
+
+class UpdateSet(CustomVariableSet):
+    '''A CustomVariableSet with on_update methods.
+    '''
+    variable_definitions = [
+        {'name': 'count', 'variable_type': IntegerV, 'default': 0,
+         'on_update': 'count_updated'},
+        {'name': 'label', 'variable_type': StringV, 'default': 'none',
+         'on_update': lambda variable_set, name: variable_set.updates.append(
+             name)},
+        {'name': 'other', 'variable_type': StringV, 'default': 'x'}
+        ]
+
+    def __init__(self, **variable_values):
+        self.updates = list()
+        super().__init__(**variable_values)
+
+    def count_updated(self, variable_name: str):
+        '''Record the update of count.
+        '''
+        self.updates.append(variable_name)
+
+
+class TestChangeTracking(unittest.TestCase):
+    '''Test the dirty flags, version and observers.
+    '''
+    def setUp(self):
+        self.variable_set = UpdateSet(count=1)
+        self.notifications = list()
+        self.variable_set.add_observer(self.observer)
+
+    def observer(self, variable_set, changed_names):
+        '''Record the observer calls.
+        '''
+        self.notifications.append((variable_set.version, changed_names))
+
+    def test_initial_state(self):
+        '''Verify that a new set is clean with version 0.
+        '''
+        self.assertEqual(self.variable_set.version, 0)
+        self.assertListEqual(self.variable_set.dirty_variables(), [])
+        self.assertListEqual(self.variable_set.updates, [])
+
+    def test_dirty(self):
+        '''Verify that changed variables are marked as dirty.
+        '''
+        self.variable_set['label'].value = 'new'
+        self.assertListEqual(self.variable_set.dirty_variables(), ['label'])
+        self.variable_set.mark_clean()
+        self.assertListEqual(self.variable_set.dirty_variables(), [])
+
+    def test_set_values_batch(self):
+        '''Verify that set_values is reported as a single change.
+        '''
+        self.variable_set.set_values(count=2, label='new', other='y')
+        self.assertEqual(self.variable_set.version, 1)
+        self.assertListEqual(self.notifications,
+                             [(1, ['count', 'label', 'other'])])
+
+    def test_on_update(self):
+        '''Verify that on_update is called for changed variables.
+        '''
+        self.variable_set.set_values(count=2, other='y')
+        self.assertListEqual(self.variable_set.updates, ['count'])
+        self.variable_set['label'].value = 'new'
+        self.assertListEqual(self.variable_set.updates, ['count', 'label'])
+
+    def test_unchanged_value(self):
+        '''Verify that setting the current value is not a change.
+        '''
+        self.variable_set.set_values(count='1')
+        self.assertEqual(self.variable_set.version, 0)
+        self.assertListEqual(self.notifications, [])
+
+    def test_nested_batch(self):
+        '''Verify that changes in nested batches are reported once.
+        '''
+        with self.variable_set.batch():
+            self.variable_set['count'].value = 3
+            self.variable_set.set_values(label='new')
+            self.variable_set['count'].value = 4
+            self.assertListEqual(self.notifications, [])
+        self.assertListEqual(self.notifications, [(1, ['count', 'label'])])
+        self.assertListEqual(self.variable_set.updates, ['count', 'label'])
+
+    def test_remove_observer(self):
+        '''Verify that removed observers are not called.
+        '''
+        self.variable_set.remove_observer(self.observer)
+        self.variable_set.set_values(count=2)
+        self.assertListEqual(self.notifications, [])
+        self.assertEqual(self.variable_set.version, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+'''CustomVariableTable column validation tests.
+    i. Validate a table with StringV, IntegerV and BoolV columns
+        - verify that valid values are coerced to the variable type
+        - verify that invalid values are flagged in the error table
+    ii. Missing values
+        - verify that the default is used for missing values
+        - verify that missing required values are errors
+        - verify that missing optional values are not errors
+    iii. Verify that non-variable columns are returned unchanged.
+    iv. Verify that the table results match CustomVariable.check_validity.
+'''
+import unittest
+import pandas as pd
+from custom_variable_sets import StringV, IntegerV, BoolV, CustomVariableSet
+from custom_variable_sets import CustomVariableTable
+
+
+class TestTable(CustomVariableSet):
+    '''A CustomVariableSet used to define the table columns.
+    '''
+    variable_definitions = [
+        {'name': 'text', 'variable_type': StringV, 'max_length': 4},
+        {'name': 'choice', 'variable_type': StringV,
+         'value_set': ['a', 'b'], 'required': False},
+        {'name': 'number', 'variable_type': IntegerV,
+         'min_value': 0, 'max_value': 10},
+        {'name': 'number_set', 'variable_type': IntegerV,
+         'value_set': [1, 3, 5], 'default': 3},
+        {'name': 'flag', 'variable_type': BoolV}
+        ]
+
+
+class TestCustomVariableTable(unittest.TestCase):
+    '''Test validating a DataFrame with CustomVariableTable.
+    '''
+    def setUp(self):
+        self.table = CustomVariableTable.from_set(TestTable)
+        self.data = pd.DataFrame({
+            'text': ['abc', 'abcde', 5, None],
+            'choice': ['a', 'c', None, 'b'],
+            'number': ['3', 4.0, 11, 'x'],
+            'number_set': [1, 2, None, '5'],
+            'flag': ['yes', 'N', 0, 'T'],
+            'other': [1, 2, 3, 4]
+            })
+        self.coerced, self.errors = self.table.validate(self.data)
+
+    def test_columns(self):
+        '''Verify that the variable columns come first followed by other
+        columns.
+        '''
+        self.assertListEqual(list(self.coerced.columns),
+                             ['text', 'choice', 'number', 'number_set',
+                              'flag', 'other'])
+        self.assertListEqual(list(self.errors.columns),
+                             ['text', 'choice', 'number', 'number_set',
+                              'flag'])
+
+    def test_string_column(self):
+        '''Verify StringV max_length and type checks.
+        '''
+        self.assertListEqual(list(self.errors['text']),
+                             [False, True, True, True])
+        self.assertEqual(self.coerced.at[0, 'text'], 'abc')
+
+    def test_string_value_set(self):
+        '''Verify StringV value_set check and optional missing values.
+        '''
+        self.assertListEqual(list(self.errors['choice']),
+                             [False, True, False, False])
+
+    def test_integer_column(self):
+        '''Verify IntegerV conversion and limit checks.
+        '''
+        self.assertListEqual(list(self.errors['number']),
+                             [False, False, True, True])
+        self.assertListEqual(list(self.coerced['number'][0:2]), [3, 4])
+        self.assertEqual(str(self.coerced['number'].dtype), 'Int64')
+
+    def test_integer_value_set(self):
+        '''Verify IntegerV value_set check and the use of the default value.
+        '''
+        self.assertListEqual(list(self.errors['number_set']),
+                             [False, True, False, False])
+        self.assertListEqual(list(self.coerced['number_set'][[0, 2, 3]]),
+                             [1, 3, 5])
+
+    def test_bool_column(self):
+        '''Verify BoolV conversion.
+        '''
+        self.assertFalse(self.errors['flag'].any())
+        self.assertListEqual(list(self.coerced['flag']),
+                             [True, False, False, True])
+
+    def test_other_columns(self):
+        '''Verify that non-variable columns are unchanged.
+        '''
+        self.assertListEqual(list(self.coerced['other']), [1, 2, 3, 4])
+
+    def test_missing_column(self):
+        '''Verify that a missing required column is all errors.
+        '''
+        coerced, errors = self.table.validate(self.data.drop(columns='text'))
+        self.assertTrue(errors['text'].all())
+        self.assertTrue(coerced['text'].isna().all())
+
+    def test_matches_variable(self):
+        '''Verify that the table results match the CustomVariable checks.
+        '''
+        number = IntegerV(min_value=0, max_value=10)
+        for value, error in zip(self.data['number'], self.errors['number']):
+            self.assertEqual(number.check_validity(value), not error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,10 +3,25 @@
 
 from pathlib import Path
 from abc import ABC, abstractmethod
+from string import Formatter
+from functools import lru_cache
+from bisect import bisect_right
+from itertools import islice
+from operator import attrgetter
+from contextlib import contextmanager
+from types import MappingProxyType
+import hashlib
+import hmac
+import json
+import struct
 from collections import OrderedDict
-from typing import Optional, List, Dict, Tuple, Set, Any, Union
-from file_utilities import FileTypes, set_base_dir, make_full_path
-from file_utilities import PathInput, FileTypeError
+from collections.abc import Set as AbstractSet
+from typing import Optional, List, Dict, Tuple, Set, Any, Union, Callable
+from typing import Iterable, Mapping
+import numpy as np
+import pandas as pd
+from file_utilities import FileTypes, get_resolver, make_full_path
+from file_utilities import PathInput, FileTypeError, PathCheck, check_paths
 from data_utilities import true_iterable, logic_match
 import logging_tools
 
@@ -15,6 +30,12 @@ VariableSelection = Union[str, List[str], Dict[str, Any]]
 VariableValues = Union[Any, List[Any], Dict[str, Any]]
 ErrorString = Optional[str]
 IntValue = Union[str, float, int]
+Coercer = Callable[['CustomVariable', Any], Any]
+ChangeListener = Callable[['CustomVariable'], None]
+SetObserver = Callable[['CustomVariableSet', List[str]], None]
+ColumnCheck = Callable[['CustomVariable', pd.Series],
+                       Tuple[pd.Series, pd.Series]]
+Rejecter = Callable[[Any], Exception]
 
 
 class VariableError(Exception):
@@ -58,6 +79,34 @@ class MissingRequiredError(VariableError):
     pass
 
 
+class SetTypeError(VariableError):
+    '''The saved data is for a different CustomVariableSet class.'''
+    pass
+
+
+# Attributes that can change without changing the validity conditions.
+VALUE_ATTRIBUTES = frozenset({'value', '_value', 'initialized', 'status',
+                              '_coercer', 'dirty', '_listener', '_checked'})
+# CustomVariable classes by type_key, used to restore saved variable sets.
+VARIABLE_TYPES = dict()  # type: Dict[str, type]
+# Binary format for saved variable sets.
+PACKED_HEADER = b'CVS\x01'
+SMALL_INT_FORMAT = struct.Struct('<b')
+INT_FORMAT = struct.Struct('<q')
+FLOAT_FORMAT = struct.Struct('<d')
+SHORT_LENGTH_FORMAT = struct.Struct('<B')
+LENGTH_FORMAT = struct.Struct('<I')
+# The key of the dictionary used to save an IntegerIndex as its intervals.
+INTEGER_RANGES_KEY = '__integer_ranges__'
+# The number of ValueIndex members shown in messages.
+DISPLAY_ITEMS = 20
+# The largest span of integers for which IntegerIndex builds a bitmap.
+BITMAP_SPAN = 1 << 22
+# Indexes shared by CustomVariables defined with the same enumeration.
+SHARED_INDEXES = OrderedDict()  # type: OrderedDict
+SHARED_INDEX_LIMIT = 64
+
+
 def get_class_name(class_type: type)->str:
     '''parse the full class type string to get the abbreviated class name.
     It expects the class string to be in the form:
@@ -72,11 +121,501 @@ def get_class_name(class_type: type)->str:
     return class_name
 
 
+def type_key(class_type: type)->str:
+    '''Return the name used to identify a class in saved variable sets.
+    Classes defined in this module are identified by their qualified name.
+    Other classes also include their module, so that classes with the same
+    name in different modules are not confused.
+    Arguments:
+        class_type {type} -- The CustomVariable or CustomVariableSet class.
+    Returns:
+        str: The identifying name of the class.
+    '''
+    if class_type.__module__ == __name__:
+        return class_type.__qualname__
+    return '{}.{}'.format(class_type.__module__, class_type.__qualname__)
+
+
+@lru_cache(maxsize=None)
+def template_fields(template: str)->Tuple[str]:
+    '''Return the names of the fields used in a message template.
+    Arguments:
+        template {str} -- A message template to be used with str.format.
+    Returns:
+        Tuple[str] -- The top level field names in the order they occur.
+            Attribute and index portions of a field ("a.b", "a[0]") are
+            dropped.
+    '''
+    fields = list()
+    for _, field_name, _, _ in Formatter().parse(template):
+        if not field_name:
+            continue
+        name = field_name.split('.', 1)[0].split('[', 1)[0]
+        if name and name not in fields:
+            fields.append(name)
+    return tuple(fields)
+
+
+class LazyMessage():
+    '''A message that is only formatted when it is converted to a string.
+    Only the values needed by the template are stored.  This is used for
+    error messages, which are often never displayed.
+    '''
+    __slots__ = ('template', 'values', '_text')
+
+    def __init__(self, template: str, values: Dict[str, Any]):
+        '''Store the template and the field values.
+        Arguments:
+            template {str} -- A message template to be used with str.format.
+            values {Dict[str, Any]} -- The values for the template fields.
+        '''
+        self.template = template
+        self.values = values
+        self._text = None
+
+    def __str__(self)->str:
+        '''Format the message the first time it is requested.
+        '''
+        if self._text is None:
+            self._text = self.template.format(**self.values)
+        return self._text
+
+    def __repr__(self)->str:
+        return repr(str(self))
+
+    def __eq__(self, other)->bool:
+        if isinstance(other, (str, LazyMessage)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self)->int:
+        return hash(str(self))
+
+    def __add__(self, other)->str:
+        return str(self) + str(other)
+
+    def __radd__(self, other)->str:
+        return str(other) + str(self)
+
+
+class ValueIndex(AbstractSet):
+    '''An immutable set of allowed values with scalar and vectorised
+    membership tests.
+    The same ValueIndex can be shared by any number of CustomVariables;
+    adding or removing items returns a new ValueIndex.  Use value_index to
+    obtain a shared index for a tuple, frozenset or range.
+    '''
+    __slots__ = ()
+    item_type = object
+
+    @classmethod
+    def reject_item(cls, item: Any)->Exception:
+        '''Return the error for an item that is not of the index type.
+        Arguments:
+            item {Any} -- The invalid item.
+        Returns:
+            Exception -- A TypeError describing the item.
+        '''
+        msg = '{!r} is not a valid {} item.'.format(item, get_class_name(cls))
+        return TypeError(msg)
+
+    @abstractmethod
+    def contains(self, values: Any)->np.ndarray:
+        '''Vectorised membership test.
+        Arguments:
+            values {Any} -- An array-like or pandas Series of values.
+        Returns:
+            np.ndarray -- A boolean array that is True for members.
+        '''
+        pass
+
+    @abstractmethod
+    def union(self, items: Iterable, reject: Rejecter = None)->'ValueIndex':
+        '''Return a new index including items.
+        Arguments:
+            items {Iterable} -- The items to add.
+            reject {Rejecter, optional} -- Returns the exception raised for
+                an item of the wrong type.  Default is reject_item.
+        Returns:
+            ValueIndex -- The combined index.
+        '''
+        pass
+
+    @abstractmethod
+    def without(self, item: Any)->'ValueIndex':
+        '''Return a new index with item removed.
+        Arguments:
+            item {Any} -- A member of the index.
+        Returns:
+            ValueIndex -- The reduced index.
+        '''
+        pass
+
+    def difference(self, other: Iterable)->Set[Any]:
+        '''Return the members of the index that are not in other.
+        '''
+        return set(self) - set(other)
+
+    def __hash__(self)->int:
+        return self._hash()
+
+    def __str__(self)->str:
+        '''Display the members like a set.
+        Only the first DISPLAY_ITEMS members of a large index are shown.
+        '''
+        if not self:
+            return 'set()'
+        shown = [repr(item) for item in islice(self, DISPLAY_ITEMS)]
+        if len(self) > DISPLAY_ITEMS:
+            shown.append('... {} values'.format(len(self)))
+        return '{' + ', '.join(shown) + '}'
+
+    def __repr__(self)->str:
+        return '{}({})'.format(get_class_name(type(self)), str(self))
+
+
+class StringIndex(ValueIndex):
+    '''An immutable set of strings.
+    Scalar tests use a frozenset; vectorised tests use a pandas Index built
+    from the sorted strings on first use.
+    '''
+    __slots__ = ('_items', '_lookup')
+    item_type = str
+
+    def __init__(self, items: Iterable = (), reject: Rejecter = None):
+        '''Create a string index.
+        Arguments:
+            items {Iterable} -- The strings in the index.
+            reject {Rejecter, optional} -- Returns the exception raised for
+                an item that is not a string.  Default is reject_item.
+        '''
+        if isinstance(items, StringIndex):
+            item_set = items._items
+        else:
+            item_set = frozenset(items)
+            for item in item_set:
+                if not isinstance(item, str):
+                    raise (reject or self.reject_item)(item)
+        self._items = item_set
+        self._lookup = None
+
+    def __contains__(self, value: Any)->bool:
+        return value in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self)->int:
+        return len(self._items)
+
+    def contains(self, values: Any)->np.ndarray:
+        '''Vectorised membership test using a hashed pandas Index.
+        Arguments:
+            values {Any} -- An array-like or pandas Series of values.
+        Returns:
+            np.ndarray -- A boolean array that is True for members.
+        '''
+        lookup = self._lookup
+        if lookup is None:
+            lookup = pd.Index(sorted(self._items), dtype=object)
+            self._lookup = lookup
+        return lookup.get_indexer(pd.Index(values, dtype=object)) >= 0
+
+    def union(self, items: Iterable, reject: Rejecter = None)->'StringIndex':
+        '''Return a new index including items.
+        '''
+        new_items = StringIndex(items, reject)
+        if new_items._items <= self._items:
+            return self
+        return StringIndex(self._items | new_items._items)
+
+    def without(self, item: str)->'StringIndex':
+        '''Return a new index with item removed.
+        '''
+        return StringIndex(self._items - {item})
+
+
+class IntegerIndex(ValueIndex):
+    '''An immutable set of integers stored as sorted, non-overlapping
+    intervals, so that ranges with holes take little space.
+    Scalar tests use a binary search of the interval starts.  If the values
+    span no more than BITMAP_SPAN integers, vectorised tests use a bitmap,
+    otherwise they use a vectorised binary search.
+    '''
+    __slots__ = ('starts', 'ends', '_start_list', '_end_list', '_size',
+                 '_bitmap')
+    item_type = int
+
+    def __init__(self, items: Iterable = (), reject: Rejecter = None):
+        '''Create an integer index.
+        Arguments:
+            items {Iterable} -- The integers in the index.  Ranges with a
+                step of 1 are stored without expanding them.
+            reject {Rejecter, optional} -- Returns the exception raised for
+                an item that is not an integer.  Default is reject_item.
+        '''
+        if isinstance(items, IntegerIndex):
+            starts, ends = items.starts, items.ends
+        elif isinstance(items, range) and items.step == 1:
+            if len(items):
+                starts = np.array([items.start], dtype=np.int64)
+                ends = np.array([items.stop - 1], dtype=np.int64)
+            else:
+                starts = ends = np.empty(0, dtype=np.int64)
+        else:
+            values = self.integer_array(items, reject or self.reject_item)
+            starts, ends = merge_intervals(values, values)
+        self.set_intervals(starts, ends)
+
+    @staticmethod
+    def integer_array(items: Iterable, reject: Rejecter)->np.ndarray:
+        '''Convert items to an integer array.
+        Arguments:
+            items {Iterable} -- The integers.
+            reject {Rejecter} -- Returns the exception raised for an item
+                that is not an integer.
+        Raises:
+            Exception -- The error returned by reject for the first item
+                that is not an integer.
+        Returns:
+            np.ndarray -- The items as a 64 bit integer array.
+        '''
+        item_list = list(items)
+        values = np.asarray(item_list)
+        if values.dtype.kind in 'iub':
+            return values.astype(np.int64)
+        for item in item_list:
+            if not isinstance(item, (int, np.integer)):
+                raise reject(item)
+        try:
+            return np.array(item_list, dtype=np.int64)
+        except OverflowError:
+            raise reject(max(item_list, key=abs)) from None
+
+    @classmethod
+    def from_ranges(cls, ranges: Iterable[Tuple[int, int]])->'IntegerIndex':
+        '''Create an index from inclusive (first, last) pairs.
+        Arguments:
+            ranges {Iterable[Tuple[int, int]]} -- The ranges of allowed
+                values.  Ranges can overlap.
+        Returns:
+            IntegerIndex -- The index.
+        '''
+        bounds = np.array(list(ranges), dtype=np.int64).reshape(-1, 2)
+        index = cls.__new__(cls)
+        index.set_intervals(*merge_intervals(bounds[:, 0], bounds[:, 1]))
+        return index
+
+    def set_intervals(self, starts: np.ndarray, ends: np.ndarray):
+        '''Store the merged intervals.
+        Arguments:
+            starts {np.ndarray} -- The sorted interval starts.
+            ends {np.ndarray} -- The matching (inclusive) interval ends.
+        '''
+        self.starts = starts
+        self.ends = ends
+        self._start_list = starts.tolist()
+        self._end_list = ends.tolist()
+        self._size = int((ends - starts).sum()) + len(starts)
+        self._bitmap = None
+
+    def __contains__(self, value: Any)->bool:
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        elif not isinstance(value, (int, np.integer)):
+            return False
+        position = bisect_right(self._start_list, value) - 1
+        return position >= 0 and value <= self._end_list[position]
+
+    def __iter__(self):
+        for start, end in zip(self._start_list, self._end_list):
+            yield from range(start, end + 1)
+
+    def __len__(self)->int:
+        return self._size
+
+    def bitmap(self)->Optional[np.ndarray]:
+        '''Return a boolean array covering the span of the index, or None
+        if the span is larger than BITMAP_SPAN.
+        '''
+        if self._bitmap is None and self._size:
+            first = self._start_list[0]
+            span = self._end_list[-1] - first + 1
+            if span <= BITMAP_SPAN:
+                change = np.zeros(span + 1, dtype=np.int8)
+                change[self.starts - first] += 1
+                change[self.ends - first + 1] -= 1
+                self._bitmap = np.cumsum(change[:-1], dtype=np.int8) > 0
+        return self._bitmap
+
+    def contains(self, values: Any)->np.ndarray:
+        '''Vectorised membership test.
+        Values that are not integers (including missing values) are not
+        members.
+        Arguments:
+            values {Any} -- An array-like or pandas Series of values.
+        Returns:
+            np.ndarray -- A boolean array that is True for members.
+        '''
+        numbers = pd.to_numeric(np.asarray(values, dtype=object),
+                                errors='coerce').astype(float)
+        result = np.zeros(len(numbers), dtype=bool)
+        if not self._size:
+            return result
+        first = self._start_list[0]
+        last = self._end_list[-1]
+        candidates = ((numbers >= first) & (numbers <= last) &
+                      (numbers % 1 == 0))
+        ints = numbers[candidates].astype(np.int64)
+        bitmap = self.bitmap()
+        if bitmap is not None:
+            result[candidates] = bitmap[ints - first]
+        else:
+            position = np.searchsorted(self.starts, ints, side='right') - 1
+            result[candidates] = ints <= self.ends[position]
+        return result
+
+    def union(self, items: Iterable, reject: Rejecter = None)->'IntegerIndex':
+        '''Return a new index including items.
+        '''
+        new_items = IntegerIndex(items, reject)
+        index = IntegerIndex.__new__(IntegerIndex)
+        index.set_intervals(*merge_intervals(
+            np.concatenate([self.starts, new_items.starts]),
+            np.concatenate([self.ends, new_items.ends])))
+        return index
+
+    def without(self, item: int)->'IntegerIndex':
+        '''Return a new index with item removed.
+        '''
+        if item not in self:
+            return self
+        position = bisect_right(self._start_list, item) - 1
+        starts = self._start_list[:position]
+        ends = self._end_list[:position]
+        start = self._start_list[position]
+        end = self._end_list[position]
+        if start < item:
+            starts.append(start)
+            ends.append(item - 1)
+        if item < end:
+            starts.append(item + 1)
+            ends.append(end)
+        starts.extend(self._start_list[position + 1:])
+        ends.extend(self._end_list[position + 1:])
+        index = IntegerIndex.__new__(IntegerIndex)
+        index.set_intervals(np.array(starts, dtype=np.int64),
+                            np.array(ends, dtype=np.int64))
+        return index
+
+
+def merge_intervals(starts: np.ndarray,
+                    ends: np.ndarray)->Tuple[np.ndarray, np.ndarray]:
+    '''Merge overlapping and adjacent integer intervals.
+    Arguments:
+        starts {np.ndarray} -- The interval starts.
+        ends {np.ndarray} -- The matching (inclusive) interval ends.
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- The sorted starts and ends of the
+            merged intervals.
+    '''
+    if not len(starts):
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    order = np.argsort(starts, kind='stable')
+    starts = np.asarray(starts, dtype=np.int64)[order]
+    ends = np.asarray(ends, dtype=np.int64)[order]
+    reach = np.maximum.accumulate(ends)
+    new_group = np.ones(len(starts), dtype=bool)
+    new_group[1:] = starts[1:] > reach[:-1] + 1
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.append(group_starts[1:], len(starts)) - 1
+    return starts[group_starts], reach[group_ends]
+
+
+def value_index(items: Iterable, index_type: type,
+                reject: Rejecter = None)->ValueIndex:
+    '''Return a ValueIndex containing items.
+    A ValueIndex is returned unchanged.  Indexes built from a tuple,
+    frozenset or range are cached, so all CustomVariables defined with the
+    same enumeration share one index.
+    Arguments:
+        items {Iterable} -- The allowed values.
+        index_type {type} -- The ValueIndex subclass to build.
+        reject {Rejecter, optional} -- Returns the exception raised for an
+            item of the wrong type.
+    Returns:
+        ValueIndex -- The index of items.
+    '''
+    if isinstance(items, index_type):
+        return items
+    if not isinstance(items, (tuple, frozenset, range)):
+        return index_type(items, reject)
+    key = (id(items), index_type)
+    cached = SHARED_INDEXES.get(key)
+    if cached is not None and cached[0] is items:
+        SHARED_INDEXES.move_to_end(key)
+        return cached[1]
+    index = index_type(items, reject)
+    SHARED_INDEXES[key] = (items, index)
+    if len(SHARED_INDEXES) > SHARED_INDEX_LIMIT:
+        SHARED_INDEXES.popitem(last=False)
+    return index
+
+
 class CustomVariable(ABC):
     '''This is an abstract base class for all of the CustomVariable sub-classes.
+    CustomVariables use __slots__ rather than a per-instance __dict__.
+    Message templates are shared at the class level; an instance only gets
+    its own copy of the templates when they are overridden.
+    Attributes that are not defined in __slots__ (e.g. passed as keywords)
+    are stored in a small per-instance dictionary, created only when needed.
+    New values are validated and converted by a coercer function compiled
+    from the validity conditions.  The coercer is rebuilt whenever one of
+    the conditions changes.
+    When the value changes, the dirty attribute is set to True and the
+    change listener (set by the CustomVariableSet containing the
+    variable) is called.
     '''
+    __slots__ = ('initialized', '_value', 'default', 'status', '_name',
+                 '_own_messages', '_attributes', '_coercer', 'dirty',
+                 '_listener', 'required', 'on_update')
     _type = object
+    error_types = (NotValidError,)
     initial_settings: Dict[str, Any] = {'default': None}
+    definition_attributes: Tuple[str] = ('required', 'default')
+    message_templates: Dict[str, str] = dict(
+        not_valid='{new_value} is an invalid value for {name}.',
+        display='{name} CustomVariable of class {cls},\n'
+                '\tCurrent value is:\t{value}\n'
+                '\tDefault value is:\t{default}'
+        )
+    _class_messages: Dict[str, str] = dict(message_templates)
+    _definition_attributes: Tuple[str] = definition_attributes
+    _slot_names: Tuple[str] = __slots__
+
+    def __init_subclass__(cls, **kwds):
+        '''Merge the class message templates and slot names with those of the
+        parent classes.
+        '''
+        super().__init_subclass__(**kwds)
+        class_messages = dict()
+        slot_names = list()
+        definition_attributes = list()
+        for parent in reversed(cls.__mro__):
+            class_messages.update(vars(parent).get('message_templates', {}))
+            for slot in vars(parent).get('__slots__', ()):
+                if slot not in slot_names:
+                    slot_names.append(slot)
+            for attr in vars(parent).get('definition_attributes', ()):
+                if attr not in definition_attributes:
+                    definition_attributes.append(attr)
+        cls._class_messages = class_messages
+        cls._slot_names = tuple(slot_names)
+        cls._slot_values = attrgetter(*slot_names)
+        cls._instance_dict = bool(cls.__dictoffset__)
+        cls._definition_attributes = tuple(definition_attributes)
+        VARIABLE_TYPES[type_key(cls)] = cls
 
     @abstractmethod
     def __init__(self, value=None, name=None, messages=None, **kwds):
@@ -86,16 +625,143 @@ class CustomVariable(ABC):
         self._value = None
         self.default = None
         self.status = BaseException
+        self._own_messages = None
+        self._attributes = None
+        self._coercer = None
+        self.dirty = False
+        self._listener = None
         if name:
             self._name = name
         else:
             self._name = get_class_name(type(self))
-        self._messages = dict(not_valid='')
         self.initialize_messages(messages)
         if value is not None:
             self.set_value(value)
         self.initialize_attributes(kwds)
 
+    def __setattr__(self, attr: str, value: Any):
+        '''Set an attribute.
+        Attributes not defined in __slots__ are stored in the per-instance
+        attribute dictionary.
+        Changing any attribute other than the value drops the compiled
+        coercer.
+        '''
+        try:
+            object.__setattr__(self, attr, value)
+        except AttributeError:
+            # Read-only properties and other class attributes still raise.
+            if hasattr(type(self), attr):
+                raise
+            attributes = getattr(self, '_attributes', None)
+            if attributes is None:
+                attributes = dict()
+                object.__setattr__(self, '_attributes', attributes)
+            attributes[attr] = value
+        if attr not in VALUE_ATTRIBUTES:
+            object.__setattr__(self, '_coercer', None)
+
+    def __getattr__(self, attr: str)->Any:
+        '''Look up attributes not defined in __slots__.
+        '''
+        try:
+            attributes = object.__getattribute__(self, '_attributes')
+        except AttributeError:
+            attributes = None
+        if attributes and attr in attributes:
+            return attributes[attr]
+        msg = "'{}' object has no attribute '{}'"
+        raise AttributeError(msg.format(get_class_name(type(self)), attr))
+
+    def __delattr__(self, attr: str):
+        '''Delete an attribute, including those not defined in __slots__.
+        '''
+        try:
+            object.__delattr__(self, attr)
+        except AttributeError:
+            attributes = getattr(self, '_attributes', None)
+            if attributes is None or attr not in attributes:
+                raise
+            del attributes[attr]
+
+    def attribute_dict(self)->Dict[str, Any]:
+        '''Return a new dictionary of all of the instance attributes.
+        Returns:
+            {Dict[str, Any]} -- The slot attributes that have been set and
+                any additional attributes.
+        '''
+        values = dict()
+        for attr in self._slot_names:
+            if attr in ('_own_messages', '_attributes', '_coercer', 'dirty',
+                        '_listener', '_checked'):
+                continue
+            try:
+                values[attr] = object.__getattribute__(self, attr)
+            except AttributeError:
+                continue
+        if self._own_messages is not None:
+            values['_messages'] = self._own_messages
+        if self._attributes:
+            values.update(self._attributes)
+        return values
+
+    def definition(self)->Dict[str, Any]:
+        '''Return a variable definition that will recreate the CustomVariable.
+        Only the attributes listed in definition_attributes are included.
+        Returns:
+            Dict[str, Any] -- The variable definition, with the type_key
+                of the class as the 'variable_type'.
+        '''
+        variable_def = {'variable_type': type_key(type(self)),
+                        'name': self.name}
+        for attr in self._definition_attributes:
+            try:
+                value = getattr(self, attr)
+            except AttributeError:
+                continue
+            variable_def[attr] = serial_value(value)
+        return variable_def
+
+    def unsaved_settings(self)->Dict[str, Any]:
+        '''Return the settings that are not included in the definition.
+        Returns:
+            Dict[str, Any] -- The on_update method, the attributes not
+                defined in __slots__ and the changed message templates, as
+                keyword arguments for the CustomVariable class.
+        '''
+        settings = dict(self._attributes or {})
+        on_update = getattr(self, 'on_update', None)
+        if on_update is not None:
+            settings['on_update'] = on_update
+        if self._own_messages is not None:
+            settings['messages'] = dict(self._own_messages)
+        return settings
+
+    def restore_value(self, value: Any):
+        '''Set a previously validated value without checking it.
+        Arguments:
+            value {Any} -- A value that was valid when it was saved.
+        '''
+        object.__setattr__(self, '_value', self._type(value))
+        object.__setattr__(self, 'initialized', True)
+        self.value_changed()
+
+    def value_changed(self):
+        '''Mark the CustomVariable as changed and call the change listener.
+        '''
+        object.__setattr__(self, 'dirty', True)
+        listener = self._listener
+        if listener is not None:
+            listener(self)
+
+    def set_listener(self, listener: ChangeListener = None):
+        '''Set the function called when the value changes.
+        Arguments:
+            listener {ChangeListener, optional} -- A callable taking the
+                CustomVariable as its only argument.  If None, no function is
+                called.
+        '''
+        self._listener = listener
+
     def get_name(self):
         '''Return the name of the CustomVariable.
         '''
@@ -110,6 +776,23 @@ class CustomVariable(ABC):
 
     value_type = property(get_type)
 
+    def get_messages(self)->Dict[str, str]:
+        '''Return the message templates used by the CustomVariable.
+        The class templates are returned unless they have been overridden
+        for this instance.
+        '''
+        if self._own_messages is None:
+            return self._class_messages
+        return self._own_messages
+
+    def set_messages(self, messages: Dict[str, str]):
+        '''Replace the message templates used by this instance.
+        '''
+        self._own_messages = dict(self._class_messages)
+        self._own_messages.update(messages)
+
+    _messages = property(get_messages, set_messages)
+
     def initialize_attributes(self, kwds):
         '''Add values for all attributes.
         '''
@@ -120,16 +803,11 @@ class CustomVariable(ABC):
 
     def initialize_messages(self, messages: dict):
         '''Update message templates.
+        The class message templates are shared until messages overrides one
+        or more of them.
         '''
-        message_templates = dict(
-            not_valid='{new_value} is an invalid value for {name}.',
-            display='{name} CustomVariable of class {cls},\n'
-                    '\tCurrent value is:\t{value}\n'
-                    '\tDefault value is:\t{default}'
-            )
         if messages:
-            message_templates.update(messages)
-        self._messages.update(message_templates)
+            self.update_messages(messages)
 
     def set_attributes(self, **settings):
         '''Update values for the supplied attributes.
@@ -140,22 +818,128 @@ class CustomVariable(ABC):
     def update_messages(self, messages: dict):
         '''Update message templates.
         '''
-        self._messages.update(messages)
+        if self._own_messages is None:
+            self._own_messages = dict(self._class_messages)
+        self._own_messages.update(messages)
+
+    def message_value(self, field: str)->Any:
+        '''Return the value of a message template field.
+        Arguments:
+            field {str} -- The name of the template field. In addition to
+                the CustomVariable attributes, can be one of:
+                    name, value, value_type, cls
+        Raises:
+            AttributeError -- If field is not a CustomVariable attribute.
+        Returns:
+            Any -- The value to use for the template field.  Mutable
+                containers are copied.
+        '''
+        if field == 'name':
+            return self.name
+        if field == 'value':
+            return str(self)
+        if field == 'value_type':
+            return get_class_name(self.value_type)
+        if field == 'cls':
+            return get_class_name(type(self))
+        value = getattr(self, field)
+        if isinstance(value, (set, list, dict)):
+            value = value.copy()
+        return value
+
+    def lazy_message(self, message: str, **value_set)->LazyMessage:
+        '''Return a message that is formatted when converted to a string.
+        Only the fields used by the message template are collected.
+        Arguments:
+            message {str} -- A key in self.messages.
+            value_set {dict} -- value definition overrides for the message
+                templates.
+        Returns:
+            LazyMessage -- The unformatted message.
+        '''
+        template = self._messages[message]
+        values = dict()
+        for field in template_fields(template):
+            if field in value_set:
+                values[field] = value_set[field]
+            else:
+                try:
+                    values[field] = self.message_value(field)
+                except AttributeError:
+                    continue
+        return LazyMessage(template, values)
 
     def build_message(self, message: str, **value_set)->str:
         '''Return a message string using format and a message template.
         if message is a key in self.messages use the corresponding template,
         otherwise treat message as a template.
         '''
-        values = self.__dict__
-        values.update({'name': self.name,
-                       'value': str(self),
-                       'value_type': get_class_name(self.value_type),
-                       'cls': get_class_name(type(self))})
-        values.update(value_set)
-        msg = self._messages[message]
-        msg_str = msg.format(**values)
-        return msg_str
+        return str(self.lazy_message(message, **value_set))
+
+    def invalid(self, message: str, value: Any, **value_set)->NotValidError:
+        '''Set and return a NotValidError for an invalid value.
+        Arguments:
+            message {str} -- The key of the message template to use.
+            value {Any} -- The invalid value.
+            value_set {dict} -- value definition overrides for the message
+                templates.
+        Returns:
+            NotValidError -- The new status of the CustomVariable.
+        '''
+        msg = self.lazy_message(message, new_value=value, **value_set)
+        self.status = NotValidError(msg)
+        return self.status
+
+    def reject_item(self, item: Any)->NotValidError:
+        '''Return the error for an invalid value set item.
+        Arguments:
+            item {Any} -- The invalid item.
+        Returns:
+            NotValidError -- The new status of the CustomVariable.
+        '''
+        return self.invalid('not_valid', item)
+
+    def compile_coercer(self)->Coercer:
+        '''Build a function that validates and converts a new value.
+        The validity conditions are looked up once, when the function is
+        built, rather than each time a value is set.  The function takes
+        two arguments: the CustomVariable, which is only used to build an
+        error message, and the value.  It returns the converted value, or
+        sets the CustomVariable status and raises it.
+        Returns:
+            Coercer -- The validation and conversion function.
+        '''
+        value_type = self._type
+
+        def coerce(variable: CustomVariable, value: Any)->Any:
+            if isinstance(value, value_type):
+                return value_type(value)
+            raise variable.invalid('not_valid', value)
+        return coerce
+
+    def get_coercer(self)->Coercer:
+        '''Return the coercer, compiling it if necessary.
+        '''
+        coercer = self._coercer
+        if coercer is None:
+            coercer = self.compile_coercer()
+            object.__setattr__(self, '_coercer', coercer)
+        return coercer
+
+    def test_value(self, value: Any)->bool:
+        '''Test value with the compiled coercer.
+        If the value is not valid the status attribute is set with the error
+        describing the reason the value is not valid.
+        Arguments:
+            value {Any} -- The value to be tested.
+        Returns
+            True if the value is valid, False otherwise.
+        '''
+        try:
+            self.get_coercer()(self, value)
+        except self.error_types:
+            return False
+        return True
 
     @abstractmethod
     def check_validity(self, value)->bool:
@@ -166,8 +950,7 @@ class CustomVariable(ABC):
         '''
         if isinstance(value, self.value_type):
             return True
-        msg = self.build_message('not_valid', new_value=value)
-        self.status = NotValidError(msg)
+        self.invalid('not_valid', value)
         return False
 
     def get_value(self):
@@ -183,11 +966,23 @@ class CustomVariable(ABC):
     def set_value(self, value):
         '''Set a new value for CustomVariable.
         '''
-        if self.check_validity(value):
-            self._value = self._type(value)
-            self.initialized = True
-        else:
-            raise self.status
+        coercer = self._coercer
+        if coercer is None:
+            coercer = self.get_coercer()
+        self.store_value(coercer(self, value))
+
+    def store_value(self, new_value: Any):
+        '''Store a validated and converted value.
+        A change is only reported if the new value differs from the current
+        value.
+        Arguments:
+            new_value {Any} -- The converted value.
+        '''
+        if self.initialized and new_value == self._value:
+            return
+        object.__setattr__(self, '_value', new_value)
+        object.__setattr__(self, 'initialized', True)
+        self.value_changed()
 
     value = property(get_value, set_value)
 
@@ -195,10 +990,36 @@ class CustomVariable(ABC):
         '''Duplicate the CustomVariable including all relevant attributes
         '''
         cls = type(self)
-        attrs = self.__dict__
+        attrs = self.attribute_dict()
         copied = cls(**attrs)
         return copied
 
+    def clone(self)->'CustomVariable':
+        '''Return a copy of the CustomVariable without re-validating it.
+        Immutable attributes, including value set indexes and the compiled
+        coercer, are shared with the copy; lists, dictionaries and sets are
+        copied.  The copy has no change listener.
+        Returns:
+            CustomVariable -- The new CustomVariable.
+        '''
+        cls = type(self)
+        cloned = cls.__new__(cls)
+        set_attribute = object.__setattr__
+        try:
+            values = zip(self._slot_names, self._slot_values(self))
+        except AttributeError:
+            # Some slots are not set.
+            values = [(attr, getattr(self, attr))
+                      for attr in self._slot_names if hasattr(self, attr)]
+        for attr, value in values:
+            if type(value) in (list, dict, set):
+                value = value.copy()
+            set_attribute(cloned, attr, value)
+        set_attribute(cloned, '_listener', None)
+        if self._instance_dict:
+            cloned.__dict__.update(self.__dict__)
+        return cloned
+
     def __str__(self)->str:
         '''A string version of the value
         '''
@@ -220,11 +1041,14 @@ class CustomVariable(ABC):
     def reset_value(self):
         '''Set CustomVariable to it's default value.'''
         self._value = self.default
+        self.value_changed()
 
     def drop_value(self):
         '''Set CustomVariable to it's default value.'''
-        self._value = None
-        self.initialized = False
+        if self.initialized or self._value is not None:
+            self._value = None
+            self.initialized = False
+            self.value_changed()
 
     def set_default(self, value=None):
         '''set the default value of CustomVariable to the supplied "value".
@@ -250,8 +1074,24 @@ class StringV(CustomVariable):
         Optional size limit (max_length)
         If value_set is defined, the size limit will not be checked.
     '''
-    _name = 'string_variable'
+    __slots__ = ('_max_length', '_value_set')
     _type = str
+    definition_attributes = ('value_set', 'max_length')
+    message_templates = dict(
+        too_long='{new_value} is longer than the maximum allowable '
+                 'length of {max_length}.',
+        disp_value_set='{new_value} is an invalid value for {name}.'
+                       '\n\tPossible values are: {value_set}',
+        not_in_value_set='{new_value} is not in the set of possible '
+                         'values:\n\t{value_set}',
+        value_conflict='{value} cannot be removed from the list of '
+                       'possible values because it is the current value',
+        length_conflict='new maximum length of {max_length} is less '
+                        'than the length of the current value: {value}.'
+                        '\n\tmax_value was not changed.',
+        value_set='\n\tPossible values are:\t{value_set}',
+        max_length='\n\tThe maximum allowable length is: {max_length}'
+        )
 
     def __init__(self, *args, value_set=None, max_length=None, **kwds):
         '''Create a new instance of the string CustomVariable.
@@ -259,11 +1099,11 @@ class StringV(CustomVariable):
         '''
         self._value = None
         self._max_length = None # type int
-        self._value_set = set() # type: Set[str]
+        self._value_set = StringIndex() # type: StringIndex
         super().__init__(*args, **kwds)
         if value_set is not None:
-            for item in value_set:
-                self.add_item(item)
+            self._value_set = value_index(value_set, StringIndex,
+                                          self.reject_item)
             if self._value is not None and self._value not in self.value_set:
                 self.add_item(self._value)
         if max_length is not None:
@@ -303,7 +1143,8 @@ class StringV(CustomVariable):
             item {str} -- The item to add to the list of valid string values
         '''
         if super().check_validity(item):
-            self._value_set.add(item)
+            self._value_set = self._value_set.union((item,))
+            self._coercer = None
         else:
             raise self.status
 
@@ -317,7 +1158,8 @@ class StringV(CustomVariable):
             if self.value == item:
                 msg = self.build_message('value_conflict', new_value=item)
                 raise UpdateError(msg)
-            self._value_set.remove(item)
+            self._value_set = self._value_set.without(item)
+            self._coercer = None
         else:
             msg = self.build_message('not_in_value_set', new_value=item)
             raise UnMatchedValuesError(msg)
@@ -331,59 +1173,37 @@ class StringV(CustomVariable):
         Returns
             True if the value is valid, False otherwise.
         '''
-        if not super().check_validity(value):
-            return False
-        if self._value_set:
-            if value not in self._value_set:
-                msg = self.build_message('disp_value_set', new_value=value)
-                self.status = NotValidError(msg)
-                return False
-        elif self._max_length:
-            if len(value) > self._max_length:
-                msg = self.build_message('too_long', new_value=value)
-                self.status = NotValidError(msg)
-                return False
-        return True
+        return self.test_value(value)
 
-    def initialize_messages(self, messages: Dict[str, str]):
-        '''Update message templates.
-        Arguments:
-            messages -- A dictionary of message templates referencing
-                StringV attributes.
-        '''
-        message_templates = dict(
-            too_long='{new_value} is longer than the maximum allowable '
-                     'length of {max_length}.',
-            disp_value_set='{new_value} is an invalid value for {name}.'
-                           '\n\tPossible values are: {value_set}',
-            not_in_value_set='{new_value} is not in the set of possible '
-                             'values:\n\t{value_set}',
-            value_conflict='{value} cannot be removed from the list of '
-                           'possible values because it is the current value',
-            length_conflict='new maximum length of {max_length} is less '
-                            'than the length of the current value: {value}.'
-                            '\n\tmax_value was not changed.',
-            value_set='\n\tPossible values are:\t{value_set}',
-            max_length='\n\tThe maximum allowable length is: {max_length}'
-            )
-        if messages:
-            message_templates.update(messages)
-        super().initialize_messages(message_templates)
-
-    def build_message(self, message: str, **value_set)->str:
-        '''Return a message string using format and a message template.
-        if message is a key in self.messages use the corresponding template,
-        otherwise treat message as a template.
-        Arguments:
-            message {str} -- Either a key in self.messages, or
-                a custom message template.
-            value_set {dict} -- value definition overrides for the message
-                templates.
+    def compile_coercer(self)->Coercer:
+        '''Build a function that checks that a value is a string, and
+        either a member of the value set or no longer than max_length.
+        Returns:
+            Coercer -- The validation and conversion function.
         '''
-        values = {'max_length': self.max_length,
-                  'value_set': self.value_set}
-        values.update(value_set)
-        return super().build_message(message, **values)
+        value_set = value_index(self._value_set, StringIndex)
+        max_length = self._max_length
+
+        def check_string(variable: StringV, value: Any)->str:
+            if isinstance(value, str):
+                return value
+            raise variable.invalid('not_valid', value)
+
+        if value_set:
+            def coerce(variable: StringV, value: Any)->str:
+                check_string(variable, value)
+                if value not in value_set:
+                    raise variable.invalid('disp_value_set', value)
+                return value
+        elif max_length:
+            def coerce(variable: StringV, value: Any)->str:
+                check_string(variable, value)
+                if len(value) > max_length:
+                    raise variable.invalid('too_long', value)
+                return value
+        else:
+            coerce = check_string
+        return coerce
 
     def disp(self)->str:
         '''A template formatted string
@@ -402,8 +1222,28 @@ class IntegerV(CustomVariable):
         a limited set of values (value_set)
     If value_set is defined, the max_value and min_value will not be checked.
     '''
-    _name = 'integer_variable'
+    __slots__ = ('_min_value', '_max_value', '_value_set')
     _type = int
+    definition_attributes = ('value_set', 'min_value', 'max_value')
+    message_templates = dict(
+        too_high='{new_value} is greater than the maximum allowable '
+                 'value of {max_value}.',
+        too_low='{new_value} is less than the minimum allowable '
+                 'value of {min_value}.',
+        disp_value_set='{new_value} is an invalid value for {name}.'
+                       '\n\tPossible values are: {value_set}',
+        not_in_value_set='{new_value} is not in the set of possible '
+                         'values:\n\t{value_set}',
+        value_conflict='{value} cannot be removed from the list of '
+                       'possible values because it is the current value',
+        limit_conflict='new {limit_type} value of {limit_value} is '
+                           '{direction} than the current {conflict_type}: '
+                           '{value}.\n\t'
+                           'The {limit_type} value was not changed.',
+        value_set='\n\tPossible values are:\t{value_set}',
+        max_value='\n\tThe maximum allowable value is: {max_value}',
+        min_value='\n\tThe minimum allowable value is: {min_value}'
+        )
 
     def __init__(self, *args, value_set=None, min_value=None, max_value=None,
                  **kwds):
@@ -413,10 +1253,11 @@ class IntegerV(CustomVariable):
         self._value = None # type int
         self._min_value = None # type int
         self._max_value = None # type int
-        self._value_set = set() # type: Set[int]
+        self._value_set = IntegerIndex() # type: IntegerIndex
         super().__init__(*args, **kwds)
         if value_set is not None:
-            self.add_items(value_set)
+            self._value_set = value_index(value_set, IntegerIndex,
+                                          self.reject_item)
             if self._value is not None and self._value not in self.value_set:
                 self.add_items(self._value)
         if min_value is not None:
@@ -430,12 +1271,12 @@ class IntegerV(CustomVariable):
         try:
             float_value = float(value)
         except ValueError:
-            msg = self.build_message('not_valid', new_value=value)
+            msg = self.lazy_message('not_valid', new_value=value)
             raise NotValidError(msg)
         if float_value.is_integer():
             int_value = int(float_value)
         else:
-            msg = self.build_message('not_valid', new_value=value)
+            msg = self.lazy_message('not_valid', new_value=value)
             raise NotValidError(msg)
         return int_value
 
@@ -554,12 +1395,8 @@ class IntegerV(CustomVariable):
             item_list = items
         else:
             item_list = (items,)
-        for item in item_list:
-            if super().check_validity(item):
-                int_item = self.int_value(item)
-                self._value_set.add(int_item)
-            else:
-                raise self.status
+        self._value_set = self._value_set.union(item_list, self.reject_item)
+        self._coercer = None
 
     def drop_item(self, item: int):
         '''Drop an item from the set of possible values.
@@ -576,7 +1413,8 @@ class IntegerV(CustomVariable):
                                         new_value=int_value)
             raise UnMatchedValuesError(msg)
         else:
-            self._value_set.remove(item)
+            self._value_set = self._value_set.without(int_value)
+            self._coercer = None
 
     def check_validity(self, value)->bool:
         '''Check that value is an integer and is a member of the value set, or
@@ -588,84 +1426,48 @@ class IntegerV(CustomVariable):
         Returns
             True if the value is valid, False otherwise.
         '''
-        # Test for integer as float or string
-        try:
-            int_value = self.int_value(value)
-        except NotValidError:
-            msg = self.build_message('not_valid', new_value=value)
-            self.status = NotValidError(msg)
-            return False
-        if not super().check_validity(int_value):
-            return False
-        # Test integer values
-        if self._value_set and (int_value not in self._value_set):
-            msg = self.build_message('disp_value_set', new_value=value)
-            self.status = NotValidError(msg)
-            return False
-        elif (self.max_value is not None) and (int_value > self.max_value):
-            msg = self.build_message('too_high', new_value=value)
-            self.status = NotValidError(msg)
-            return False
-        elif (self.min_value is not None) and (int_value < self.min_value):
-            msg = self.build_message('too_low', new_value=value)
-            self.status = NotValidError(msg)
-            return False
-        return True
+        return self.test_value(value)
 
-    def set_value(self, value):
-        '''Set a new value for CustomVariable.
+    def compile_coercer(self)->Coercer:
+        '''Build a function that converts a value to an integer and checks
+        that it is a member of the value set or within the minimum to
+        maximum range.
+        Returns:
+            Coercer -- The validation and conversion function.
         '''
-        try:
-            int_value = self.int_value(value)
-        except NotValidError:
-            msg = self.build_message('not_valid', new_value=value)
-            self.status = NotValidError(msg)
-            raise self.status
-        super().set_value(int_value)
+        value_set = value_index(self._value_set, IntegerIndex)
+        max_value = self._max_value
+        min_value = self._min_value
+
+        def to_integer(variable: IntegerV, value: Any)->int:
+            try:
+                float_value = float(value)
+            except (ValueError, TypeError):
+                raise variable.invalid('not_valid', value) from None
+            if float_value.is_integer():
+                return int(float_value)
+            raise variable.invalid('not_valid', value)
 
-    def initialize_messages(self, messages: Dict[str, str]):
-        '''Update message templates.
-        Arguments:
-            length -- A dictionary of message templates referencing
-                IntegerV attributes.
-        '''
-        message_templates = dict(
-            too_high='{new_value} is greater than the maximum allowable '
-                     'value of {max_value}.',
-            too_low='{new_value} is less than the minimum allowable '
-                     'value of {min_value}.',
-            disp_value_set='{new_value} is an invalid value for {name}.'
-                           '\n\tPossible values are: {value_set}',
-            not_in_value_set='{new_value} is not in the set of possible '
-                             'values:\n\t{value_set}',
-            value_conflict='{value} cannot be removed from the list of '
-                           'possible values because it is the current value',
-            limit_conflict='new {limit_type} value of {limit_value} is '
-                               '{direction} than the current {conflict_type}: '
-                               '{value}.\n\t'
-                               'The {limit_type} value was not changed.',
-            value_set='\n\tPossible values are:\t{value_set}',
-            max_value='\n\tThe maximum allowable value is: {max_value}',
-            min_value='\n\tThe minimum allowable value is: {min_value}'
-            )
-        if messages:
-            message_templates.update(messages)
-        super().initialize_messages(message_templates)
-
-    def build_message(self, message: str, **value_set)->str:
-        '''Return a message string using format and a message template.
-        if message is a key in self.messages use the corresponding template,
-        otherwise treat message as a template.
-        Arguments:
-            message {str} -- Either a key in self.messages, or
-                a custom message template.
-            value_set {dict} -- value definition overrides for the message
-                templates.
-        '''
-        values = {'max_value': self.max_value, 'min_value': self.min_value,
-                  'value_set': self.value_set}
-        values.update(value_set)
-        return super().build_message(message, **values)
+        if value_set:
+            def coerce(variable: IntegerV, value: Any)->int:
+                int_value = to_integer(variable, value)
+                if int_value not in value_set:
+                    raise variable.invalid('disp_value_set', value)
+                return int_value
+        elif (max_value is None) and (min_value is None):
+            coerce = to_integer
+        else:
+            upper = float('inf') if max_value is None else max_value
+            lower = float('-inf') if min_value is None else min_value
+
+            def coerce(variable: IntegerV, value: Any)->int:
+                int_value = to_integer(variable, value)
+                if int_value > upper:
+                    raise variable.invalid('too_high', value)
+                if int_value < lower:
+                    raise variable.invalid('too_low', value)
+                return int_value
+        return coerce
 
     def disp(self)->str:
         '''A template formatted string
@@ -685,19 +1487,29 @@ class PathV(CustomVariable):
     '''A File or Directory CustomVariable with:
     Optional limited File Types (file_types),
     Optional Base directory for building the full path (base_directory),
+        or the name of a PathResolver root to use as the base directory (root),
     Option to allow non-existing File or Directory paths (must_exist),
     Optional nickname for a top portion of the full path (top_path_name),
+    The result of the last path check is kept until the next set_value, so
+    that a value checked with check_validity, or by check_path_values, is
+    not checked again.
     '''
     # TODO Add disp method that uses the nickname
-    _name = 'path_variable'
+    __slots__ = ('must_exist', '_file_types', 'base_directory', '_checked')
     _type = Path
+    definition_attributes = ('file_types', 'must_exist', 'base_directory')
+    error_types = (FileTypeError, FileNotFoundError)
     initial_settings = {'default': Path.cwd()}
 
     def __init__(self, *args, file_types: List[str] = None,
-        base_directory: Path = None, must_exist=True, **kwds):
+        base_directory: Path = None, must_exist=True, root: str = None,
+        **kwds):
         '''Create a new instance of the path CustomVariable.
+        If base_directory is not given, the base directory is the root
+        from the shared PathResolver.
         '''
         self._value = None # type Path
+        self._checked = None
         self.must_exist = must_exist # type bool
         if file_types:
             self._file_types = FileTypes(file_types)
@@ -706,7 +1518,7 @@ class PathV(CustomVariable):
         if base_directory:
             self.base_directory = base_directory
         else:
-            self.base_directory = set_base_dir()
+            self.base_directory = get_resolver().root(root)
         super().__init__(*args, **kwds)
 
     def get_types(self)->List[str]:
@@ -716,6 +1528,15 @@ class PathV(CustomVariable):
         type_names = [type_set[0] for type_set in self._file_types]
         return type_names
 
+    def definition(self)->Dict[str, Any]:
+        '''Return a variable definition that will recreate the PathV.
+        The file types are saved as selected, so that the "directory" type
+        is included.
+        '''
+        variable_def = super().definition()
+        variable_def['file_types'] = list(self._file_types.selection_list)
+        return variable_def
+
     def set_types(self, file_types: List[str]):
         '''Define the valid file types.
         Create a FileTypes instance defining valid file types.
@@ -762,24 +1583,87 @@ class PathV(CustomVariable):
             True if the value is valid, False otherwise.
         '''
         try:
-            make_full_path(value, self._file_types, self.must_exist,
-                           self.base_directory)
-        except (FileTypeError, FileNotFoundError) as err:
-            self.status = err
+            full_path = self.get_coercer()(self, value)
+        except self.error_types as err:
+            self.remember_check(value, err)
             return False
+        self.remember_check(value, full_path)
         return True
 
+    def path_check(self, value: PathInput)->PathCheck:
+        '''Return the make_full_path arguments for value.
+        Arguments:
+            value {Path, str} -- The value to be tested.
+        Returns:
+            PathCheck -- The check_paths arguments for value.
+        '''
+        return (value, self._file_types, self.must_exist, self.base_directory)
+
+    def remember_check(self, value: PathInput,
+                       result: Union[Path, Exception]):
+        '''Keep the result of a path check for the next set_value.
+        Arguments:
+            value {Path, str} -- The value tested.
+            result {Union[Path, Exception]} -- The full path, or the error
+                found.
+        '''
+        self._checked = (value, result, self.get_coercer())
+
+    def take_check(self, value: PathInput)->Union[Path, Exception, None]:
+        '''Return and clear the saved path check result for value.
+        The result is only used if the validity conditions have not changed
+        since the check.
+        Arguments:
+            value {Path, str} -- The value being set.
+        Returns:
+            Union[Path, Exception, None] -- The full path, the error found,
+                or None if value has not been checked.
+        '''
+        checked = self._checked
+        if checked is None:
+            return None
+        self._checked = None
+        checked_value, result, coercer = checked
+        if coercer is not self._coercer:
+            return None
+        if type(checked_value) is not type(value) or checked_value != value:
+            return None
+        return result
+
     def set_value(self, value):
         '''Set a new value for CustomVariable.
+        Uses the result of a previous check of the same value if there is
+        one.
         '''
-        try:
-            path_value = make_full_path(value, self._file_types,
-                                        self.must_exist,
-                                        self.base_directory)
-        except (FileTypeError, FileNotFoundError) as err:
-            self.status = err
-            raise self.status
-        return super().set_value(path_value)
+        result = self.take_check(value)
+        if result is None:
+            super().set_value(value)
+        elif isinstance(result, Exception):
+            self.status = result
+            raise result
+        else:
+            self.store_value(result)
+
+    value = property(CustomVariable.get_value, set_value)
+
+    def compile_coercer(self)->Coercer:
+        '''Build a function that converts a value into a full path and
+        checks the file type and, if required, that the path exists.
+        Returns:
+            Coercer -- The validation and conversion function.
+        '''
+        file_types = self._file_types
+        must_exist = self.must_exist
+        base_directory = self.base_directory
+
+        def coerce(variable: PathV, value: PathInput)->Path:
+            try:
+                return make_full_path(value, file_types, must_exist,
+                                      base_directory)
+            except (FileTypeError, FileNotFoundError) as err:
+                variable.status = err
+                raise
+        return coerce
 
 
 class StrPathV(PathV):
@@ -789,6 +1673,8 @@ class StrPathV(PathV):
     Option to allow non-existing File or Directory paths (must_exist),
     Optional nickname for a top portion of the full path (top_path_name),
     '''
+    __slots__ = ()
+
     def get_value(self):
         '''Return the path value as a string.
         '''
@@ -812,13 +1698,21 @@ class BoolV(CustomVariable):
         'YES', 'Y', 'TRUE', 'T', 1 as True
         'NO', 'N', 'FALSE', 'F', 0, -1 as False
     '''
-    _name = 'bool_variable'
+    __slots__ = ('truth_values', 'false_values')
     _type = bool
+    definition_attributes = ('truth_values', 'false_values')
+    error_types = (TypeError,)
     initial_settings = {
         'default': True,
         'truth_values': {'YES', 'Y', 'TRUE', 'T', '1'},
         'false_values': {'NO', 'N', 'FALSE', 'F', '0', '-1'}
         }
+    message_templates = dict(
+        truth_values='Input values that return True are:'
+                     '\n\t{truth_values}.',
+        false_values='Input values that return False are:'
+                     '\n\t{false_values}.'
+        )
 
     def __init__(self, *args, truth_values: Set[str] = None,
                  false_values: Set[str] = None, **kwds):
@@ -841,39 +1735,24 @@ class BoolV(CustomVariable):
         Returns
             True if the value is valid, False otherwise.
         '''
-        try:
-            logic_match(value, self.truth_values, self.false_values)
-        except (TypeError) as err:
-            self.status = err
-            return False
-        return True
+        return self.test_value(value)
 
-    def set_value(self, value):
-        '''Set a new value for CustomVariable.
+    def compile_coercer(self)->Coercer:
+        '''Build a function that converts a value into a boolean using the
+        truth_values and false_values.
+        Returns:
+            Coercer -- The validation and conversion function.
         '''
-        try:
-            bool_value = logic_match(value, self.truth_values,
-                                                          self.false_values)
-        except (TypeError) as err:
-            self.status = err
-            raise err
-        super().set_value(bool_value)
-
-    def initialize_messages(self, messages: Dict[str, str]):
-        '''Update message templates.
-        Arguments:
-            messages -- A dictionary of message templates referencing
-                StringV attributes.
-        '''
-        message_templates = dict(
-            truth_values='Input values that return True are:'
-                         '\n\t{truth_values}.',
-            false_values='Input values that return False are:'
-                         '\n\t{false_values}.'
-            )
-        if messages:
-            message_templates.update(messages)
-        super().initialize_messages(message_templates)
+        truth_values = frozenset(self.truth_values)
+        false_values = frozenset(self.false_values)
+
+        def coerce(variable: BoolV, value: Any)->bool:
+            try:
+                return logic_match(value, truth_values, false_values)
+            except TypeError as err:
+                variable.status = err
+                raise
+        return coerce
 
     def disp(self)->str:
         '''A template formatted string
@@ -884,12 +1763,308 @@ class BoolV(CustomVariable):
         return disp_str
 
 
+def serial_value(value: Any)->Any:
+    '''Convert a CustomVariable attribute or value for saving.
+    Paths are converted to strings; sets, string indexes and tuples to
+    lists.  An IntegerIndex is converted to a dictionary holding a list of
+    its inclusive (first, last) intervals, so that large ranges are not
+    expanded; restore_serial rebuilds it.
+    Arguments:
+        value {Any} -- The value to convert.
+    Returns:
+        Any -- A value that can be saved as JSON or packed.
+    '''
+    if isinstance(value, Path):
+        return str(value)
+    if isinstance(value, IntegerIndex):
+        return {INTEGER_RANGES_KEY: [list(interval) for interval in
+                                     zip(value._start_list, value._end_list)]}
+    if isinstance(value, ValueIndex):
+        return list(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted((serial_value(item) for item in value), key=str)
+    if isinstance(value, tuple):
+        return [serial_value(item) for item in value]
+    return value
+
+
+def restore_serial(value: Any)->Any:
+    '''Rebuild an IntegerIndex converted by serial_value.
+    Arguments:
+        value {Any} -- A saved value.
+    Returns:
+        Any -- The IntegerIndex for a saved IntegerIndex, otherwise value.
+    '''
+    if isinstance(value, dict) and INTEGER_RANGES_KEY in value:
+        return IntegerIndex.from_ranges(value[INTEGER_RANGES_KEY])
+    return value
+
+
+def pack_length(tag: bytes, length: int)->bytes:
+    '''Return the type tag and length for text, lists and dictionaries.
+    Arguments:
+        tag {bytes} -- The lower case type tag.
+        length {int} -- The length of the item.
+    Returns:
+        bytes -- The upper case tag and 1 byte length, if length is less than
+            256, otherwise the tag and 4 byte length.
+    '''
+    if length < 256:
+        return tag.upper() + SHORT_LENGTH_FORMAT.pack(length)
+    return tag + LENGTH_FORMAT.pack(length)
+
+
+def pack_data(data: Any, buffer: bytearray = None)->bytearray:
+    '''Pack basic python data into a compact binary form.
+    Each item is stored as a one byte type tag followed by the packed data:
+        N: None, T: True, F: False,
+        j: 1 byte integer, i: 8 byte integer, b: larger integer (as text),
+        f: 8 byte float, s: text, l: list, d: dictionary with text keys.
+    Text, lists and dictionaries are preceded by a 4 byte length, or for
+    lengths less than 256, a 1 byte length with the tag in upper case.
+    Arguments:
+        data {Any} -- Combination of None, bool, int, float, str, list,
+            tuple and dict.
+        buffer {bytearray, optional} -- The buffer to append to.
+    Raises:
+        TypeError -- If data contains another type.
+    Returns:
+        bytearray -- The packed data.
+    '''
+    if buffer is None:
+        buffer = bytearray()
+    if data is None:
+        buffer += b'N'
+    elif data is True:
+        buffer += b'T'
+    elif data is False:
+        buffer += b'F'
+    elif isinstance(data, int):
+        if -128 <= data < 128:
+            buffer += b'j' + SMALL_INT_FORMAT.pack(data)
+        elif -2**63 <= data < 2**63:
+            buffer += b'i' + INT_FORMAT.pack(data)
+        else:
+            text = str(data).encode('utf-8')
+            buffer += pack_length(b'b', len(text)) + text
+    elif isinstance(data, float):
+        buffer += b'f' + FLOAT_FORMAT.pack(data)
+    elif isinstance(data, str):
+        text = data.encode('utf-8')
+        buffer += pack_length(b's', len(text)) + text
+    elif isinstance(data, (list, tuple)):
+        buffer += pack_length(b'l', len(data))
+        for item in data:
+            pack_data(item, buffer)
+    elif isinstance(data, dict):
+        buffer += pack_length(b'd', len(data))
+        for key, item in data.items():
+            pack_data(str(key), buffer)
+            pack_data(item, buffer)
+    else:
+        msg = 'Cannot pack data of type {}'.format(get_class_name(type(data)))
+        raise TypeError(msg)
+    return buffer
+
+
+def unpack_data(data: bytes, offset: int = 0)->Tuple[Any, int]:
+    '''Unpack data packed with pack_data.
+    Arguments:
+        data {bytes} -- The packed data.
+        offset {int, optional} -- The starting position in data.
+    Raises:
+        ValueError -- If data contains an unknown type tag.
+    Returns:
+        Tuple[Any, int] -- The unpacked data and the position following it.
+    '''
+    tag = bytes(data[offset:offset + 1])
+    offset += 1
+    if tag in (b'S', b'B', b'L', b'D'):
+        length = data[offset]
+        offset += 1
+        tag = tag.lower()
+    elif tag in (b's', b'b', b'l', b'd'):
+        length = LENGTH_FORMAT.unpack_from(data, offset)[0]
+        offset += 4
+    if tag == b'N':
+        return None, offset
+    if tag == b'T':
+        return True, offset
+    if tag == b'F':
+        return False, offset
+    if tag == b'j':
+        return SMALL_INT_FORMAT.unpack_from(data, offset)[0], offset + 1
+    if tag == b'i':
+        return INT_FORMAT.unpack_from(data, offset)[0], offset + 8
+    if tag == b'f':
+        return FLOAT_FORMAT.unpack_from(data, offset)[0], offset + 8
+    if tag in (b's', b'b'):
+        text = bytes(data[offset:offset + length]).decode('utf-8')
+        if tag == b'b':
+            return int(text), offset + length
+        return text, offset + length
+    if tag == b'l':
+        items = list()
+        for _ in range(length):
+            item, offset = unpack_data(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == b'd':
+        items = dict()
+        for _ in range(length):
+            key, offset = unpack_data(data, offset)
+            items[key], offset = unpack_data(data, offset)
+        return items, offset
+    raise ValueError('Unknown data type tag: {}'.format(tag))
+
+
+def payload_checksum(body: bytes, key: bytes = None)->str:
+    '''Calculate the checksum for a saved CustomVariableSet.
+    Without a key the checksum only guards against accidental changes to
+    the saved data, so saved values are always validated when they are
+    restored.  With a private key the checksum also guards against
+    deliberate changes, and values with a matching checksum are restored
+    without being validated.
+    Arguments:
+        body {bytes} -- The saved data.
+        key {bytes, optional} -- The key for the keyed hash.
+    Returns:
+        str -- The hexadecimal checksum.
+    '''
+    if key is None:
+        key = b''
+    return hmac.new(key, bytes(body), hashlib.sha256).hexdigest()
+
+
+def check_path_values(path_values: List[Tuple[PathV, PathInput]],
+                      max_workers: int = None):
+    '''Check a group of PathV values together.
+    The directory listings and file checks are shared using check_paths.
+    Each result is kept by its PathV and used by the next set_value with
+    the same value.
+    Arguments:
+        path_values {List[Tuple[PathV, PathInput]]} -- The PathV
+            CustomVariables and the values to check.
+        max_workers {int, optional} -- The number of threads to use.
+    '''
+    path_checks = [variable.path_check(value)
+                   for variable, value in path_values]
+    results = check_paths(path_checks, max_workers)
+    for (variable, value), result in zip(path_values, results):
+        variable.remember_check(value, result)
+
+
+def build_variable(variable_def: Dict[str, Any], defaults: Dict[str, Any],
+                   logger=None)->CustomVariable:
+    '''Create a CustomVariable from a variable definition.
+    Arguments:
+        variable_def {Dict[str, Any]} -- The variable definition.  Contains
+            either the key 'CustomVariable' with an existing CustomVariable
+            instance, or the key 'variable_type' with the CustomVariable
+            class to create.  The remaining items are CustomVariable
+            attributes.  Integer indexes saved by serial_value are rebuilt.
+        defaults {Dict[str, Any]} -- Default attribute values.
+        logger {logging.Logger, optional} -- Logger for the definitions.
+    Returns:
+        CustomVariable -- The new or updated CustomVariable.
+    '''
+    local_variable_def = defaults.copy()
+    local_variable_def.update((attr, restore_serial(value))
+                              for attr, value in variable_def.items())
+    if logger:
+        logging_tools.log_dict(logger, local_variable_def,
+                               'local_variable_def')
+    if 'CustomVariable' in local_variable_def:
+        new_variable = local_variable_def.pop('CustomVariable')
+        new_variable.set_attributes(**local_variable_def)
+    else:
+        var_type = local_variable_def.pop('variable_type')
+        new_variable = var_type(**local_variable_def)
+    return new_variable
+
+
+def freeze_definition(variable_def: Dict[str, Any])->Mapping[str, Any]:
+    '''Return a read-only copy of a variable definition.
+    Lists, dictionaries and sets in the definition are also copied, so that
+    changes made to the original definition afterwards can be found by
+    comparing it with the copy.  CustomVariable instances are not copied.
+    Arguments:
+        variable_def {Dict[str, Any]} -- The variable definition.
+    Returns:
+        Mapping[str, Any] -- The read-only copy.
+    '''
+    return MappingProxyType({
+        attr: value.copy() if type(value) in (list, dict, set) else value
+        for attr, value in variable_def.items()})
+
+
+class VariableSchema():
+    '''The CustomVariables defined by a list of variable definitions.
+    The CustomVariables are built, and their coercers compiled, once.  Each
+    CustomVariableSet receives clones of these prototypes, so creating a set
+    only allocates the per-instance values.
+    The schema keeps read-only copies of the definitions it was built from,
+    so that changes to the definitions can be detected.
+    '''
+    __slots__ = ('source', 'definitions', 'names', 'prototypes')
+
+    def __init__(self, variable_definitions: List[Dict[str, Any]],
+                 defaults: Dict[str, Any], logger=None):
+        '''Build the prototype CustomVariables.
+        Arguments:
+            variable_definitions {List[Dict[str, Any]]} -- The variable
+                definitions.
+            defaults {Dict[str, Any]} -- Default attribute values.
+            logger {logging.Logger, optional} -- Logger for the definitions.
+        '''
+        definitions = tuple(freeze_definition(variable_def)
+                            for variable_def in variable_definitions)
+        prototypes = list()
+        for variable_def in definitions:
+            new_variable = build_variable(variable_def, defaults, logger)
+            new_variable.get_coercer()
+            prototypes.append(new_variable)
+        self.source = variable_definitions
+        self.definitions = definitions
+        self.prototypes = tuple(prototypes)
+        self.names = tuple(variable.name for variable in prototypes)
+
+    def matches(self, variable_definitions: List[Dict[str, Any]])->bool:
+        '''Test whether the schema was built from variable_definitions.
+        Arguments:
+            variable_definitions {List[Dict[str, Any]]} -- The current
+                variable definitions.
+        Returns:
+            bool -- False if a different or extended list is in use, or if
+                any of the definitions has been changed.
+        '''
+        return (variable_definitions is self.source and
+                len(variable_definitions) == len(self.definitions) and
+                all(variable_def == frozen_def
+                    for variable_def, frozen_def in zip(variable_definitions,
+                                                        self.definitions)))
+
+    def new_variables(self)->List[CustomVariable]:
+        '''Return new copies of the prototype CustomVariables.
+        '''
+        return [prototype.clone() for prototype in self.prototypes]
+
+
 class CustomVariableSet(OrderedDict):
     '''This defines a collection of custom variables.
         For each CustomVariable the following instance attributes are added:
             required (bool): True if the CustomVariable is required. Default is True
             on_update (method):  Method of the CustomVariableSet SubClass to execute
                 when the CustomVariable is updated. Default is None.
+                Can be the name of the method or a function taking the
+                CustomVariableSet and the CustomVariable name.
+
+        Changes to CustomVariable values are tracked:
+            Each changed CustomVariable is marked as dirty.
+            Changes made within a batch (including a single set_values call)
+            are combined: the version counter is incremented once, on_update
+            is called once for each changed CustomVariable and the observers
+            are called once with the list of changed CustomVariable names.
 
         New CustomVariable sets can be defined as a combination of other
         CustomVariableSet subclasses
@@ -933,26 +2108,156 @@ class CustomVariableSet(OrderedDict):
        #FIXME variable_values should only pass values and not set other attributes
         super().__init__()
         if variable_definitions:
-            self.variable_definitions.extend(variable_definitions)
+            self.variable_definitions = (list(self.variable_definitions) +
+                                         list(variable_definitions))
         self.define_variables()
         remaining_items = self.initialize_variables(variable_values)
         self.update(remaining_items)
+        self.initialize_tracking()
+
+    def initialize_tracking(self):
+        '''Start tracking changes to the CustomVariable values.
+        The version is set to 0 and all CustomVariables are marked as clean.
+        '''
+        self.version = 0
+        self.observers = list()  # type: List[SetObserver]
+        self._changed = OrderedDict()
+        self._batch_depth = 0
+        for variable in self.values():
+            if isinstance(variable, CustomVariable):
+                variable.dirty = False
+                variable.set_listener(self.variable_changed)
+
+    def add_observer(self, observer: SetObserver):
+        '''Add a function to be called when CustomVariable values change.
+        Arguments:
+            observer {SetObserver} -- A callable taking the CustomVariableSet
+                and a list of the names of the changed CustomVariables.
+        '''
+        if observer not in self.observers:
+            self.observers.append(observer)
+
+    def remove_observer(self, observer: SetObserver):
+        '''Stop calling observer when CustomVariable values change.
+        Arguments:
+            observer {SetObserver} -- An observer added with add_observer.
+        '''
+        if observer in self.observers:
+            self.observers.remove(observer)
+
+    def variable_changed(self, variable: CustomVariable):
+        '''Record a changed CustomVariable.
+        Outside of a batch, the change is reported immediately.
+        Arguments:
+            variable {CustomVariable} -- The changed CustomVariable.
+        '''
+        self._changed[variable.name] = variable
+        if not self._batch_depth:
+            self.notify()
+
+    @contextmanager
+    def batch(self):
+        '''Combine all changes made within the context into one update.
+        Batches can be nested; changes are reported when the outermost batch
+        ends, even if it ends with an exception.
+        '''
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.notify()
+
+    def run_update(self, variable: CustomVariable):
+        '''Call the on_update method for a changed CustomVariable.
+        Arguments:
+            variable {CustomVariable} -- The changed CustomVariable.
+        '''
+        on_update = getattr(variable, 'on_update', None)
+        if on_update is None:
+            return
+        if isinstance(on_update, str):
+            getattr(self, on_update)(variable.name)
+        else:
+            on_update(self, variable.name)
+
+    def notify(self):
+        '''Report the changes recorded since the last notification.
+        Increment the version, call on_update for each changed
+        CustomVariable and then call the observers.
+        '''
+        if not self._changed:
+            return
+        changed = self._changed
+        self._changed = OrderedDict()
+        self.version += 1
+        for variable in changed.values():
+            self.run_update(variable)
+        changed_names = list(changed)
+        for observer in list(self.observers):
+            observer(self, changed_names)
+
+    def check_paths(self, variable_values: Dict[str, Any]):
+        '''Check the values for all PathV CustomVariables together.
+        The results are used when the values are set.  Nothing is done unless
+        there are at least two PathV values.
+        Arguments:
+            variable_values {Dict[str, Any]} -- The new values, indexed by
+                CustomVariable name.
+        '''
+        path_values = [(self[name], value)
+                       for name, value in variable_values.items()
+                       if isinstance(self.get(name), PathV)]
+        if len(path_values) > 1:
+            check_path_values(path_values)
+
+    def dirty_variables(self)->List[str]:
+        '''Return the names of the CustomVariables changed since they were
+        last marked as clean.
+        '''
+        return [name for name, variable in self.items()
+                if isinstance(variable, CustomVariable) and variable.dirty]
+
+    def mark_clean(self, *variable_names: Tuple[str]):
+        '''Clear the dirty flag of the CustomVariables.
+        Arguments:
+            variable_names {str} -- The names of the CustomVariables to mark.
+                If none are given, all CustomVariables are marked as clean.
+        '''
+        if not variable_names:
+            variable_names = self.dirty_variables()
+        for variable_name in variable_names:
+            self[variable_name].dirty = False
+
+    @classmethod
+    def schema(cls)->VariableSchema:
+        '''Return the schema for the class variable definitions.
+        The schema is built the first time it is requested and rebuilt only
+        if variable_definitions is replaced or extended, or one of its
+        definitions is changed.
+        Returns:
+            VariableSchema -- The prototype CustomVariables for the class.
+        '''
+        schema = cls.__dict__.get('_schema')
+        if schema is None or not schema.matches(cls.variable_definitions):
+            schema = VariableSchema(cls.variable_definitions, cls.defaults,
+                                    cls.logger)
+            setattr(cls, '_schema', schema)
+        return schema
 
     def define_variables(self):
         '''Insert the CustomVariable class definitions.
+        Variable definitions given when the instance was created are built
+        for this instance only.
         '''
-        for variable_def in self.variable_definitions:
-            local_variable_def = self.defaults.copy()
-            local_variable_def.update(variable_def)
-            logging_tools.log_dict(self.logger, local_variable_def, 'local_variable_def')
-            if 'CustomVariable' in local_variable_def:
-                new_variable = local_variable_def.pop('CustomVariable')
-                new_variable.set_attributes(**local_variable_def)
-            else:
-                var_type = local_variable_def.pop('variable_type')
-                logging_tools.log_dict(self.logger, local_variable_def, 'variable attributes')
-                new_variable = var_type(**local_variable_def)
-            self[new_variable.name] = new_variable
+        if 'variable_definitions' in self.__dict__:
+            schema = VariableSchema(self.variable_definitions, self.defaults,
+                                    self.logger)
+        else:
+            schema = self.schema()
+        for name, new_variable in zip(schema.names, schema.new_variables()):
+            self[name] = new_variable
 
     def initialize_variables(self, variable_values: dict)->dict:
         '''set initial values for parameters.
@@ -967,6 +2272,7 @@ class CustomVariableSet(OrderedDict):
         '''
         logging_tools.log_dict(self.logger, variable_values, 'variable_values')
         local_values_def = variable_values.copy()
+        self.check_paths(local_values_def)
         for variable_name in self.keys():
             if variable_name in local_values_def:
                 new_value = local_values_def.pop(variable_name)
@@ -1081,33 +2387,244 @@ class CustomVariableSet(OrderedDict):
         if value_set:
             self.logger.debug('value_set: %s', value_set)
             if len(value_set) == len(self):
-                for parameter_name, new_value in zip(self.keys(), value_set):
-                    self[parameter_name].value = new_value
+                self.check_paths(dict(zip(self.keys(), value_set)))
+                with self.batch():
+                    for parameter_name, new_value in zip(self.keys(),
+                                                         value_set):
+                        self[parameter_name].set_value(new_value)
             else:
                 msg_template = 'Expected {} values, got {} values.'
                 msg = msg_template.format(len(self), len(value_set))
                 raise UnMatchedValuesError(msg)
         elif variable_values:
-            for name, value in variable_values.items():
-                if name in self:
-                    self[name].value = value
-                else:
-                    msg = '{} is not contained in the CustomVariable Set'
-                    msg_str = msg.format(name)
-                    raise NotVariableError(msg_str)
+            self.check_paths(variable_values)
+            with self.batch():
+                for name, value in variable_values.items():
+                    if name in self:
+                        self[name].set_value(value)
+                    else:
+                        msg = '{} is not contained in the CustomVariable Set'
+                        msg_str = msg.format(name)
+                        raise NotVariableError(msg_str)
+
+    def to_payload(self)->Dict[str, Any]:
+        '''Return the variable definitions and values as basic python data.
+        Items that are not CustomVariables are included as they are, so they
+        must be basic python data to be saved.
+        Returns:
+            Dict[str, Any] -- The set type, a list of variable definitions,
+                including the values of initialized variables, and the
+                other items.
+        '''
+        variables = list()
+        items = dict()
+        for name, variable in self.items():
+            if isinstance(variable, CustomVariable):
+                variable_def = variable.definition()
+                if variable.is_initialized():
+                    variable_def['value'] = serial_value(variable._value)
+                variables.append(variable_def)
+            else:
+                items[name] = serial_value(variable)
+        return {'set_type': type_key(type(self)),
+                'variables': variables,
+                'items': items}
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any], validate=True):
+        '''Create a CustomVariableSet from data produced by to_payload.
+        The saved attributes and values are applied to the CustomVariables
+        defined by the class, so class settings that are not saved, such as
+        on_update, are kept.  Saved variables that the class does not define
+        are created from their saved definitions.
+        Arguments:
+            payload {Dict[str, Any]} -- The variable definitions and values.
+            validate {bool, optional} -- If False, the saved values are
+                restored without being checked.  Default is True.
+        Raises:
+            SetTypeError -- If the data was saved from a different
+                CustomVariableSet class.
+            NotVariableError -- If a saved variable type is not a
+                CustomVariable type, or is not the type defined by the class.
+        Returns:
+            CustomVariableSet -- The restored CustomVariableSet.
+        '''
+        set_type = type_key(cls)
+        if payload.get('set_type') != set_type:
+            msg = 'The data was saved from a {}, not a {}.'
+            raise SetTypeError(msg.format(payload.get('set_type'), set_type))
+        new_set = cls.__new__(cls)
+        OrderedDict.__init__(new_set)
+        schema = cls.schema()
+        for name, new_variable in zip(schema.names, schema.new_variables()):
+            new_set[name] = new_variable
+        for saved_def in payload['variables']:
+            variable_def = dict(saved_def)
+            type_name = variable_def.pop('variable_type')
+            has_value = 'value' in variable_def
+            value = variable_def.pop('value', None)
+            prototype = new_set.get(variable_def['name'])
+            defaults = cls.defaults
+            if prototype is None:
+                try:
+                    variable_def['variable_type'] = VARIABLE_TYPES[type_name]
+                except KeyError:
+                    msg = '{} is not a CustomVariable type'.format(type_name)
+                    raise NotVariableError(msg) from None
+            elif type_key(type(prototype)) != type_name:
+                msg = '{} was saved as a {}, but {} defines it as a {}'
+                raise NotVariableError(msg.format(
+                    prototype.name, type_name, set_type,
+                    type_key(type(prototype))))
+            else:
+                variable_def['variable_type'] = type(prototype)
+                defaults = dict(defaults, **prototype.unsaved_settings())
+            new_variable = build_variable(variable_def, defaults)
+            new_set[new_variable.name] = new_variable
+            if has_value and validate:
+                new_variable.set_value(value)
+            elif has_value:
+                new_variable.restore_value(value)
+        new_set.update((name, restore_serial(item))
+                       for name, item in payload.get('items', {}).items())
+        new_set.initialize_tracking()
+        return new_set
+
+    def to_json(self, key: bytes = None)->str:
+        '''Save the variable definitions and values as a JSON string.
+        Arguments:
+            key {bytes, optional} -- The key used for the checksum.
+        Returns:
+            str -- The JSON string, containing the checksum and the data.
+        '''
+        body = json.dumps(self.to_payload(), sort_keys=True,
+                          separators=(',', ':'))
+        checksum = payload_checksum(body.encode('utf-8'), key)
+        return '{{"checksum":"{}","data":{}}}'.format(checksum, body)
+
+    @classmethod
+    def from_json(cls, json_str: str, key: bytes = None):
+        '''Restore a CustomVariableSet saved with to_json.
+        The values are validated unless a key is given and the checksum
+        matches.
+        Arguments:
+            json_str {str} -- The saved JSON string.
+            key {bytes, optional} -- The key used for the checksum.
+        Returns:
+            CustomVariableSet -- The restored CustomVariableSet.
+        '''
+        saved = json.loads(json_str)
+        payload = saved['data']
+        body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+        matched = hmac.compare_digest(
+            payload_checksum(body.encode('utf-8'), key),
+            saved.get('checksum', ''))
+        if not matched:
+            cls.logger.warning('Checksum does not match, validating values.')
+        trusted = matched and key is not None
+        return cls.from_payload(payload, validate=not trusted)
+
+    def to_bytes(self, key: bytes = None)->bytes:
+        '''Save the variable definitions and values in a compact binary form.
+        The data begins with PACKED_HEADER followed by the 32 byte checksum,
+        the length of the definitions, the definitions as compact JSON and
+        finally the variable values and other items packed with pack_data.
+        Arguments:
+            key {bytes, optional} -- The key used for the checksum.
+        Returns:
+            bytes -- The packed data.
+        '''
+        payload = self.to_payload()
+        values = dict()
+        for variable_def in payload['variables']:
+            if 'value' in variable_def:
+                values[variable_def['name']] = variable_def.pop('value')
+        definitions = json.dumps(
+            {'set_type': payload['set_type'],
+             'variables': payload['variables']},
+            separators=(',', ':')).encode('utf-8')
+        body = bytearray(LENGTH_FORMAT.pack(len(definitions)))
+        body += definitions
+        pack_data([values, payload['items']], body)
+        checksum = bytes.fromhex(payload_checksum(body, key))
+        return PACKED_HEADER + checksum + bytes(body)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, key: bytes = None):
+        '''Restore a CustomVariableSet saved with to_bytes.
+        The values are validated unless a key is given and the checksum
+        matches.
+        Arguments:
+            data {bytes} -- The packed data.
+            key {bytes, optional} -- The key used for the checksum.
+        Raises:
+            ValueError -- If data does not begin with PACKED_HEADER.
+        Returns:
+            CustomVariableSet -- The restored CustomVariableSet.
+        '''
+        if not data.startswith(PACKED_HEADER):
+            raise ValueError('Not a packed CustomVariableSet.')
+        start = len(PACKED_HEADER)
+        checksum = data[start:start + 32]
+        body = memoryview(data)[start + 32:]
+        matched = hmac.compare_digest(
+            bytes.fromhex(payload_checksum(body, key)), checksum)
+        if not matched:
+            cls.logger.warning('Checksum does not match, validating values.')
+        trusted = matched and key is not None
+        length = LENGTH_FORMAT.unpack_from(body)[0]
+        offset = LENGTH_FORMAT.size
+        payload = json.loads(bytes(body[offset:offset + length]))
+        (values, items), _ = unpack_data(body, offset + length)
+        for variable_def in payload['variables']:
+            if variable_def['name'] in values:
+                variable_def['value'] = values[variable_def['name']]
+        payload['items'] = items
+        return cls.from_payload(payload, validate=not trusted)
+
+    def dump(self, file_name: PathInput, binary=False, key: bytes = None):
+        '''Save the CustomVariableSet to a file.
+        Arguments:
+            file_name {PathInput} -- The file to save to.
+            binary {bool, optional} -- If True use the compact binary form,
+                otherwise use JSON.  Default is False.
+            key {bytes, optional} -- The key used for the checksum.
+        '''
+        if binary:
+            Path(file_name).write_bytes(self.to_bytes(key))
+        else:
+            Path(file_name).write_text(self.to_json(key), encoding='utf-8')
+
+    @classmethod
+    def load(cls, file_name: PathInput, key: bytes = None):
+        '''Restore a CustomVariableSet saved with dump.
+        The binary or JSON form is identified from the file contents.
+        The values are validated unless a key is given and the checksum
+        matches.
+        Arguments:
+            file_name {PathInput} -- The saved file.
+            key {bytes, optional} -- The key used for the checksum.
+        Returns:
+            CustomVariableSet -- The restored CustomVariableSet.
+        '''
+        data = Path(file_name).read_bytes()
+        if data.startswith(PACKED_HEADER):
+            return cls.from_bytes(data, key)
+        return cls.from_json(data.decode('utf-8'), key)
 
     def drop(self, *variable_names: Tuple[str]):
         '''Set a CustomVariable to its uninitialized state.
         Arguments:
             variable_names {str} -- The name of the CustomVariable
         '''
-        for variable_name in variable_names:
-            if variable_name in self:
-                self[variable_name].drop_value()
-            else:
-                msg = '{} is not contained in the CustomVariable Set'
-                msg_str = msg.format(variable_name)
-                raise NotVariableError(msg_str)
+        with self.batch():
+            for variable_name in variable_names:
+                if variable_name in self:
+                    self[variable_name].drop_value()
+                else:
+                    msg = '{} is not contained in the CustomVariable Set'
+                    msg_str = msg.format(variable_name)
+                    raise NotVariableError(msg_str)
 
     def extract_set(self, set_type: type):
         '''extract a sub-CustomVariable set.
@@ -1132,3 +2649,231 @@ class CustomVariableSet(OrderedDict):
             variable_definitions {[type]} -- [description]
         '''
         pass
+
+
+def check_string_column(variable: StringV,
+                        column: pd.Series)->Tuple[pd.Series, pd.Series]:
+    '''Vectorised version of StringV.check_validity.
+    Arguments:
+        variable {StringV} -- The variable defining the validity conditions.
+        column {pd.Series} -- The (non-missing) values to check.
+    Returns:
+        Tuple[pd.Series, pd.Series] -- The coerced values and a boolean
+            Series that is True for valid values.
+    '''
+    column_type = pd.api.types.infer_dtype(column, skipna=True)
+    if column_type in ('string', 'empty'):
+        is_string = pd.Series(True, index=column.index)
+    elif column_type.startswith('mixed'):
+        is_string = column.map(lambda value: isinstance(value, str))
+    else:
+        is_string = pd.Series(False, index=column.index)
+    valid = is_string.astype(bool)
+    if variable.value_set:
+        value_set = value_index(variable.value_set, StringIndex)
+        valid &= value_set.contains(column)
+    elif variable.max_length:
+        length = column.where(valid, '').str.len()
+        valid &= length <= variable.max_length
+    coerced = column.where(valid).astype(object)
+    return coerced, valid
+
+
+def check_integer_column(variable: IntegerV,
+                         column: pd.Series)->Tuple[pd.Series, pd.Series]:
+    '''Vectorised version of IntegerV.check_validity.
+    Strings and floats representing integers are accepted, as they are by
+    IntegerV.int_value.
+    Arguments:
+        variable {IntegerV} -- The variable defining the validity conditions.
+        column {pd.Series} -- The (non-missing) values to check.
+    Returns:
+        Tuple[pd.Series, pd.Series] -- The coerced values as an Int64 Series
+            and a boolean Series that is True for valid values.
+    '''
+    numbers = pd.to_numeric(column, errors='coerce').astype(float)
+    valid = numbers.notna() & (numbers % 1 == 0)
+    if variable.value_set:
+        value_set = value_index(variable.value_set, IntegerIndex)
+        valid &= value_set.contains(numbers)
+    else:
+        if variable.max_value is not None:
+            valid &= numbers <= variable.max_value
+        if variable.min_value is not None:
+            valid &= numbers >= variable.min_value
+    coerced = numbers.where(valid).astype('Int64')
+    return coerced, valid
+
+
+def check_bool_column(variable: BoolV,
+                      column: pd.Series)->Tuple[pd.Series, pd.Series]:
+    '''Vectorised version of BoolV.set_value.
+    Values matching truth_values or false_values (case insensitive) are
+    converted accordingly, all other values are converted using bool, as is
+    done by logic_match.
+    Arguments:
+        variable {BoolV} -- The variable defining the truth and false values.
+        column {pd.Series} -- The (non-missing) values to check.
+    Returns:
+        Tuple[pd.Series, pd.Series] -- The coerced values as a boolean Series
+            and a boolean Series that is True for valid values.
+    '''
+    value_str = column.astype(str).str.upper()
+    truth = column.astype(object).astype(bool)
+    truth = truth.mask(value_str.isin(list(variable.false_values)), False)
+    truth = truth.mask(value_str.isin(list(variable.truth_values)), True)
+    valid = pd.Series(True, index=column.index)
+    return truth.astype('boolean'), valid
+
+
+def check_variable_column(variable: CustomVariable,
+                          column: pd.Series)->Tuple[pd.Series, pd.Series]:
+    '''Check a column one value at a time using variable.set_value.
+    This is used for CustomVariable types without a vectorised check.
+    The value of variable is restored afterwards.
+    Arguments:
+        variable {CustomVariable} -- The variable defining the validity
+            conditions.
+        column {pd.Series} -- The (non-missing) values to check.
+    Returns:
+        Tuple[pd.Series, pd.Series] -- The coerced values and a boolean
+            Series that is True for valid values.
+    '''
+    current_value = (variable._value, variable.initialized, variable.status)
+    coerced = list()
+    valid = list()
+    for value in column:
+        try:
+            variable.set_value(value)
+        except (VariableError, FileTypeError, FileNotFoundError,
+                TypeError, ValueError):
+            coerced.append(None)
+            valid.append(False)
+        else:
+            coerced.append(variable._value)
+            valid.append(True)
+    variable._value, variable.initialized, variable.status = current_value
+    coerced_column = pd.Series(coerced, index=column.index, dtype=object)
+    valid_column = pd.Series(valid, index=column.index, dtype=bool)
+    return coerced_column, valid_column
+
+
+# The vectorised column checks for each CustomVariable type.
+# The first matching type is used, so subclasses must come first.
+COLUMN_CHECKS = [
+    (BoolV, check_bool_column),
+    (IntegerV, check_integer_column),
+    (StringV, check_string_column),
+    ]  # type: List[Tuple[type, ColumnCheck]]
+
+
+def select_column_check(variable: CustomVariable)->ColumnCheck:
+    '''Return the column check function for the variable's type.
+    Arguments:
+        variable {CustomVariable} -- The variable to be checked.
+    Returns:
+        ColumnCheck -- The vectorised check for the variable type, or
+            check_variable_column if there isn't one.
+    '''
+    for variable_type, column_check in COLUMN_CHECKS:
+        if isinstance(variable, variable_type):
+            return column_check
+    return check_variable_column
+
+
+class CustomVariableTable():
+    '''Validate a table of CustomVariable values one column at a time.
+    Each row of the table corresponds to one CustomVariableSet instance and
+    each column to one CustomVariable.  The variable definitions are the same
+    as those used by CustomVariableSet.  A single CustomVariable is created
+    for each definition and used to validate the entire column.
+
+    Missing values are replaced with the variable's default, if it has one.
+    Missing values in required variables without a default are errors.
+    Columns that do not correspond to a variable are returned unchanged.
+    '''
+    variable_definitions = list()  # type: List[Dict[str, Any]]
+    defaults = {'required': True, 'on_update': None}
+    logger = CustomVariableSet.logger
+
+    def __init__(self,
+                 variable_definitions: List[Dict[str, Any]] = None):
+        '''Create the CustomVariables used to validate table columns.
+        Arguments:
+            variable_definitions (optional, List[Dict[str, Any]]) -- Variable
+                definitions to add to the class variable definitions.
+        '''
+        definitions = list(self.variable_definitions)
+        if variable_definitions:
+            definitions.extend(variable_definitions)
+        self.variables = OrderedDict()
+        for variable_def in definitions:
+            new_variable = build_variable(variable_def, self.defaults)
+            self.variables[new_variable.name] = new_variable
+
+    @classmethod
+    def from_set(cls, set_type: type):
+        '''Create a CustomVariableTable from a CustomVariableSet subclass.
+        Arguments:
+            set_type {type} -- The CustomVariableSet subclass defining the
+                variables.
+        Returns:
+            CustomVariableTable -- A table using the same variable
+                definitions.
+        '''
+        return cls(set_type.variable_definitions)
+
+    def check_column(self, name: str,
+                     data: pd.DataFrame)->Tuple[pd.Series, pd.Series]:
+        '''Validate and coerce a single column.
+        Arguments:
+            name {str} -- The name of the CustomVariable.
+            data {pd.DataFrame} -- The table containing the column.
+        Returns:
+            Tuple[pd.Series, pd.Series] -- The coerced column and a boolean
+                Series that is True for invalid or missing required values.
+        '''
+        variable = self.variables[name]
+        if name in data.columns:
+            column = data[name]
+        else:
+            column = pd.Series(None, index=data.index, dtype=object)
+        missing = column.isna()
+        if missing.any() and variable.default is not None:
+            column = column.astype(object).where(~missing, variable.default)
+            missing = column.isna()
+        column_check = select_column_check(variable)
+        coerced, valid = column_check(variable, column[~missing])
+        coerced = coerced.reindex(data.index)
+        errors = pd.Series(False, index=data.index)
+        errors[~missing] = ~valid
+        if variable.required:
+            errors |= missing
+        return coerced, errors
+
+    def validate(self,
+                 data: pd.DataFrame)->Tuple[pd.DataFrame, pd.DataFrame]:
+        '''Validate and coerce all variable columns in the table.
+        Arguments:
+            data {pd.DataFrame} -- The table of values.  Column names are
+                CustomVariable names.
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame] --
+                The coerced table, with invalid values replaced by missing
+                    values, followed by any additional columns in data.
+                A boolean table with one column for each CustomVariable,
+                    True where the value is invalid or missing and required.
+        '''
+        coerced_columns = OrderedDict()
+        error_columns = OrderedDict()
+        for name in self.variables:
+            coerced, errors = self.check_column(name, data)
+            coerced_columns[name] = coerced
+            error_columns[name] = errors
+        for name in data.columns:
+            if name not in coerced_columns:
+                coerced_columns[name] = data[name]
+        coerced_table = pd.DataFrame(coerced_columns, index=data.index)
+        error_table = pd.DataFrame(error_columns, index=data.index,
+                                   columns=list(self.variables), dtype=bool)
+        return coerced_table, error_table
@@ -0,0 +1,269 @@
+''' Fit a two slope function with a smooth transition between the slopes.
+
+Created on Sat Sept 22 2018
+
+@author: Greg
+
+Below centre - width/2 the curve is the line slope1*x + intercept1.  Above
+centre + width/2 it is the line with slope2 that meets the first line at
+centre.  In the transition band between them the two lines are blended with
+sin^2 / cos^2 weights, so the curve and its slope are continuous.
+As in ql_fit, only numpy and scipy are imported with the module.
+'''
+from typing import List, Dict, Any, Tuple
+from typing import TYPE_CHECKING
+import numpy as np
+from Tools.DataFitting import fit_models
+from Tools.DataFitting.fit_models import FitModel, register_model
+from Tools.DataFitting.fit_models import fit_model, fit_group, fit_groups
+from Tools.DataFitting.fit_models import DIAGNOSTIC_COLUMNS, InitialValues
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# The fit parameters and diagnostics returned by fit_dual_line_groups.
+DUAL_LINE_PARAMETERS = ['slope1', 'intercept1', 'slope2', 'centre', 'width']
+PARAMETER_COLUMNS = DUAL_LINE_PARAMETERS + ['intercept2']
+# The number of candidate centres scanned by dual_line_initial_values.
+CENTRE_GRID = 64
+# The starting width as a fraction of the x range.
+WIDTH_FRACTION = 0.1
+
+
+def transition_weight(x: List[float], centre: float = 10.0,
+                      width: float = 6.0) ->Tuple[np.ndarray, np.ndarray]:
+    '''Calculate the transition weights of the two lines.
+    With t = pi*(x - upper)/(2*width), where upper = centre + width/2, the
+    weights in the transition band are sin(t)^2 and cos(t)^2.  Below the
+    band the weights are (1, 0) and above it (0, 1).  A width of 0 or less
+    switches from the first line to the second at centre.
+    Arguments:
+        x {List[float]} -- The x values.
+        centre {float, optional} -- The centre of the transition band.
+        width {float, optional} -- The width of the transition band.
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- The weights of the first and the
+            second line.
+    '''
+    x = np.asarray(x, dtype=float)
+    if width <= 0:
+        weight2 = np.where(x < centre, 0.0, 1.0)
+    else:
+        upper = centre + width/2
+        t = np.pi*(np.clip(x, centre - width/2, upper) - upper)/(2*width)
+        weight2 = np.cos(t)**2
+    return 1 - weight2, weight2
+
+
+def second_intercept(slope1: float, intercept1: float, slope2: float,
+                     centre: float) ->float:
+    '''The intercept of the second line, which meets the first at centre.
+    '''
+    return centre * (slope1 - slope2) + intercept1
+
+
+def dual_line_results(slope1: float, intercept1: float, slope2: float,
+                      centre: float, width: float,
+                      intercept2: float = None) ->Dict[str, float]:
+    '''Return the complete dual line parameters, adding intercept2.
+    '''
+    return {'slope1': slope1, 'intercept1': intercept1, 'slope2': slope2,
+            'centre': centre, 'width': width,
+            'intercept2': second_intercept(slope1, intercept1, slope2,
+                                           centre)}
+
+
+def dual_line_point(x: float, slope1: float, intercept1: float,
+                    slope2: float, center: float, width: float) ->float:
+    '''Calculate a point on a 2 slope curve with a transition.
+    '''
+    return float(dual_line_curve(x, slope1, intercept1, slope2, center,
+                                 width))
+
+
+def dual_line_curve(x: List[float], slope1: float, intercept1: float,
+                    slope2: float, center: float, width: float) ->np.ndarray:
+    '''calculate dual line for a series.
+    The blend of the two lines is written as the first line plus the second
+    weight times the difference between the lines:
+        y = slope1*x + intercept1 + weight2*(slope2 - slope1)*(x - centre)
+    '''
+    x = np.asarray(x, dtype=float)
+    weight2 = transition_weight(x, center, width)[1]
+    return x*slope1 + intercept1 + weight2*(slope2 - slope1)*(x - center)
+
+
+def dual_line_jacobian(x: List[float], slope1: float, intercept1: float,
+                       slope2: float, center: float,
+                       width: float) ->np.ndarray:
+    '''Calculate the derivatives of dual_line_curve with respect to slope1,
+    intercept1, slope2, center and width.
+    With d = slope2 - slope1, u = x - centre and w the second weight:
+        dy/dslope1 = x - w*u
+        dy/dintercept1 = 1
+        dy/dslope2 = w*u
+        dy/dcentre = d*(u*dw/dcentre - w)
+        dy/dwidth = d*u*dw/dwidth
+    In the transition band w = cos(t)^2, so dw/dt = -sin(2t), with
+    dt/dcentre = -pi/(2*width) and dt/dwidth = -pi*u/(2*width^2).  Outside
+    the band the derivatives of w are 0.
+    Returns:
+        np.ndarray -- An array of shape (len(x), 5), one column per
+            parameter.
+    '''
+    x = np.asarray(x, dtype=float)
+    offset = x - center
+    weight2 = transition_weight(x, center, width)[1]
+    jacobian = np.empty((x.size, 5))
+    jacobian[:, 0] = x - weight2*offset
+    jacobian[:, 1] = 1.0
+    jacobian[:, 2] = weight2*offset
+    difference = slope2 - slope1
+    jacobian[:, 3] = -difference*weight2
+    jacobian[:, 4] = 0.0
+    if width > 0:
+        band = np.abs(offset) < width/2
+        t = np.pi*(offset[band] - width/2)/(2*width)
+        weight_slope = -np.sin(2*t)
+        jacobian[band, 3] += (difference*offset[band]*weight_slope
+                              * -np.pi/(2*width))
+        jacobian[band, 4] = (difference*offset[band]*weight_slope
+                             * -np.pi*offset[band]/(2*width*width))
+    return jacobian
+
+
+def dual_line_initial_values(x: List[float], yi: List[float],
+                             grid_size: int = CENTRE_GRID
+                             ) ->Dict[str, float]:
+    '''Find starting parameters by scanning candidate centres.
+    With no transition band the model is linear in slope1, intercept1 and
+    slope2 for a fixed centre:
+        y = slope1*x + intercept1 + (slope2 - slope1)*max(x - centre, 0)
+    Each candidate between min(x) and max(x) is solved by linear least
+    squares from its normal equations, and the best centre is returned with
+    a width of WIDTH_FRACTION of the x range.
+    Arguments:
+        x {List[float]} -- The x values.
+        yi {List[float]} -- The y values.
+        grid_size {int, optional} -- The number of candidate centres.
+            Default is CENTRE_GRID.
+    Returns:
+        Dict[str, float] -- slope1, intercept1, slope2, centre and width.
+    '''
+    x = np.asarray(x, dtype=float)
+    yi = np.asarray(yi, dtype=float)
+    x_mean = x.mean()
+    y_mean = yi.mean()
+    shifted = x - x_mean
+    centred = yi - y_mean
+    # At or outside the ends of the data the hinge is a linear function of
+    # x, so only the interior points of the grid are candidates.
+    centres = np.linspace(x.min(), x.max(), grid_size + 2)[1:-1]
+    hinge = np.maximum(x - centres[:, np.newaxis], 0.0)
+    normal = np.empty((centres.size, 3, 3))
+    normal[:, 0, 0] = shifted @ shifted
+    normal[:, 0, 1] = normal[:, 1, 0] = np.sum(shifted)
+    normal[:, 0, 2] = normal[:, 2, 0] = hinge @ shifted
+    normal[:, 1, 1] = x.size
+    normal[:, 1, 2] = normal[:, 2, 1] = np.sum(hinge, axis=1)
+    normal[:, 2, 2] = np.sum(hinge*hinge, axis=1)
+    moments = np.empty((centres.size, 3))
+    moments[:, 0] = shifted @ centred
+    moments[:, 1] = 0.0
+    moments[:, 2] = hinge @ centred
+    solution = np.linalg.solve(normal, moments[..., np.newaxis])[..., 0]
+    residual_sum = centred @ centred - np.sum(solution*moments, axis=1)
+    best = int(np.argmin(residual_sum))
+    slope1, intercept, change = solution[best]
+    return {'slope1': float(slope1),
+            'intercept1': float(intercept - slope1*x_mean + y_mean),
+            'slope2': float(slope1 + change),
+            'centre': float(centres[best]),
+            'width': float(WIDTH_FRACTION*(x.max() - x.min()))}
+
+
+DUAL_LINE_MODEL = register_model(FitModel(
+    name='dual_line', parameters=DUAL_LINE_PARAMETERS,
+    function=dual_line_curve, jacobian=dual_line_jacobian,
+    derived=dual_line_results, initial_values=dual_line_initial_values,
+    result_names=PARAMETER_COLUMNS))
+
+
+def dual_line_fit(x: List[float], yi: List[float],
+                  initial_values: Dict[str, float] = None
+                  ) ->Dict[str, float]:
+    '''Fit the dual line model.
+    If initial_values is not given the starting point is found with
+    dual_line_initial_values.
+    Returns:
+        Dict[str, float] -- The DUAL_LINE_PARAMETERS and intercept2.
+    '''
+    return fit_model(DUAL_LINE_MODEL, x, yi, initial_values)
+
+
+def fit_dual_line_group(x: np.ndarray, yi: np.ndarray,
+                        initial_values: InitialValues = None
+                        ) ->Dict[str, Any]:
+    '''Fit one group and return the parameters with fit diagnostics.
+    See fit_models.fit_group.
+    '''
+    return fit_group(DUAL_LINE_MODEL, x, yi, initial_values)
+
+
+def fit_dual_line_groups(data_set: 'pd.DataFrame', y_name: str, x_name: str,
+                         group_names: List[str],
+                         initial_values: InitialValues = None,
+                         max_workers: int = None,
+                         chunk_size: int = None) ->'pd.DataFrame':
+    '''Fit the dual line model to every group in a data set.
+    See fit_models.fit_groups.
+    Returns:
+        pd.DataFrame -- One row per group, indexed by group_names, with the
+            PARAMETER_COLUMNS and DIAGNOSTIC_COLUMNS.
+    '''
+    return fit_groups(DUAL_LINE_MODEL, data_set, y_name, x_name, group_names,
+                      initial_values, max_workers, chunk_size)
+
+
+def plot_fit(x, yi, fit_results):
+    '''Plot the data and the fitted curve.
+    '''
+    fit_models.plot_fit(DUAL_LINE_MODEL, x, yi, fit_results)
+
+
+def print_results(fit_results):
+    '''Formatted print of the fit results.
+    '''
+    results_text = 'Optimal parameters are slope1={slope1:g}, '
+    results_text += 'intercept1={intercept1:g}, slope2={slope2:g}, '
+    results_text += 'centre={centre:g}, and width={width:g}'
+    print(results_text.format(**fit_results))
+
+
+def main():
+    '''Demo fit
+    '''
+    def load_data():
+        '''Load measured data
+        '''
+        from Tools.spreadsheet_tools import select_sheet, load_data_table
+        data_sheet = select_sheet(file_name='TR3 R50 Analysis.xlsx',
+                                  sheet_name='ALL PDD parameters',
+                                  sub_dir=r'Work\electrons')
+        R50_data = load_data_table(data_sheet,
+                                   index_variables=['SSD', 'Energy'])
+        variables = ['EquivSquare', 'R50']
+        R50_data = R50_data.loc[('100 cm', '12 MeV'), variables]
+        R50_data.sort_values('EquivSquare', inplace=True)
+        x = R50_data['EquivSquare']
+        yi = R50_data['R50']
+        return x, yi
+
+    x, yi = load_data()
+    fit_results = dual_line_fit(x, yi)
+    print_results(fit_results)
+    plot_fit(x, yi, fit_results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+'''
+A persistent on-disk cache of fit results.
+
+Fit results are stored as small JSON files in a cache directory, keyed by a
+hash of the cache format version, the model key, the x and y values and the
+initial values.  When the total size of the cache exceeds its limit, the
+least recently used results are removed.
+
+The shared cache used by the DataFitting functions is disabled unless the
+DATAFITTING_CACHE_DIR environment variable is set or a cache is given with
+set_fit_cache.  DATAFITTING_CACHE_SIZE sets its size limit in bytes.
+    FitCache -- The cache of fit results in a directory.
+    fit_key -- Calculate the cache key for a fit.
+    cacheable -- Check that the initial values can be identified in a key.
+    get_fit_cache -- Return the shared FitCache or None.
+    set_fit_cache -- Replace the shared FitCache.
+'''
+from typing import Dict, Any, List, Optional, Union
+from pathlib import Path
+from types import FunctionType
+import hashlib
+import json
+import os
+import numpy as np
+
+
+PathInput = Union[Path, str]
+FitResults = Dict[str, Any]
+
+CACHE_DIR_VARIABLE = 'DATAFITTING_CACHE_DIR'
+CACHE_SIZE_VARIABLE = 'DATAFITTING_CACHE_SIZE'
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+# When the size limit is exceeded, results are removed until the cache is
+# this fraction of the limit, so that eviction is not repeated on every fit.
+EVICTION_FRACTION = 0.9
+RESULT_SUFFIX = '.json'
+# Part of every key.  Increase it when the keys or the stored results change,
+# so that results saved by older versions are not read.
+CACHE_FORMAT_VERSION = 2
+
+
+def _value_text(value: Any)->str:
+    '''Return a text form of an initial value for hashing.
+    Functions are identified by their module and qualified name.
+    '''
+    if callable(value):
+        return '{}.{}'.format(getattr(value, '__module__', ''),
+                              getattr(value, '__qualname__', repr(value)))
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def cacheable(initial_values: Any)->bool:
+    '''Check that fits with these initial values can be cached.
+    A function is identified in the cache key by its module and qualified
+    name, so only module level functions (and functions defined in a class)
+    can be.  Lambdas, nested functions, closures, bound methods and other
+    callable objects can return different starting values under the same
+    name.
+    Arguments:
+        initial_values {Any} -- The starting parameters, or the function
+            used to find them.
+    Returns:
+        bool -- True if the initial values can be used in fit_key.
+    '''
+    if not callable(initial_values):
+        return True
+    if not isinstance(initial_values, FunctionType):
+        return False
+    qualified_name = initial_values.__qualname__
+    return ('<lambda>' not in qualified_name
+            and '<locals>' not in qualified_name
+            and not initial_values.__closure__)
+
+
+def fit_key(model_key: str, x: List[float], yi: List[float],
+            initial_values: Any = None)->str:
+    '''Calculate the cache key for a fit.
+    Arguments:
+        model_key {str} -- Identifies the fitted model and how it is
+            fitted (see fit_models.model_key).
+        x {List[float]} -- The x values.
+        yi {List[float]} -- The y values.
+        initial_values {Any, optional} -- The starting parameters, or the
+            function used to find them.  A function must pass cacheable.
+    Returns:
+        str -- The hexadecimal hash of the fit inputs.
+    '''
+    key_hash = hashlib.blake2b(digest_size=20)
+    key_hash.update(str(CACHE_FORMAT_VERSION).encode('utf-8'))
+    key_hash.update(model_key.encode('utf-8'))
+    key_hash.update(_value_text(initial_values).encode('utf-8'))
+    for values in (x, yi):
+        values = np.ascontiguousarray(values, dtype=float)
+        key_hash.update(str(values.shape).encode('utf-8'))
+        key_hash.update(values.tobytes())
+    return key_hash.hexdigest()
+
+
+class FitCache():
+    '''Fit results stored as JSON files in a directory.
+    The results must be dictionaries of basic python data (numpy floats are
+    accepted).  Reading a result marks it as recently used.
+    '''
+    def __init__(self, directory: PathInput,
+                 max_size: int = DEFAULT_CACHE_SIZE):
+        '''Open or create a fit cache.
+        Arguments:
+            directory {PathInput} -- The cache directory.  It is created if
+                it does not exist.
+            max_size {int, optional} -- The size limit of the cache in
+                bytes.  Default is DEFAULT_CACHE_SIZE.
+        '''
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._size = None  # type: Optional[int]
+
+    def result_path(self, key: str)->Path:
+        '''Return the path of the file holding a cached result.
+        '''
+        return self.directory / (key + RESULT_SUFFIX)
+
+    def get(self, key: str)->Optional[FitResults]:
+        '''Return a cached result.
+        Arguments:
+            key {str} -- The key from fit_key.
+        Returns:
+            Optional[FitResults] -- The cached result, or None if it is not
+                in the cache or cannot be read.
+        '''
+        result_path = self.result_path(key)
+        try:
+            result = json.loads(result_path.read_text(encoding='utf-8'))
+            os.utime(str(result_path))
+        except (OSError, ValueError):
+            return None
+        return result
+
+    def put(self, key: str, result: FitResults):
+        '''Add a result to the cache, removing old results if the cache is
+        too large.
+        Arguments:
+            key {str} -- The key from fit_key.
+            result {FitResults} -- The fit result.
+        '''
+        text = json.dumps(result, default=float)
+        result_path = self.result_path(key)
+        temp_path = result_path.with_suffix('.tmp{}'.format(os.getpid()))
+        try:
+            previous_size = result_path.stat().st_size
+        except OSError:
+            previous_size = 0
+        temp_path.write_text(text, encoding='utf-8')
+        os.replace(str(temp_path), str(result_path))
+        if self._size is None:
+            self._size = self.size()
+        else:
+            self._size += len(text.encode('utf-8')) - previous_size
+        if self._size > self.max_size:
+            self.evict(int(self.max_size * EVICTION_FRACTION))
+
+    def __contains__(self, key: str)->bool:
+        return self.result_path(key).is_file()
+
+    def _entries(self)->List[os.DirEntry]:
+        with os.scandir(str(self.directory)) as entries:
+            return [entry for entry in entries
+                    if entry.name.endswith(RESULT_SUFFIX)]
+
+    def size(self)->int:
+        '''Return the total size of the cached results in bytes.
+        '''
+        size = 0
+        for entry in self._entries():
+            try:
+                size += entry.stat().st_size
+            except OSError:
+                pass
+        return size
+
+    def evict(self, target_size: int):
+        '''Remove the least recently used results until the cache is no
+        larger than target_size.
+        Arguments:
+            target_size {int} -- The cache size to reduce to, in bytes.
+        '''
+        entries = list()
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, entry_path in entries:
+            if size <= target_size:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        '''Remove all cached results.
+        '''
+        self.evict(0)
+
+
+_fit_cache = None  # type: FitCache
+_cache_checked = False
+
+
+def get_fit_cache()->Optional[FitCache]:
+    '''Return the shared FitCache.
+    On first use it is created from the DATAFITTING_CACHE_DIR and
+    DATAFITTING_CACHE_SIZE environment variables.
+    Returns:
+        Optional[FitCache] -- The shared cache, or None if caching is
+            disabled.
+    '''
+    global _fit_cache, _cache_checked
+    if not _cache_checked:
+        _cache_checked = True
+        cache_dir = os.environ.get(CACHE_DIR_VARIABLE)
+        if cache_dir:
+            max_size = int(os.environ.get(CACHE_SIZE_VARIABLE,
+                                          DEFAULT_CACHE_SIZE))
+            _fit_cache = FitCache(cache_dir, max_size)
+    return _fit_cache
+
+
+def set_fit_cache(cache: Optional[FitCache]):
+    '''Replace the shared FitCache.
+    Arguments:
+        cache {Optional[FitCache]} -- The new cache.  If None, caching is
+            disabled.
+    '''
+    global _fit_cache, _cache_checked
+    _fit_cache = cache
+    _cache_checked = True
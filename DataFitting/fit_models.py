@@ -0,0 +1,454 @@
+'''
+A registry of curve models and one fitting engine for all of them.
+
+Each model is a FitModel declaring its fitted parameters, a vectorised
+function of x, an optional Jacobian, a transform adding derived parameters
+and a strategy for the starting parameters.  Models are registered by name
+with register_model, and the same functions fit any registered model:
+    fit_model -- Fit one data set, using the shared fit cache.
+    model_key -- Identify a model and its fit options in fit cache keys.
+    fit_group -- Fit one data set and return the fit diagnostics; failures
+        are recorded rather than raised.
+    fit_groups -- Fit every group of a DataFrame in a process pool.
+    evaluate -- Calculate the model curve for a set of fit results.
+    plot_fit -- Plot data and a fitted curve.
+Only numpy and scipy.optimize are imported with the module, so that worker
+processes start quickly.  pandas is imported by the functions that build
+DataFrames and matplotlib by plot_fit.
+'''
+from typing import List, Dict, Tuple, Any, Callable, Union, NamedTuple
+from typing import TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+import os
+import numpy as np
+import scipy
+from scipy.optimize import curve_fit
+from Tools.DataFitting.fit_cache import get_fit_cache, fit_key, cacheable
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+ParameterValues = Dict[str, float]
+InitialValues = Union[ParameterValues,
+                      Callable[[np.ndarray, np.ndarray], ParameterValues]]
+GroupData = Tuple[Any, np.ndarray, np.ndarray]
+
+# The fit diagnostics added by fit_group.
+DIAGNOSTIC_COLUMNS = ['points', 'rmse', 'r_squared', 'evaluations',
+                      'status', 'message']
+# Errors that mark a single group fit as failed.
+FIT_ERRORS = (RuntimeError, ValueError, TypeError, ZeroDivisionError,
+              np.linalg.LinAlgError)
+
+
+class FitModel(NamedTuple):
+    '''The definition of a curve model.
+    All functions must be defined at module level so that models can be sent
+    to worker processes.
+    Attributes
+        name: {str} -- The name the model is registered under.
+        parameters: {List[str]} -- The fitted parameters, in the order they
+            are passed to function and jacobian.
+        function: {Callable[..., np.ndarray]} -- function(x, *parameters)
+            returns the model values for an array of x values.
+        jacobian: {Callable[..., np.ndarray], optional} --
+            jacobian(x, *parameters) returns the derivatives, shape
+            (len(x), len(parameters)).  If None, finite differences are used.
+        derived: {Callable[..., ParameterValues], optional} --
+            derived(**parameter_set) returns the complete parameter set,
+            including derived parameters.  It is also applied to starting
+            parameters, so they can be given in any form it accepts.
+        initial_values: {Callable[[np.ndarray, np.ndarray], ParameterValues],
+            optional} -- Returns starting parameters for x and y values.
+        result_names: {List[str], optional} -- The parameters in the fit
+            results, in column order.  Default is parameters.
+        version: {int, optional} -- Part of the fit cache key.  Increase it
+            whenever the model functions or the initial_values strategy
+            change, so that cached results are not reused.  Default is 1.
+    '''
+    name: str
+    parameters: List[str]
+    function: Callable[..., np.ndarray]
+    jacobian: Callable[..., np.ndarray] = None
+    derived: Callable[..., ParameterValues] = None
+    initial_values: Callable[[np.ndarray, np.ndarray], ParameterValues] = None
+    result_names: List[str] = None
+    version: int = 1
+
+    def columns(self)->List[str]:
+        '''The parameter names in the fit results.
+        '''
+        return list(self.result_names or self.parameters)
+
+    def complete(self, parameter_set: ParameterValues)->ParameterValues:
+        '''Add the derived parameters to a parameter set.
+        '''
+        if self.derived is None:
+            return dict(parameter_set)
+        return self.derived(**parameter_set)
+
+    def values(self, parameter_set: ParameterValues)->Tuple[float, ...]:
+        '''The fitted parameter values from a parameter set, in order.
+        '''
+        parameter_set = self.complete(parameter_set)
+        return tuple(parameter_set[name] for name in self.parameters)
+
+
+MODELS = dict()  # type: Dict[str, FitModel]
+ModelInput = Union[FitModel, str]
+
+
+def register_model(model: FitModel)->FitModel:
+    '''Add a model to the registry, replacing any model with the same name.
+    Arguments:
+        model {FitModel} -- The model definition.
+    Returns:
+        FitModel -- The registered model.
+    '''
+    MODELS[model.name] = model
+    return model
+
+
+def get_model(model: ModelInput)->FitModel:
+    '''Return a registered model.
+    Arguments:
+        model {ModelInput} -- The model name, or a FitModel which is
+            returned unchanged.
+    Raises:
+        KeyError -- If no model is registered with the name.
+    Returns:
+        FitModel -- The model definition.
+    '''
+    if isinstance(model, FitModel):
+        return model
+    try:
+        return MODELS[model]
+    except KeyError:
+        msg = '{} is not a registered model. Registered models are: {}'
+        raise KeyError(msg.format(model, ', '.join(MODELS))) from None
+
+
+def starting_values(model: FitModel, x: np.ndarray, yi: np.ndarray,
+                    initial_values: InitialValues = None
+                    )->Tuple[float, ...]:
+    '''Return the starting parameter values for a fit.
+    Arguments:
+        model {FitModel} -- The model definition.
+        x {np.ndarray} -- The x values.
+        yi {np.ndarray} -- The y values.
+        initial_values {InitialValues, optional} -- The starting
+            parameters, or a function of x and yi that returns them.
+            Default is the model's initial_values.
+    Raises:
+        ValueError -- If no starting parameters are given and the model has
+            no initial_values strategy.
+    Returns:
+        Tuple[float, ...] -- The starting values in parameter order.
+    '''
+    if initial_values is None:
+        initial_values = model.initial_values
+    if initial_values is None:
+        msg = 'Model {} requires initial values.'.format(model.name)
+        raise ValueError(msg)
+    if callable(initial_values):
+        initial_values = initial_values(x, yi)
+    return model.values(initial_values)
+
+
+def model_key(model: FitModel, *fit_options: Any)->str:
+    '''Identify a model and how it is fitted in fit cache keys.
+    The key changes when the model version, parameters, result names or
+    functions change, when scipy is updated or when fit_options differ.
+    Arguments:
+        model {FitModel} -- The model definition.
+        fit_options {Any} -- Other settings that change the fit results.
+    Returns:
+        str -- The model key for fit_cache.fit_key.
+    '''
+    functions = ['{}.{}'.format(getattr(function, '__module__', ''),
+                                getattr(function, '__qualname__', ''))
+                 for function in (model.function, model.jacobian,
+                                  model.derived)
+                 if function is not None]
+    key_parts = [model.name, str(model.version), ','.join(model.parameters),
+                 ','.join(model.columns()), ','.join(functions),
+                 scipy.__version__]
+    key_parts.extend(str(option) for option in fit_options)
+    return '|'.join(key_parts)
+
+
+def fit_model(model: ModelInput, x: List[float], yi: List[float],
+              initial_values: InitialValues = None,
+              analytic_jacobian: bool = True)->ParameterValues:
+    '''Fit a model to one data set.
+    If the shared fit cache is enabled, a result for the same model (see
+    model_key), data and initial values is returned from the cache.  Fits
+    whose initial values, or the model's initial_values strategy when none
+    are given, are a lambda, closure or other function that cannot be
+    identified by name (see fit_cache.cacheable) are not cached.
+    Arguments:
+        model {ModelInput} -- The model or the name of a registered model.
+        x {List[float]} -- The x values.
+        yi {List[float]} -- The y values.
+        initial_values {InitialValues, optional} -- The starting
+            parameters, or a function of x and yi that returns them.
+            Default is the model's initial_values.
+        analytic_jacobian {bool, optional} -- If True and the model has a
+            jacobian, it is used rather than finite differences.  Default is
+            True.
+    Returns:
+        ParameterValues -- The complete set of fitted parameters.
+    '''
+    model = get_model(model)
+    if initial_values is None:
+        initial_values = model.initial_values
+    cache = get_fit_cache() if cacheable(initial_values) else None
+    if cache is not None:
+        key = fit_key(model_key(model, analytic_jacobian), x, yi,
+                      initial_values)
+        fit_results = cache.get(key)
+        if fit_results is not None:
+            return fit_results
+    p0 = starting_values(model, x, yi, initial_values)
+    jacobian = model.jacobian if analytic_jacobian else None
+    (popt, pcov) = curve_fit(model.function, x, yi, p0, jac=jacobian)
+    fit_results = model.complete(dict(zip(model.parameters, popt)))
+    if cache is not None:
+        cache.put(key, fit_results)
+    return fit_results
+
+
+def fit_group(model: ModelInput, x: np.ndarray, yi: np.ndarray,
+              initial_values: InitialValues = None)->Dict[str, Any]:
+    '''Fit one group and return the parameters with fit diagnostics.
+    A failed fit does not raise an error; its parameters are NaN, status is
+    'failed' and message describes the error.
+    Arguments:
+        model {ModelInput} -- The model or the name of a registered model.
+        x {np.ndarray} -- The x values.
+        yi {np.ndarray} -- The y values.
+        initial_values {InitialValues, optional} -- The starting
+            parameters, or a function of x and yi that returns them.
+            Default is the model's initial_values.
+    Returns:
+        Dict[str, Any] -- The model's result columns and the
+            DIAGNOSTIC_COLUMNS values.
+    '''
+    model = get_model(model)
+    x = np.asarray(x, dtype=float)
+    yi = np.asarray(yi, dtype=float)
+    result = dict.fromkeys(model.columns(), np.nan)
+    result.update(points=x.size, rmse=np.nan, r_squared=np.nan,
+                  evaluations=0, status='failed', message='')
+    try:
+        if x.size < len(model.parameters):
+            raise ValueError('At least {} points are needed, got {}.'.format(
+                len(model.parameters), x.size))
+        p0 = starting_values(model, x, yi, initial_values)
+        popt, pcov, info, message, ier = curve_fit(
+            model.function, x, yi, p0, jac=model.jacobian, full_output=True)
+    except FIT_ERRORS as err:
+        result['message'] = str(err)
+        return result
+    result.update(model.complete(dict(zip(model.parameters, popt))))
+    residuals = yi - model.function(x, *popt)
+    total = np.sum((yi - yi.mean())**2)
+    result.update(rmse=float(np.sqrt(np.mean(residuals**2))),
+                  r_squared=(1 - np.sum(residuals**2)/total
+                             if total else np.nan),
+                  evaluations=int(info['nfev']), status='ok',
+                  message=message)
+    return result
+
+
+def group_arrays(data_set: 'pd.DataFrame', y_name: str, x_name: str,
+                 group_names: List[str])->List[GroupData]:
+    '''Split a data set into the x and y values of each group.
+    Arguments:
+        data_set {pd.DataFrame} -- The data, with x_name as an index level.
+        y_name {str} -- The column containing the y values.
+        x_name {str} -- The index level containing the x values.
+        group_names {List[str]} -- The index levels or columns defining the
+            groups.
+    Returns:
+        List[GroupData] -- (group key, x, yi) for each group in sorted
+            order.  The group keys are always tuples.
+    '''
+    all_x = np.asarray(data_set.index.get_level_values(x_name), dtype=float)
+    all_y = np.asarray(data_set[y_name], dtype=float)
+    group_rows = data_set.groupby(group_names, sort=True).indices
+    groups = list()
+    for key, rows in group_rows.items():
+        if not isinstance(key, tuple):
+            key = (key,)
+        groups.append((key, all_x[rows], all_y[rows]))
+    return groups
+
+
+def group_index(keys: List[tuple], group_names: List[str])->'pd.Index':
+    '''Build the index for results from group_arrays keys.
+    '''
+    import pandas as pd
+    if len(group_names) > 1:
+        return pd.MultiIndex.from_tuples(keys, names=group_names)
+    return pd.Index([key[0] for key in keys], name=group_names[0])
+
+
+def map_chunks(chunk_function: Callable[..., List[Any]], items: List[Any],
+               arguments: tuple = (), max_workers: int = None,
+               chunk_size: int = None)->List[Any]:
+    '''Apply chunk_function to chunks of items in a process pool.
+    Arguments:
+        chunk_function {Callable[..., List[Any]]} -- A module level function
+            taking a list of items followed by arguments and returning a
+            list of results.
+        items {List[Any]} -- The items to process.
+        arguments {tuple, optional} -- Extra arguments for chunk_function.
+        max_workers {int, optional} -- The number of worker processes.  If 0
+            the chunks are processed in this process.  Default is the number
+            of CPUs.
+        chunk_size {int, optional} -- The number of items sent to a worker
+            at a time.  Default gives each worker about 4 chunks.
+    Returns:
+        List[Any] -- The results of all chunks, in the order of items.
+    '''
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if not chunk_size:
+        chunk_size = max(1, ceil(len(items) / (4 * max(max_workers, 1))))
+    chunks = [items[start:start + chunk_size]
+              for start in range(0, len(items), chunk_size)]
+    if max_workers == 0 or len(chunks) < 2:
+        results = [chunk_function(chunk, *arguments) for chunk in chunks]
+    else:
+        repeated = [[argument]*len(chunks) for argument in arguments]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(chunk_function, chunks, *repeated))
+    return [result for chunk in results for result in chunk]
+
+
+def fit_chunk(groups: List[GroupData], model: FitModel,
+              initial_values: InitialValues = None
+              )->List[Tuple[Any, Dict[str, Any]]]:
+    '''Fit a chunk of groups.
+    Arguments:
+        groups {List[GroupData]} -- (group key, x, yi) for each group.
+        model {FitModel} -- The model definition.
+        initial_values {InitialValues, optional} -- Passed to fit_group.
+    Returns:
+        List[Tuple[Any, Dict[str, Any]]] -- The group key and the fit
+            results for each group.
+    '''
+    return [(key, fit_group(model, x, yi, initial_values))
+            for key, x, yi in groups]
+
+
+def fit_groups(model: ModelInput, data_set: 'pd.DataFrame', y_name: str,
+               x_name: str, group_names: List[str],
+               initial_values: InitialValues = None,
+               max_workers: int = None,
+               chunk_size: int = None)->'pd.DataFrame':
+    '''Fit a model to every group in a data set.
+    The groups are split into chunks which are fitted in a process pool.
+    Groups that cannot be fitted are recorded with status 'failed' rather
+    than stopping the batch.
+    If the shared fit cache is enabled, only groups without a cached result
+    are fitted.  Failed fits are not cached, so they are tried again.  As in
+    fit_model, initial values that fail fit_cache.cacheable disable the
+    cache.
+    Arguments:
+        model {ModelInput} -- The model or the name of a registered model.
+        data_set {pd.DataFrame} -- The data, with x_name as an index level.
+        y_name {str} -- The column containing the y values.
+        x_name {str} -- The index level containing the x values.
+        group_names {List[str]} -- The index levels or columns defining the
+            groups.
+        initial_values {InitialValues, optional} -- The starting
+            parameters, or a function of x and yi that returns them.  If a
+            function is given, it must be defined at module level so that it
+            can be sent to the worker processes.  Default is the model's
+            initial_values.
+        max_workers {int, optional} -- The number of worker processes.  If 0
+            the groups are fitted in this process.  Default is the number of
+            CPUs.
+        chunk_size {int, optional} -- The number of groups sent to a worker
+            at a time.  Default gives each worker about 4 chunks.
+    Returns:
+        pd.DataFrame -- One row per group, indexed by group_names, with the
+            model's result columns and the DIAGNOSTIC_COLUMNS.
+    '''
+    import pandas as pd
+    model = get_model(model)
+    if initial_values is None:
+        initial_values = model.initial_values
+    cache = get_fit_cache() if cacheable(initial_values) else None
+    groups = group_arrays(data_set, y_name, x_name, group_names)
+    keys = [key for key, _, _ in groups]
+    fit_rows = dict()
+    cache_keys = dict()
+    if cache is not None:
+        group_model_key = model_key(model, 'group')
+        uncached = list()
+        for key, x_values, y_values in groups:
+            cache_keys[key] = fit_key(group_model_key, x_values, y_values,
+                                      initial_values)
+            row = cache.get(cache_keys[key])
+            if row is None:
+                uncached.append((key, x_values, y_values))
+            else:
+                fit_rows[key] = row
+        groups = uncached
+    results = map_chunks(fit_chunk, groups, (model, initial_values),
+                         max_workers, chunk_size)
+    for key, row in results:
+        fit_rows[key] = row
+        if cache is not None and row['status'] == 'ok':
+            cache.put(cache_keys[key], row)
+    rows = [fit_rows[key] for key in keys]
+    return pd.DataFrame(rows, index=group_index(keys, group_names),
+                        columns=model.columns() + DIAGNOSTIC_COLUMNS)
+
+
+def evaluate(model: ModelInput, x: List[float],
+             parameter_set: ParameterValues)->np.ndarray:
+    '''Calculate the model curve.
+    Arguments:
+        model {ModelInput} -- The model or the name of a registered model.
+        x {List[float]} -- The x values.
+        parameter_set {ParameterValues} -- The model parameters, in any form
+            accepted by the model's derived transform.
+    Returns:
+        np.ndarray -- The model values.
+    '''
+    model = get_model(model)
+    return model.function(np.asarray(x, dtype=float),
+                          *model.values(parameter_set))
+
+
+def plot_fit(model: ModelInput, x: List[float], yi: List[float],
+             fit_results: ParameterValues, x_label: str = 'x',
+             y_label: str = None, step: float = 0.1):
+    '''Plot the data and the fitted curve.
+    Arguments:
+        model {ModelInput} -- The model or the name of a registered model.
+        x {List[float]} -- The x values.
+        yi {List[float]} -- The y values.
+        fit_results {ParameterValues} -- The fitted parameters.
+        x_label {str, optional} -- The x axis label.  Default is 'x'.
+        y_label {str, optional} -- The y axis label.
+        step {float, optional} -- The x spacing of the plotted curve.
+            Default is 0.1.
+    '''
+    import matplotlib.pyplot as plt
+    x_plotting = np.arange(min(x), max(x), step)
+    yfitted = evaluate(model, x_plotting, fit_results)
+    fig = plt.figure(figsize=(8, 8))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.plot(x, yi, 'o', label='data $y_i$')
+    ax.plot(x_plotting, yfitted, '-', label='fit $f(x_i)$')
+    ax.set_xlabel(x_label)
+    if y_label:
+        ax.set_ylabel(y_label)
+    ax.legend()
+    plt.show()
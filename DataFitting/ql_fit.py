@@ -3,15 +3,24 @@
 Created on Sat Sept 22 2018
 
 @author: Greg
+
+Only numpy and scipy are imported with the module.  pandas, matplotlib and
+the spreadsheet tools used by the demo are imported when they are needed.
 '''
-from typing import List, Dict
-from Tools.data_utilities import nearest_step
-import pandas as pd
+from typing import List, Dict, Tuple, Any, Union
+from typing import TYPE_CHECKING
+from Tools.DataFitting import fit_models
+from Tools.DataFitting.fit_models import FitModel, register_model
+from Tools.DataFitting.fit_models import fit_model, fit_group, fit_groups
+from Tools.DataFitting.fit_models import evaluate
+from Tools.DataFitting.fit_models import group_arrays, map_chunks
+from Tools.DataFitting.fit_models import DIAGNOSTIC_COLUMNS, FIT_ERRORS
+from Tools.DataFitting.fit_models import InitialValues
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.optimize import curve_fit
-from Tools.spreadsheet_tools import select_sheet
-from Tools.spreadsheet_tools import load_data_table
+from scipy.optimize import minimize_scalar
+from scipy.special import ndtri
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def __line(x: float, slope: float, intercept: float) ->float:
@@ -91,7 +100,7 @@ def q_l_point(x: float, parameter_set: Dict[str, float]) ->float:
     return y
 
 
-def q_l_curve(x: List[float], parameter_set: Dict[str, float]) ->float:
+def q_l_curve(x: List[float], parameter_set: Dict[str, float]) ->np.ndarray:
     '''calculate a ql curve for a series.
     centre and a2 must be given.
     either a1 and a0 or slope2 and intercept2 must be given.
@@ -100,37 +109,186 @@ def q_l_curve(x: List[float], parameter_set: Dict[str, float]) ->float:
         yq(centre) = yl(centre) and
         yq'(centre) = yl'(centre)
     '''
-    ql_parameters = extra_parameters(**parameter_set)
-    p_names = ['centre', 'a2', 'slope2', 'intercept2']
-    param = tuple(ql_parameters[p] for p in p_names)
-    y = [__ql_l(xi, *param) for xi in x]
-    return y
+    return evaluate(QL_MODEL, x, parameter_set)
 
 
 def q_l_curve_line(x: List[float],  center: float, a2: float,
-                   slope2: float, intercept2: float) ->List[float]:
+                   slope2: float, intercept2: float) ->np.ndarray:
     '''calculate q_l_line for a series giving linear parameters rather
     than a1 and a0.
+    Below the centre the quadratic part can be written as the line plus
+    a2*(x - centre)^2, so the whole curve is evaluated with one np.where.
     '''
-    y = [__ql_l(xi, center, a2, slope2, intercept2) for xi in x]
+    x = np.asarray(x, dtype=float)
+    y = x*slope2 + intercept2
+    offset = x - center
+    y = np.where(x < center, y + a2*offset*offset, y)
     return y
 
 
+def q_l_jacobian(x: List[float],  center: float, a2: float,
+                 slope2: float, intercept2: float) ->np.ndarray:
+    '''Calculate the derivatives of q_l_curve_line with respect to
+    center, a2, slope2 and intercept2.
+    Below the centre y = slope2*x + intercept2 + a2*(x - centre)^2, so:
+        dy/dcentre = -2*a2*(x - centre)
+        dy/da2 = (x - centre)^2
+    Above the centre both are 0.  In both parts dy/dslope2 = x and
+    dy/dintercept2 = 1.
+    Returns:
+        np.ndarray -- An array of shape (len(x), 4), one column per
+            parameter.
+    '''
+    x = np.asarray(x, dtype=float)
+    offset = np.where(x < center, x - center, 0.0)
+    jacobian = np.empty((x.size, 4))
+    jacobian[:, 0] = -2*a2*offset
+    jacobian[:, 1] = offset*offset
+    jacobian[:, 2] = x
+    jacobian[:, 3] = 1.0
+    return jacobian
+
+
+# The number of candidate centres scanned by ql_initial_values.
+CENTRE_GRID = 64
+
+
+def ql_profile(x: List[float], yi: List[float],
+               centres: List[float]) ->Tuple[np.ndarray, np.ndarray]:
+    '''Solve the linear least squares fit for each candidate centre.
+    For a fixed centre the model is linear in a2, slope2 and intercept2:
+        y = a2*min(x - centre, 0)^2 + slope2*x + intercept2
+    so all of the candidates are solved together from their 3x3 normal
+    equations.  x and y are shifted to their means to keep the equations
+    well conditioned.
+    Arguments:
+        x {List[float]} -- The x values.
+        yi {List[float]} -- The y values.
+        centres {List[float]} -- The candidate centres.
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- An array of shape (len(centres), 3)
+            with a2, slope2 and intercept2 for each centre, and the sum of
+            the squared residuals for each centre.
+    '''
+    x = np.asarray(x, dtype=float)
+    yi = np.asarray(yi, dtype=float)
+    centres = np.asarray(centres, dtype=float).reshape(-1)
+    x_mean = x.mean()
+    y_mean = yi.mean()
+    shifted = x - x_mean
+    centred = yi - y_mean
+    offset = np.minimum(x - centres[:, np.newaxis], 0.0)
+    square = offset*offset
+    normal = np.empty((centres.size, 3, 3))
+    normal[:, 0, 0] = np.sum(square*square, axis=1)
+    normal[:, 0, 1] = normal[:, 1, 0] = square @ shifted
+    normal[:, 0, 2] = normal[:, 2, 0] = np.sum(square, axis=1)
+    normal[:, 1, 1] = shifted @ shifted
+    normal[:, 1, 2] = normal[:, 2, 1] = np.sum(shifted)
+    normal[:, 2, 2] = x.size
+    moments = np.empty((centres.size, 3))
+    moments[:, 0] = square @ centred
+    moments[:, 1] = shifted @ centred
+    moments[:, 2] = 0.0
+    # A centre at or below min(x) leaves a2 undetermined; setting its
+    # diagonal term to 1 gives a2 = 0 for those centres.
+    normal[normal[:, 0, 0] == 0, 0, 0] = 1.0
+    solution = np.linalg.solve(normal, moments[..., np.newaxis])[..., 0]
+    # For the least squares solution the residual sum of squares is
+    # y.y - solution.moments.
+    residual_sum = np.maximum(
+        centred @ centred - np.sum(solution*moments, axis=1), 0.0)
+    coefficients = solution.copy()
+    coefficients[:, 2] = solution[:, 2] - solution[:, 1]*x_mean + y_mean
+    return coefficients, residual_sum
+
+
+def ql_initial_values(x: List[float], yi: List[float],
+                      grid_size: int = CENTRE_GRID) ->Dict[str, float]:
+    '''Find starting parameters by scanning candidate centres.
+    The candidates are grid_size evenly spaced points from min(x) to max(x).
+    The centre with the smallest residuals is returned with its exact
+    linear least squares a2, slope2 and intercept2.
+    Arguments:
+        x {List[float]} -- The x values.
+        yi {List[float]} -- The y values.
+        grid_size {int, optional} -- The number of candidate centres.
+            Default is CENTRE_GRID.
+    Returns:
+        Dict[str, float] -- centre, a2, slope2 and intercept2.
+    '''
+    x = np.asarray(x, dtype=float)
+    centres = np.linspace(x.min(), x.max(), grid_size)
+    coefficients, residual_sum = ql_profile(x, yi, centres)
+    best = int(np.argmin(residual_sum))
+    a2, slope2, intercept2 = coefficients[best]
+    return {'centre': float(centres[best]), 'a2': float(a2),
+            'slope2': float(slope2), 'intercept2': float(intercept2)}
+
+
+def profiled_ql_fit(x: List[float], yi: List[float],
+                    grid_size: int = CENTRE_GRID) ->Dict[str, float]:
+    '''Fit the quadratic-linear model by minimising over the centre only.
+    The other parameters are always the exact linear least squares solution
+    for the centre (see ql_profile).  The best grid centre is refined with a
+    bounded scalar minimisation between its neighbouring grid points.
+    Arguments:
+        x {List[float]} -- The x values.
+        yi {List[float]} -- The y values.
+        grid_size {int, optional} -- The number of candidate centres.
+            Default is CENTRE_GRID.
+    Returns:
+        Dict[str, float] -- All of the ql parameters.
+    '''
+    x = np.asarray(x, dtype=float)
+    yi = np.asarray(yi, dtype=float)
+    centres = np.linspace(x.min(), x.max(), grid_size)
+    coefficients, residual_sum = ql_profile(x, yi, centres)
+    best = int(np.argmin(residual_sum))
+    lower = centres[max(best - 1, 0)]
+    upper = centres[min(best + 1, centres.size - 1)]
+    centre = float(centres[best])
+    a2, slope2, intercept2 = coefficients[best]
+    if upper > lower:
+        result = minimize_scalar(
+            lambda centre: ql_profile(x, yi, centre)[1][0],
+            bounds=(lower, upper), method='bounded')
+        if result.fun < residual_sum[best]:
+            centre = float(result.x)
+            a2, slope2, intercept2 = ql_profile(x, yi, centre)[0][0]
+    return extra_parameters(centre=centre, a2=float(a2),
+                            slope2=float(slope2),
+                            intercept2=float(intercept2))
+
+
+# The fitted parameters, and all parameters in the order they are reported.
+QL_PARAMETERS = ['centre', 'a2', 'slope2', 'intercept2']
+PARAMETER_COLUMNS = ['centre', 'a2', 'a1', 'a0', 'slope2', 'intercept2']
+# Increase version when the model functions, ql_initial_values or
+# CENTRE_GRID change, so that cached fits are not reused.
+QL_MODEL = register_model(FitModel(
+    name='ql', parameters=QL_PARAMETERS, function=q_l_curve_line,
+    jacobian=q_l_jacobian, derived=extra_parameters,
+    initial_values=ql_initial_values, result_names=PARAMETER_COLUMNS,
+    version=1))
+
+
 def ql_fit(x: List[float], yi: List[float],
-           initial_values: Dict[str, float] = None) ->Dict[str, float]:
+           initial_values: Dict[str, float] = None,
+           analytic_jacobian: bool = True) ->Dict[str, float]:
     '''Fit the quadratic-linear model.
+    If initial_values is not given the starting point is found with
+    ql_initial_values.
+    If analytic_jacobian is True, the derivatives are calculated with
+    q_l_jacobian rather than by finite differences.
+    If the shared fit cache is enabled, a result for the same data and
+    initial values is returned from the cache.
     '''
-    ql_parameters = extra_parameters(**initial_values)
-    p_names = ['centre', 'a2', 'slope2', 'intercept2']
-    p0 = tuple(ql_parameters[p] for p in p_names)
-    (popt, pcov) = curve_fit(q_l_curve_line, x, yi, p0)
-    fit_results = {name: value for (name, value) in zip(p_names, popt)}
-    fit_results = extra_parameters(**fit_results)
-    return fit_results
+    return fit_model(QL_MODEL, x, yi, initial_values, analytic_jacobian)
 
 
-def find_ql_fit(data_set: pd.DataFrame, y_name: str, x_name: str,
-              starting_param: Dict[str, float]) ->pd.DataFrame:
+def find_ql_fit(data_set: 'pd.DataFrame', y_name: str, x_name: str,
+              starting_param: Dict[str, float]) ->'pd.DataFrame':
     '''Return the fit parameters for a given data set.
     '''
     x_values = data_set.index.get_level_values(x_name)
@@ -139,10 +297,11 @@ def find_ql_fit(data_set: pd.DataFrame, y_name: str, x_name: str,
     return fit_results
 
 
-def do_ql_fit(data_set: pd.DataFrame, y_name: str, x_name: str,
-              starting_param: Dict[str, float]) ->pd.DataFrame:
+def do_ql_fit(data_set: 'pd.DataFrame', y_name: str, x_name: str,
+              starting_param: Dict[str, float]) ->'pd.DataFrame':
     '''Return the fit values and residuals for a given data set.
     '''
+    import pandas as pd
     x_values = data_set.index.get_level_values(x_name)
     y_values = data_set[y_name].values
     fit_results = ql_fit(x_values, y_values, initial_values=starting_param)
@@ -154,11 +313,575 @@ def do_ql_fit(data_set: pd.DataFrame, y_name: str, x_name: str,
     return fit
 
 
-def fit_ql_curve(raw_data: pd.DataFrame, data_names: Dict[str,str],
+def fit_ql_group(x: np.ndarray, yi: np.ndarray,
+                 initial_values: InitialValues = None) ->Dict[str, Any]:
+    '''Fit one group and return the parameters with fit diagnostics.
+    See fit_models.fit_group.
+    '''
+    return fit_group(QL_MODEL, x, yi, initial_values)
+
+
+def fit_ql_groups(data_set: 'pd.DataFrame', y_name: str, x_name: str,
+                  group_names: List[str],
+                  initial_values: InitialValues = None,
+                  max_workers: int = None,
+                  chunk_size: int = None) ->'pd.DataFrame':
+    '''Fit the quadratic-linear model to every group in a data set.
+    See fit_models.fit_groups.
+    Returns:
+        pd.DataFrame -- One row per group, indexed by group_names, with the
+            PARAMETER_COLUMNS and DIAGNOSTIC_COLUMNS.
+    '''
+    return fit_groups(QL_MODEL, data_set, y_name, x_name, group_names,
+                      initial_values, max_workers, chunk_size)
+
+
+# The fitted parameters that are resampled.
+RESAMPLED_PARAMETERS = QL_PARAMETERS
+RESAMPLE_METHODS = ('residuals', 'points', 'jackknife')
+# The damping at which batch_ql_fit stops a fit that cannot improve.
+STALL_DAMPING = 1e10
+INTERVAL_COLUMNS = ['estimate', 'std_error', 'lower', 'upper', 'resamples']
+
+
+def batch_ql_fit(x: np.ndarray, yi: np.ndarray, p0: np.ndarray,
+                 max_iterations: int = 50, tolerance: float = 1e-8,
+                 gradient_tolerance: float = 1e-6
+                 ) ->Tuple[np.ndarray, np.ndarray]:
+    '''Fit the quadratic-linear model to many data sets at once.
+    All data sets are fitted together with Levenberg-Marquardt steps, each
+    data set having its own damping.  The steps are calculated from
+    q_l_jacobian for every data set as one batch of 4x4 equations.
+    A fit is converged when an accepted step is smaller than tolerance.  A
+    fit whose damping grows past STALL_DAMPING without an accepted step is
+    stopped; it is only converged if it is at a stationary point, i.e. the
+    cosine of the angle between the residuals and every Jacobian column is
+    no more than gradient_tolerance.
+    Arguments:
+        x {np.ndarray} -- The x values, shape (data sets, points).
+        yi {np.ndarray} -- The y values, shape (data sets, points).
+        p0 {np.ndarray} -- The starting centre, a2, slope2 and intercept2,
+            shape (4,) for all data sets or (data sets, 4).
+        max_iterations {int, optional} -- The maximum number of steps.
+            Default is 50.
+        tolerance {float, optional} -- The relative parameter change at
+            which a fit is converged.  Default is 1e-8.
+        gradient_tolerance {float, optional} -- The largest residual to
+            Jacobian column cosine for a stalled fit to be converged.
+            Default is 1e-6.
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- The fitted parameters, shape
+            (data sets, 4), and a boolean array marking the converged fits.
+    '''
+    x = np.asarray(x, dtype=float)
+    yi = np.asarray(yi, dtype=float)
+    parameters = np.array(np.broadcast_to(p0, (x.shape[0], 4)), dtype=float)
+
+    def residuals(x, yi, parameters):
+        centre, a2, slope2, intercept2 = parameters.T[..., np.newaxis]
+        offset = np.minimum(x - centre, 0.0)
+        return (yi - x*slope2 - intercept2 - a2*offset*offset), offset
+
+    residual, offset = residuals(x, yi, parameters)
+    residual_sum = np.sum(residual*residual, axis=1)
+    damping = np.full(x.shape[0], 1e-3)
+    converged = np.zeros(x.shape[0], dtype=bool)
+    active = np.arange(x.shape[0])
+    for _ in range(max_iterations):
+        if not active.size:
+            break
+        jacobian = np.empty(offset[active].shape + (4,))
+        jacobian[..., 0] = -2*parameters[active, 1, np.newaxis]*offset[active]
+        jacobian[..., 1] = offset[active]*offset[active]
+        jacobian[..., 2] = x[active]
+        jacobian[..., 3] = 1.0
+        normal = np.einsum('bni,bnj->bij', jacobian, jacobian)
+        gradient = np.einsum('bni,bn->bi', jacobian, residual[active])
+        column_sums = np.einsum('bii->bi', normal).copy()
+        diagonal = np.maximum(column_sums, 1e-12)
+        normal[:, range(4), range(4)] += (damping[active, np.newaxis]
+                                          * diagonal)
+        try:
+            step = np.linalg.solve(normal, gradient[..., np.newaxis])[..., 0]
+        except np.linalg.LinAlgError:
+            step = np.einsum('bij,bj->bi', np.linalg.pinv(normal), gradient)
+        trial = parameters[active] + step
+        trial_residual, trial_offset = residuals(x[active], yi[active], trial)
+        trial_sum = np.sum(trial_residual*trial_residual, axis=1)
+        improved = trial_sum <= residual_sum[active]
+        better = active[improved]
+        parameters[better] = trial[improved]
+        residual[better] = trial_residual[improved]
+        offset[better] = trial_offset[improved]
+        residual_sum[better] = trial_sum[improved]
+        damping[better] /= 10
+        damping[active[~improved]] *= 10
+        small_step = np.all(np.abs(step) <= tolerance*(np.abs(trial)
+                                                       + tolerance), axis=1)
+        # A stalled fit has not moved, so the gradient is at its parameters.
+        stalled = damping[active] > STALL_DAMPING
+        scale = np.sqrt(column_sums*residual_sum[active, np.newaxis])
+        cosine = np.abs(gradient) / np.maximum(scale, 1e-300)
+        stationary = np.all(cosine <= gradient_tolerance, axis=1)
+        converged[active[(improved & small_step)
+                         | (stalled & stationary)]] = True
+        active = active[~((improved & small_step) | stalled)]
+    return parameters, converged
+
+
+def ql_resamples(x: np.ndarray, yi: np.ndarray, fitted: np.ndarray,
+                 method: str, n_resamples: int,
+                 random_generator: np.random.Generator
+                 ) ->Tuple[np.ndarray, np.ndarray]:
+    '''Build the resampled data sets.
+    Arguments:
+        x {np.ndarray} -- The x values.
+        yi {np.ndarray} -- The y values.
+        fitted {np.ndarray} -- The fitted y values.
+        method {str} -- One of RESAMPLE_METHODS:
+            'residuals' -- The fitted values plus resampled residuals.
+            'points' -- Resampled (x, y) points.
+            'jackknife' -- Each data set omits one point; n_resamples is
+                ignored.
+        n_resamples {int} -- The number of resampled data sets.
+        random_generator {np.random.Generator} -- The random numbers.
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- The x and y values of the
+            resampled data sets, shape (data sets, points).
+    '''
+    size = x.size
+    if method == 'jackknife':
+        keep = ~np.eye(size, dtype=bool)
+        return (np.broadcast_to(x, (size, size))[keep].reshape(size, -1),
+                np.broadcast_to(yi, (size, size))[keep].reshape(size, -1))
+    selected = random_generator.integers(0, size, (n_resamples, size))
+    if method == 'residuals':
+        return (np.broadcast_to(x, (n_resamples, size)),
+                fitted + (yi - fitted)[selected])
+    if method == 'points':
+        return x[selected], yi[selected]
+    msg = 'method must be one of {}, not {}.'.format(RESAMPLE_METHODS, method)
+    raise ValueError(msg)
+
+
+def ql_intervals(x: List[float], yi: List[float], n_resamples: int,
+                 method: str, confidence: float,
+                 seed: Union[int, np.random.SeedSequence] = None,
+                 initial_values: InitialValues = None) ->np.ndarray:
+    '''Calculate the values returned by ql_bootstrap as an array.
+    Returns:
+        np.ndarray -- One row for each of RESAMPLED_PARAMETERS with the
+            INTERVAL_COLUMNS.
+    '''
+    x = np.asarray(x, dtype=float)
+    yi = np.asarray(yi, dtype=float)
+    if callable(initial_values):
+        initial_values = initial_values(x, yi)
+    fit_results = ql_fit(x, yi, initial_values)
+    estimate = np.array([fit_results[name] for name in RESAMPLED_PARAMETERS],
+                        dtype=float)
+    fitted = q_l_curve_line(x, *estimate)
+    random_generator = np.random.default_rng(seed)
+    resampled_x, resampled_y = ql_resamples(x, yi, fitted, method,
+                                            n_resamples, random_generator)
+    parameters, converged = batch_ql_fit(resampled_x, resampled_y, estimate)
+    parameters = parameters[converged]
+    alpha = (1 - confidence) / 2
+    if method == 'jackknife':
+        count = parameters.shape[0]
+        std_error = np.sqrt((count - 1) / count * np.sum(
+            (parameters - parameters.mean(axis=0))**2, axis=0))
+        spread = ndtri(1 - alpha) * std_error
+        lower = estimate - spread
+        upper = estimate + spread
+    else:
+        std_error = parameters.std(axis=0, ddof=1)
+        lower, upper = np.percentile(parameters, [100*alpha, 100*(1-alpha)],
+                                     axis=0)
+    resamples = np.full(estimate.size, parameters.shape[0])
+    return np.column_stack([estimate, std_error, lower, upper, resamples])
+
+
+def ql_bootstrap(x: List[float], yi: List[float], n_resamples: int = 1000,
+                 method: str = 'residuals', confidence: float = 0.95,
+                 seed: Union[int, np.random.SeedSequence] = None,
+                 initial_values: InitialValues = None) ->'pd.DataFrame':
+    '''Estimate confidence intervals for the quadratic-linear parameters.
+    The data is fitted, then resampled n_resamples times and all of the
+    resampled data sets are refitted together with batch_ql_fit, starting
+    from the original fit.  Bootstrap intervals are the percentiles of the
+    refitted parameters.  Jackknife intervals use the jackknife standard
+    error with the normal distribution.
+    Arguments:
+        x {List[float]} -- The x values.
+        yi {List[float]} -- The y values.
+        n_resamples {int, optional} -- The number of bootstrap resamples.
+            Default is 1000.
+        method {str, optional} -- One of RESAMPLE_METHODS.  Default is
+            'residuals'.
+        confidence {float, optional} -- The confidence level of the
+            intervals.  Default is 0.95.
+        seed {int, np.random.SeedSequence, optional} -- The seed for the
+            random resampling.
+        initial_values {InitialValues, optional} -- The starting parameters
+            for the original fit.  Default is ql_initial_values.
+    Raises:
+        ValueError -- If method is not one of RESAMPLE_METHODS.
+    Returns:
+        pd.DataFrame -- One row for each of RESAMPLED_PARAMETERS with the
+            INTERVAL_COLUMNS.  resamples is the number of refits that
+            converged.
+    '''
+    if method not in RESAMPLE_METHODS:
+        msg = 'method must be one of {}, not {}.'.format(RESAMPLE_METHODS,
+                                                          method)
+        raise ValueError(msg)
+    import pandas as pd
+    intervals = ql_intervals(x, yi, n_resamples, method, confidence, seed,
+                             initial_values)
+    intervals = pd.DataFrame(intervals, columns=INTERVAL_COLUMNS,
+                             index=pd.Index(RESAMPLED_PARAMETERS,
+                                            name='parameter'))
+    intervals['resamples'] = intervals['resamples'].astype(int)
+    return intervals
+
+
+def bootstrap_ql_chunk(groups: List[Tuple[Any, np.ndarray, np.ndarray,
+                                          np.random.SeedSequence]],
+                       n_resamples: int, method: str, confidence: float,
+                       initial_values: InitialValues
+                       ) ->List[Tuple[Any, np.ndarray]]:
+    '''Calculate the bootstrap intervals for a chunk of groups.
+    Arguments:
+        groups {List[Tuple]} -- (group key, x, yi, seed) for each group.
+        The remaining arguments are passed to ql_intervals.
+    Returns:
+        List[Tuple[Any, np.ndarray]] -- The group key and the intervals
+            for each group.  Groups that cannot be fitted have NaN
+            intervals and 0 resamples.
+    '''
+    results = list()
+    for key, x, yi, seed in groups:
+        try:
+            intervals = ql_intervals(x, yi, n_resamples, method, confidence,
+                                     seed, initial_values)
+        except FIT_ERRORS:
+            intervals = np.full((len(RESAMPLED_PARAMETERS),
+                                 len(INTERVAL_COLUMNS)), np.nan)
+            intervals[:, -1] = 0
+        results.append((key, intervals))
+    return results
+
+
+def bootstrap_ql_groups(data_set: 'pd.DataFrame', y_name: str, x_name: str,
+                        group_names: List[str], n_resamples: int = 1000,
+                        method: str = 'residuals', confidence: float = 0.95,
+                        seed: int = None,
+                        initial_values: InitialValues = None,
+                        max_workers: int = None,
+                        chunk_size: int = None) ->'pd.DataFrame':
+    '''Estimate confidence intervals for every group in a data set.
+    Each group gets its own random stream spawned from seed, so the results
+    do not depend on max_workers or chunk_size.
+    Arguments:
+        data_set {pd.DataFrame} -- The data, with x_name as an index level,
+            as used by find_ql_fit.
+        y_name {str} -- The column containing the y values.
+        x_name {str} -- The index level containing the x values.
+        group_names {List[str]} -- The index levels or columns defining the
+            groups.
+        n_resamples {int, optional} -- The number of bootstrap resamples
+            for each group.  Default is 1000.
+        method {str, optional} -- One of RESAMPLE_METHODS.  Default is
+            'residuals'.
+        confidence {float, optional} -- The confidence level of the
+            intervals.  Default is 0.95.
+        seed {int, optional} -- The seed for the random resampling.
+        initial_values {InitialValues, optional} -- As for fit_ql_groups.
+        max_workers {int, optional} -- As for fit_ql_groups.
+        chunk_size {int, optional} -- As for fit_ql_groups.
+    Raises:
+        ValueError -- If method is not one of RESAMPLE_METHODS.
+    Returns:
+        pd.DataFrame -- The INTERVAL_COLUMNS, indexed by group_names and
+            parameter.
+    '''
+    if method not in RESAMPLE_METHODS:
+        msg = 'method must be one of {}, not {}.'.format(RESAMPLE_METHODS,
+                                                          method)
+        raise ValueError(msg)
+    groups = group_arrays(data_set, y_name, x_name, group_names)
+    seeds = np.random.SeedSequence(seed).spawn(len(groups))
+    items = [group + (group_seed,) for group, group_seed in zip(groups, seeds)]
+    results = map_chunks(bootstrap_ql_chunk, items,
+                         (n_resamples, method, confidence, initial_values),
+                         max_workers, chunk_size)
+    import pandas as pd
+    index = pd.MultiIndex.from_tuples(
+        [key + (name,) for key, _ in results for name in RESAMPLED_PARAMETERS],
+        names=list(group_names) + ['parameter'])
+    intervals = pd.DataFrame(
+        np.concatenate([table for _, table in results]).reshape(
+            -1, len(INTERVAL_COLUMNS)),
+        columns=INTERVAL_COLUMNS, index=index)
+    intervals['resamples'] = intervals['resamples'].astype(int)
+    return intervals
+
+
+# Power sums kept for each cell of the centre grid, as columns of the
+# IncrementalQLFit sums: d^0 .. d^4 and w*d^0 .. w*d^2, where d and w are
+# the x and y values relative to the reference point.
+POWER_SUMS = 8
+# IncrementalQLFit keeps the points of a cell between two candidate centres
+# until there are more than MAX_CELL_POINTS of them.  The cell is then
+# summarised by the power sums of SUB_CELLS equal parts.
+MAX_CELL_POINTS = 4096
+SUB_CELLS = 64
+
+
+def ql_sums_solve(below: np.ndarray, total: np.ndarray, offset: np.ndarray,
+                  square_sum: float) ->Tuple[np.ndarray, np.ndarray]:
+    '''Solve the linear QL parameters for centres from power sums.
+    With d = x - x_ref, w = y - y_ref and e = centre - x_ref, the sums of
+    the normal equations over the points below the centre are polynomials
+    in e of the power sums of d and w, e.g.
+        sum((d - e)^2) = S2 - 2*e*S1 + e^2*S0
+    Arguments:
+        below {np.ndarray} -- The POWER_SUMS of the points below each
+            centre, shape (centres, POWER_SUMS).
+        total {np.ndarray} -- The POWER_SUMS of all points.
+        offset {np.ndarray} -- The centres relative to x_ref.
+        square_sum {float} -- The sum of w^2 over all points.
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- a2, slope2 and the intercept
+            relative to (x_ref, y_ref) for each centre, shape (centres, 3),
+            and the sum of the squared residuals for each centre.
+    '''
+    s0, s1, s2, s3, s4, t0, t1, t2 = below.T
+    e = offset
+    normal = np.empty((e.size, 3, 3))
+    normal[:, 0, 0] = s4 - 4*e*s3 + 6*e*e*s2 - 4*e**3*s1 + e**4*s0
+    normal[:, 0, 1] = normal[:, 1, 0] = s3 - 2*e*s2 + e*e*s1
+    normal[:, 0, 2] = normal[:, 2, 0] = s2 - 2*e*s1 + e*e*s0
+    normal[:, 1, 1] = total[2]
+    normal[:, 1, 2] = normal[:, 2, 1] = total[1]
+    normal[:, 2, 2] = total[0]
+    moments = np.empty((e.size, 3))
+    moments[:, 0] = t2 - 2*e*t1 + e*e*t0
+    moments[:, 1] = total[6]
+    moments[:, 2] = total[5]
+    # With no points below a centre a2 is undetermined; setting its
+    # diagonal term to 1 gives a2 = 0.
+    empty = s0 == 0
+    normal[empty, 0, :] = 0.0
+    normal[empty, :, 0] = 0.0
+    normal[empty, 0, 0] = 1.0
+    moments[empty, 0] = 0.0
+    solution = np.linalg.solve(normal, moments[..., np.newaxis])[..., 0]
+    residual_sum = np.maximum(
+        square_sum - np.sum(solution*moments, axis=1), 0.0)
+    return solution, residual_sum
+
+
+class IncrementalQLFit():
+    '''A quadratic-linear fit updated one point at a time.
+    The candidate centres divide the x axis into cells.  For each cell the
+    power sums of its points are accumulated (see ql_sums_solve), so adding
+    a point only updates one cell, and the exact linear least squares
+    solution for every candidate centre comes from the cumulative sums.
+    The best candidate is refined with Brent's method between its
+    neighbours, starting from the previous optimum when it is still in
+    range.
+    A centre inside a cell also needs the sums of the cell's points below
+    it, so the points of the cells between the first and last candidate
+    centres are kept (points outside the candidate range are not).  Once a
+    cell has more than max_cell_points points they are replaced by the
+    power sums of SUB_CELLS equal parts of the cell, and the sums for a
+    centre inside a part are interpolated linearly.  Memory use is then
+    bounded by the grid size rather than the number of points, and the
+    refinement is exact while every cell holds at most max_cell_points
+    points.
+    '''
+    def __init__(self, x_range: Tuple[float, float] = None,
+                 centres: List[float] = None,
+                 grid_size: int = CENTRE_GRID,
+                 max_cell_points: int = MAX_CELL_POINTS):
+        '''Define the candidate centres.
+        Arguments:
+            x_range {Tuple[float, float], optional} -- The range of the
+                candidate centres.
+            centres {List[float], optional} -- The candidate centres in
+                increasing order.  If not given, grid_size evenly spaced
+                centres over x_range are used.
+            grid_size {int, optional} -- The number of candidate centres
+                when centres is not given.  Default is CENTRE_GRID.
+            max_cell_points {int, optional} -- The number of points kept
+                for each cell before it is summarised.  Default is
+                MAX_CELL_POINTS.
+        Raises:
+            ValueError -- If neither x_range nor centres is given.
+        '''
+        if centres is None:
+            if x_range is None:
+                raise ValueError('Either x_range or centres must be given.')
+            centres = np.linspace(x_range[0], x_range[1], grid_size)
+        self.centres = np.asarray(centres, dtype=float)
+        self.reference = None  # type: Tuple[float, float]
+        self.cell_sums = np.zeros((self.centres.size + 1, POWER_SUMS))
+        self.cell_points = [list() for _ in range(self.centres.size + 1)]
+        self.max_cell_points = max_cell_points
+        self.sub_cell_sums = dict()  # type: Dict[int, np.ndarray]
+        self.square_sum = 0.0
+        self.points = 0
+        self.previous_centre = None  # type: float
+
+    def sub_cell_position(self, cell: int, d: np.ndarray) ->np.ndarray:
+        '''Return the position of relative x values in units of sub cells
+        from the start of a cell.
+        '''
+        lower = self.centres[cell - 1] - self.reference[0]
+        width = self.centres[cell] - self.centres[cell - 1]
+        return (d - lower) * SUB_CELLS / width
+
+    def summarise_cell(self, cell: int):
+        '''Replace the points of a cell with the sums of its sub cells.
+        '''
+        d, w = np.array(self.cell_points[cell]).T
+        part = np.clip(self.sub_cell_position(cell, d).astype(int), 0,
+                       SUB_CELLS - 1)
+        square = d*d
+        sums = np.column_stack([np.ones_like(d), d, square, square*d,
+                                square*square, w, w*d, w*square])
+        sub_cell_sums = np.zeros((SUB_CELLS, POWER_SUMS))
+        np.add.at(sub_cell_sums, part, sums)
+        self.sub_cell_sums[cell] = sub_cell_sums
+        self.cell_points[cell] = list()
+
+    def push(self, x: float, y: float):
+        '''Add a point.
+        Arguments:
+            x {float} -- The x value.
+            y {float} -- The y value.
+        '''
+        if self.reference is None:
+            self.reference = (float(self.centres.mean()), float(y))
+        d = x - self.reference[0]
+        w = y - self.reference[1]
+        cell = int(np.searchsorted(self.centres, x, side='right'))
+        sums = (1.0, d, d*d, d**3, d**4, w, w*d, w*d*d)
+        self.cell_sums[cell] += sums
+        if 0 < cell < self.centres.size:
+            sub_cell_sums = self.sub_cell_sums.get(cell)
+            if sub_cell_sums is not None:
+                part = min(int(self.sub_cell_position(cell, d)),
+                           SUB_CELLS - 1)
+                sub_cell_sums[part] += sums
+            else:
+                self.cell_points[cell].append((d, w))
+                if len(self.cell_points[cell]) > self.max_cell_points:
+                    self.summarise_cell(cell)
+        self.square_sum += w*w
+        self.points += 1
+
+    def push_points(self, x: List[float], yi: List[float]):
+        '''Add several points.
+        '''
+        for x_value, y_value in zip(x, yi):
+            self.push(float(x_value), float(y_value))
+
+    def profile(self, centre: float,
+                cumulative: np.ndarray = None) ->Tuple[np.ndarray, float]:
+        '''Solve the linear parameters for one centre.
+        Arguments:
+            centre {float} -- The centre, between the first and last
+                candidate centres.
+            cumulative {np.ndarray, optional} -- The cumulative cell sums,
+                if already calculated.
+        Raises:
+            ValueError -- If centre is outside the candidate centres.
+        Returns:
+            Tuple[np.ndarray, float] -- a2, slope2 and the relative
+                intercept, and the sum of the squared residuals.
+        '''
+        if not self.centres[0] <= centre <= self.centres[-1]:
+            msg = 'centre must be between {} and {}, got {}.'
+            raise ValueError(msg.format(self.centres[0], self.centres[-1],
+                                        centre))
+        if cumulative is None:
+            cumulative = np.cumsum(self.cell_sums, axis=0)
+        cell = int(np.searchsorted(self.centres, centre, side='right'))
+        e = centre - self.reference[0]
+        below = cumulative[cell - 1].copy()
+        sub_cell_sums = self.sub_cell_sums.get(cell)
+        if sub_cell_sums is not None:
+            position = float(self.sub_cell_position(cell, e))
+            part = min(int(position), SUB_CELLS - 1)
+            below += (sub_cell_sums[:part].sum(axis=0)
+                      + (position - part)*sub_cell_sums[part])
+        elif self.cell_points[cell]:
+            d, w = np.array(self.cell_points[cell]).T
+            inside = d < e
+            d = d[inside]
+            w = w[inside]
+            square = d*d
+            below += (d.size, d.sum(), square.sum(), (square*d).sum(),
+                      (square*square).sum(), w.sum(), (w*d).sum(),
+                      (w*square).sum())
+        solution, residual_sum = ql_sums_solve(
+            below[np.newaxis], cumulative[-1], np.array([e]),
+            self.square_sum)
+        return solution[0], float(residual_sum[0])
+
+    def parameters(self) ->Dict[str, float]:
+        '''Return the current fit.
+        Raises:
+            ValueError -- If fewer than 4 points have been added.
+        Returns:
+            Dict[str, float] -- All of the ql parameters.
+        '''
+        if self.points < 4:
+            raise ValueError('At least 4 points are needed, '
+                             'got {}.'.format(self.points))
+        cumulative = np.cumsum(self.cell_sums, axis=0)
+        offsets = self.centres - self.reference[0]
+        _, residual_sum = ql_sums_solve(cumulative[:-1], cumulative[-1],
+                                        offsets, self.square_sum)
+        best = int(np.argmin(residual_sum))
+        lower = self.centres[max(best - 1, 0)]
+        upper = self.centres[min(best + 1, self.centres.size - 1)]
+        centre = float(self.centres[best])
+        best_sum = residual_sum[best]
+        if upper > lower:
+            start = self.previous_centre
+            if start is None or not lower < start < upper:
+                start = centre
+            # Brent's method can try points outside the bracket.
+            objective = lambda value: self.profile(
+                min(max(value, self.centres[0]), self.centres[-1]),
+                cumulative)[1]
+            try:
+                result = minimize_scalar(objective, method='brent',
+                                         bracket=(lower, start, upper))
+            except ValueError:
+                result = minimize_scalar(objective, method='bounded',
+                                         bounds=(lower, upper))
+            if lower <= result.x <= upper and result.fun < best_sum:
+                centre = float(result.x)
+        (a2, slope2, intercept), _ = self.profile(centre, cumulative)
+        self.previous_centre = centre
+        x_ref, y_ref = self.reference
+        return extra_parameters(centre=centre, a2=float(a2),
+                                slope2=float(slope2),
+                                intercept2=float(intercept + y_ref
+                                                 - slope2*x_ref))
+
+
+def fit_ql_curve(raw_data: 'pd.DataFrame', data_names: Dict[str,str],
                  min_range: float = None, max_range: float = None,
                  step_size: float = 0.1, norm_factor: float = None):
     '''Fit the curve and return fit values in the requested range.
     '''
+    from Tools.data_utilities import nearest_step
     x_name = data_names['X']
     y_name = data_names['Y']
     curve = raw_data.groupby(level=x_name).mean()
@@ -169,30 +892,19 @@ def fit_ql_curve(raw_data: pd.DataFrame, data_names: Dict[str,str],
         max_range = nearest_step(max(raw_x), step_size, towards_zero=True)
     max_range = max_range + step_size/1000
     x_data = np.arange(min_range, max_range, step_size)
-    start_centre = max(x_data) - 1
-    start_intercept = float(curve.loc[curve.idxmax(),y_name].values)
-    initial_values={'centre': start_centre, 'a2': 0,
-                    'slope2': 0, 'intercept2': start_intercept}
     fit_results = find_ql_fit(curve, y_name=y_name, x_name=x_name,
-                              starting_param=initial_values)
+                              starting_param=None)
     y_data = q_l_curve(x_data, fit_results)
-    y_data = [y/norm_factor for y in y_data]
+    if norm_factor:
+        y_data = y_data / norm_factor
     return x_data, y_data
 
 
 def plot_fit(x, yi, fit_results):
-    x_max = max(x)
-    x_min = min(x)
-    x_plotting = np.arange(x_min,x_max, 0.1)
-    yfitted = q_l_curve(x_plotting, fit_results)
-    fig = plt.figure(figsize=(8, 8))
-    ax = fig.add_subplot(1, 1, 1)
-    ax.plot(x, yi, 'o', label='data $y_i$')
-    ax.plot(x_plotting, yfitted, '-', label='fit $f(x_i)$')
-    ax.set_xlabel('Field Size')
-    ax.set_ylabel('Value')
-    ax.legend()
-    plt.show()
+    '''Plot the data and the fitted curve.
+    '''
+    fit_models.plot_fit(QL_MODEL, x, yi, fit_results, x_label='Field Size',
+                        y_label='Value')
 
 
 def print_results(fit_results):
@@ -211,6 +923,7 @@ def main():
     def load_data():
         '''load demo data.
         '''
+        from Tools.spreadsheet_tools import select_sheet, load_data_table
         data_sheet = select_sheet(file_name='TR3 R50 Analysis.xlsx',
                                   sheet_name='ALL PDD parameters',
                                   sub_dir=r'Work\electrons')
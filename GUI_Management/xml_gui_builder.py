@@ -62,8 +62,13 @@ Methods:
         Apply all widget settings settings given in the GUI XML file.
     update_variable(variable_name: str, update_method='from_data')
         Synchronize a TK variable with its corresponding application data.
+    variable_changed(variable_name: str, *args)
+        Record a change to a TK variable.
+    data_changed(data_set: CustomVariableSet, data_names: List[str])
+        Copy changed application data items to their TK variables.
     update_data()
-        Copy all TK variable values to their corresponding application data item.
+        Copy changed TK variable values to their corresponding application
+        data item.
     update_and_run(command: Callable, *args, **kwargs)
         A helper partial that forces a call to update_data before running command.
 
@@ -71,6 +76,7 @@ Methods:
 from typing import Union, TypeVar, List, Dict, Callable, Any
 from pathlib import Path
 from functools import partial
+from contextlib import nullcontext
 import xml.etree.ElementTree as ET
 import re
 import tkinter as tk
@@ -83,6 +89,7 @@ from GUI_Management.object_reference_management import ReferenceSet
 from GUI_Management.object_reference_management import ObjectSet
 from CustomVariableSet.custom_variable_sets import StringV
 from CustomVariableSet.custom_variable_sets import CustomVariableSet
+from CustomVariableSet.custom_variable_sets import CustomVariable
 
 
 ObjectDef = Union[Callable, type]
@@ -138,10 +145,14 @@ class GuiManager():
         self.reference.add_lookup_group('Data', data_set)
         # Question is it a good idea to include globals in the reference set?
         self.reference.add_lookup_group('Globals', globals())
+        self.data_set = data_set
         self.data_link = dict()
+        self.changed_variables = set()
         self.definition = load_xml(xml_file)
         self.reference.set_item('Widget', 'root', tk.Tk())
         self.initialize_variables()
+        if hasattr(data_set, 'add_observer'):
+            data_set.add_observer(self.data_changed)
         self.initialize_images()
         self.initialize_styles()
         self.initialize_windows()
@@ -212,6 +223,8 @@ class GuiManager():
             self.reference.set_item('Variable', name, new_variable)
             self.build_data_link(variable)
             self.update_variable(name, 'from_data')
+            new_variable.trace_add('write',
+                                   partial(self.variable_changed, name))
 
     def initialize_windows(self):
         '''Read in the Window definitions from the XML file and initialize
@@ -532,18 +545,57 @@ class GuiManager():
                 except AttributeError:
                     data_value = data_item
                 variable.set(data_value)
+                self.changed_variables.discard(variable_name)
             if update_method in 'to_data':
                 data_value = variable.get()
-                self.reference.set_item('Data', data_name, data_value)
+                data_item = self.reference.lookup_item('Data', data_name)
+                if isinstance(data_item, CustomVariable):
+                    data_item.value = data_value
+                else:
+                    self.reference.set_item('Data', data_name, data_value)
         pass
 
+    def variable_changed(self, variable_name: str, *args):
+        '''Record a change to a TK variable.
+            Used as the TK variable write trace callback.
+        Arguments:
+            variable_name {str} -- The name of the TK variable.
+            args -- The arguments passed by the TK trace; not used.
+        '''
+        self.changed_variables.add(variable_name)
+
+    def data_changed(self, data_set: CustomVariableSet, data_names: List[str]):
+        '''Copy changed application data items to their TK variables.
+            Used as an observer of the application data CustomVariableSet.
+        Arguments:
+            data_set {CustomVariableSet} -- The application data.
+            data_names {List[str]} -- The names of the changed data items.
+        '''
+        changed_names = set(data_names)
+        for variable_name, data_name in self.data_link.items():
+            if data_name in changed_names:
+                self.update_variable(variable_name, 'from_data')
+
     def update_data(self):
-        '''Copy all TK variable values to their corresponding application
+        '''Copy changed TK variable values to their corresponding application
             data item.
+            Only TK variables that have been written to since they were last
+            synchronized are copied.  When the application data is a
+            CustomVariableSet, all of the changes are applied as one batch.
+            A TK variable stays marked as changed until its value has been
+            accepted by the application data, so if an assignment raises an
+            error, the error is passed on and the value is copied again on the
+            next call.
         '''
-        for variable_name in self.data_link:
-            self.update_variable(variable_name, 'to_data')
-        pass
+        changed = [variable_name for variable_name in self.data_link
+                   if variable_name in self.changed_variables]
+        if not changed:
+            return
+        batch = getattr(self.data_set, 'batch', nullcontext)
+        with batch():
+            for variable_name in changed:
+                self.update_variable(variable_name, 'to_data')
+                self.changed_variables.discard(variable_name)
 
     def update_and_run(self, command: Callable, *args, **kwargs):
         '''A helper partial that forces a call to update_data before running
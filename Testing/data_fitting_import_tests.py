@@ -0,0 +1,100 @@
+'''Import time of the DataFitting numeric core.
+Worker processes only need the fitting functions, so importing them must be
+fast and must not need the plotting or spreadsheet packages.
+    i. Verify that importing the fitting modules does not import pandas,
+        matplotlib or xlwings.
+    ii. Verify that importing the fitting modules takes no more than
+        IMPORT_BUDGET seconds longer than importing numpy and scipy.
+The tests are skipped if the Tools package cannot be found.
+'''
+import unittest
+import os
+import sys
+import json
+import subprocess
+from importlib.util import find_spec
+from pathlib import Path
+
+
+# The allowed import time of the fitting modules in addition to numpy and
+# scipy, in seconds.
+IMPORT_BUDGET = 0.25
+# Each import is timed in this many new processes and the fastest is used.
+REPEATS = 3
+CORE_MODULES = ['Tools.DataFitting.fit_models', 'Tools.DataFitting.ql_fit',
+                'Tools.DataFitting.dual_linear']
+BASE_MODULES = ['numpy', 'scipy.optimize', 'scipy.special']
+LAZY_PACKAGES = ['pandas', 'matplotlib', 'xlwings']
+
+IMPORT_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+for module in {modules!r}:
+    __import__(module)
+elapsed = time.perf_counter() - start
+packages = sorted({{name.split('.')[0] for name in sys.modules}})
+print(json.dumps({{'time': elapsed, 'packages': packages}}))
+'''
+
+
+def tools_path():
+    '''Return the directory containing the Tools package, or None.
+    '''
+    try:
+        spec = find_spec('Tools')
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return Path(list(spec.submodule_search_locations)[0]).parent
+
+
+def time_import(modules, search_path):
+    '''Import modules in a new process.
+    Returns:
+        Tuple[float, List[str]] -- The fastest import time in seconds and
+            the top level packages imported.
+    '''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [str(search_path)] + [p for p in sys.path if p])
+    times = list()
+    for _ in range(REPEATS):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_SCRIPT.format(modules=modules)],
+            stdout=subprocess.PIPE, env=env, check=True)
+        result = json.loads(output.stdout.decode().splitlines()[-1])
+        times.append(result['time'])
+    return min(times), result['packages']
+
+
+class TestImportBudget(unittest.TestCase):
+    '''Test the import cost of the DataFitting modules.
+    '''
+    @classmethod
+    def setUpClass(cls):
+        cls.search_path = tools_path()
+        if cls.search_path is None:
+            raise unittest.SkipTest('The Tools package is not on the path.')
+        cls.core_time, cls.packages = time_import(CORE_MODULES,
+                                                  cls.search_path)
+        cls.base_time, _ = time_import(BASE_MODULES, cls.search_path)
+
+    def test_lazy_packages(self):
+        '''Verify that pandas, matplotlib and xlwings are not imported.
+        '''
+        imported = sorted(set(LAZY_PACKAGES) & set(self.packages))
+        self.assertListEqual(imported, [])
+
+    def test_import_budget(self):
+        '''Verify that the import time is within IMPORT_BUDGET of numpy and
+        scipy.
+        '''
+        overhead = self.core_time - self.base_time
+        msg = 'Importing DataFitting took {:.3f} s, {:.3f} s over numpy ' \
+              'and scipy.'.format(self.core_time, overhead)
+        self.assertLess(overhead, IMPORT_BUDGET, msg)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+'''Fitting the dual line model in DataFitting.dual_linear.
+    i. Verify the transition weights at the ends of the transition band and
+        for a width of 0 or less.
+    ii. Verify the analytical Jacobian against central differences.
+    iii. Verify that the fit recovers the parameters of synthetic data.
+The tests are skipped if the Tools package cannot be found.
+'''
+import unittest
+import numpy as np
+try:
+    from Tools.DataFitting import dual_linear
+except ModuleNotFoundError as err:
+    if err.name != 'Tools':
+        raise
+    dual_linear = None
+
+requires_tools = unittest.skipIf(dual_linear is None,
+                                 'The Tools package is not on the path.')
+
+# The parameters used to build the synthetic data.
+TRUE_PARAMETERS = {'slope1': 0.5, 'intercept1': 2.0, 'slope2': 0.1,
+                   'centre': 10.0, 'width': 4.0}
+PARAMETER_ORDER = ['slope1', 'intercept1', 'slope2', 'centre', 'width']
+
+
+def dual_line_data(points: int = 120, noise: float = 0.01, seed: int = 1):
+    '''Build noisy dual line data from TRUE_PARAMETERS.
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- The x and y values.
+    '''
+    x = np.linspace(0.0, 25.0, points)
+    true_values = [TRUE_PARAMETERS[name] for name in PARAMETER_ORDER]
+    yi = dual_linear.dual_line_curve(x, *true_values)
+    return x, yi + np.random.default_rng(seed).normal(0, noise, points)
+
+
+@requires_tools
+class TestTransitionWeight(unittest.TestCase):
+    '''Check the weights of the two lines.
+    '''
+    def test_band_ends(self):
+        '''Verify the weights at and beyond the ends of the band.
+        '''
+        x = [0.0, 8.0, 10.0, 12.0, 20.0]
+        weight1, weight2 = dual_linear.transition_weight(x, 10.0, 4.0)
+        np.testing.assert_allclose(weight1, [1.0, 1.0, 0.5, 0.0, 0.0],
+                                   atol=1e-15)
+        np.testing.assert_allclose(weight1 + weight2, 1.0)
+
+    def test_band_monotonic(self):
+        '''Verify that the second weight increases across the band.
+        '''
+        x = np.linspace(8.0, 12.0, 41)
+        _, weight2 = dual_linear.transition_weight(x, 10.0, 4.0)
+        self.assertTrue(np.all(np.diff(weight2) > 0))
+
+    def test_zero_width(self):
+        '''Verify that a width of 0 or less switches lines at the centre.
+        '''
+        x = [9.0, 9.999, 10.0, 11.0]
+        for width in (0.0, -1.0):
+            weight1, weight2 = dual_linear.transition_weight(x, 10.0, width)
+            self.assertListEqual(weight1.tolist(), [1.0, 1.0, 0.0, 0.0])
+            self.assertListEqual(weight2.tolist(), [0.0, 0.0, 1.0, 1.0])
+
+    def test_lines_meet(self):
+        '''Verify that the curve follows the two lines outside the band.
+        '''
+        parameters = [TRUE_PARAMETERS[name] for name in PARAMETER_ORDER]
+        results = dual_linear.dual_line_results(*parameters)
+        x = np.array([0.0, 7.9, 12.1, 25.0])
+        curve = dual_linear.dual_line_curve(x, *parameters)
+        line1 = results['slope1']*x + results['intercept1']
+        line2 = results['slope2']*x + results['intercept2']
+        np.testing.assert_allclose(curve[:2], line1[:2])
+        np.testing.assert_allclose(curve[2:], line2[2:])
+        self.assertAlmostEqual(results['slope1']*10.0 + results['intercept1'],
+                               results['slope2']*10.0 + results['intercept2'])
+
+
+@requires_tools
+class TestDualLineJacobian(unittest.TestCase):
+    '''Check the analytical derivatives of the dual line curve.
+    '''
+    def test_central_differences(self):
+        '''Verify the derivatives below, inside and above the band.
+        '''
+        parameters = [TRUE_PARAMETERS[name] for name in PARAMETER_ORDER]
+        x = np.linspace(0.0, 25.0, 101)
+        # The derivatives are not continuous at the ends of the band, so
+        # central differences are not used there.
+        x = x[np.abs(np.abs(x - TRUE_PARAMETERS['centre'])
+                     - TRUE_PARAMETERS['width']/2) > 1e-3]
+        jacobian = dual_linear.dual_line_jacobian(x, *parameters)
+        self.assertTupleEqual(jacobian.shape, (x.size, 5))
+        expected = np.empty_like(jacobian)
+        for column, value in enumerate(parameters):
+            change = 1e-6*max(abs(value), 1.0)
+            upper = list(parameters)
+            lower = list(parameters)
+            upper[column] = value + change
+            lower[column] = value - change
+            expected[:, column] = (dual_linear.dual_line_curve(x, *upper)
+                                   - dual_linear.dual_line_curve(x, *lower)
+                                   ) / (2*change)
+        np.testing.assert_allclose(jacobian, expected, rtol=1e-6, atol=1e-7)
+
+
+@requires_tools
+class TestDualLineFit(unittest.TestCase):
+    '''Check fitting the dual line model.
+    '''
+    def setUp(self):
+        self.x, self.yi = dual_line_data()
+
+    def test_initial_values(self):
+        '''Verify that the starting centre is near the true centre.
+        '''
+        initial_values = dual_linear.dual_line_initial_values(self.x, self.yi)
+        self.assertAlmostEqual(initial_values['centre'],
+                               TRUE_PARAMETERS['centre'], delta=1.0)
+        self.assertGreater(initial_values['width'], 0)
+
+    def test_recovers_parameters(self):
+        '''Verify that the fit recovers the parameters of the data.
+        '''
+        fit_results = dual_linear.dual_line_fit(self.x, self.yi)
+        self.assertListEqual(list(fit_results),
+                             dual_linear.PARAMETER_COLUMNS)
+        tolerance = {'slope1': 0.01, 'intercept1': 0.02, 'slope2': 0.01,
+                     'centre': 0.1, 'width': 0.3}
+        for name in PARAMETER_ORDER:
+            self.assertAlmostEqual(fit_results[name], TRUE_PARAMETERS[name],
+                                   delta=tolerance[name])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,15 +8,28 @@ File_checking tests
     Check insert_base_path
     Check make_full_path
     Check replace_top_dir tests
+    Check file_info_table
+    Check find_duplicates
+    Check dir listing parsing
+    Check DirectoryWatcher
+    Check PathResolver
 '''
 
 import unittest
 import os
+import sys
+import time
 from pathlib import Path
 from operator import itemgetter
 from Testing.test_files_setup import build_test_directory, remove_test_dir
 from file_utilities import FileTypes, get_file_path, make_full_path
 from file_utilities import replace_top_dir, FileTypeError
+from file_utilities import file_info_table, find_duplicates
+from file_utilities import get_file_mod_time
+from file_utilities import read_dir_listing, dir_listing_to_csv
+from file_utilities import DirectoryWatcher, FileEvent
+from file_utilities import PathResolver, get_resolver, set_resolver
+from file_utilities import check_paths
 from typing import Dict
 
 
@@ -245,6 +258,60 @@ class TestFileExists(unittest.TestCase):
         self.assertEqual(test_dir, file_path)
 
 
+class TestCheckPaths(unittest.TestCase):
+    '''Batch path checks with check_paths.
+    '''
+    def setUp(self):
+        '''Make test files.
+        '''
+        self.files = build_test_directory()
+        self.base_path = Path.cwd() / 'Testing' / 'test folder'
+        self.text_type = FileTypes('Text File')
+        self.dir_type = FileTypes('directory')
+
+    def tearDown(self):
+        '''Remove the test directory.
+        '''
+        remove_test_dir(self.files)
+
+    def path_checks(self):
+        '''Build a list of path checks covering the make_full_path cases.
+        '''
+        return [('test_file.txt', self.text_type, True, self.base_path),
+                ('test.log', self.text_type, True, self.base_path),
+                ('test_excel.xls', self.text_type, True, self.base_path),
+                ('does_not_exist.txt', self.text_type, True, self.base_path),
+                ('does_not_exist.txt', self.text_type, False, self.base_path),
+                (self.base_path, self.dir_type, True, None),
+                (self.base_path, self.text_type, True, None),
+                ('test_file.txt', self.dir_type, True, self.base_path)]
+
+    def check_results(self, results):
+        '''Compare the check_paths results with make_full_path.
+        '''
+        for path_check, result in zip(self.path_checks(), results):
+            file_name, file_types, must_exist, base_path = path_check
+            try:
+                expected = make_full_path(file_name, file_types,
+                                          must_exist, base_path)
+            except (FileNotFoundError, FileTypeError) as err:
+                self.assertIsInstance(result, type(err))
+            else:
+                self.assertEqual(result, expected)
+
+    def test_matches_make_full_path(self):
+        '''Verify that check_paths gives the same results as make_full_path.
+        '''
+        results = check_paths(self.path_checks())
+        self.assertEqual(len(results), 8)
+        self.check_results(results)
+
+    def test_no_threads(self):
+        '''Verify that check_paths without threads gives the same results.
+        '''
+        self.check_results(check_paths(self.path_checks(), max_workers=0))
+
+
 class TestDirExists(unittest.TestCase):
     '''Make_full_path existing directory test
     '''
@@ -495,3 +562,453 @@ class TestInsertBasePath(unittest.TestCase):
         '''
         with self.assertRaises(TypeError):
             get_file_path(1, base_path=self.base_path)
+
+
+class TestFileInfoTable(unittest.TestCase):
+    '''Check the file_info_table metadata collection.'''
+    def setUp(self):
+        '''Make txt, xls and log files.
+        '''
+        self.files = build_test_directory()
+
+    def tearDown(self):
+        '''Remove the test directory.
+        '''
+        remove_test_dir(self.files)
+
+    def test_all_files(self):
+        '''Confirm that one row is returned for each file in the directory.
+        '''
+        info = file_info_table(self.files['test_dir'])
+        file_paths = {str(self.files[file])
+                      for file in ('text_file', 'excel_file', 'log_file')}
+        self.assertSetEqual(set(info['path']), file_paths)
+
+    def test_columns(self):
+        '''Confirm the table columns and the modification time type.
+        '''
+        info = file_info_table(self.files['test_dir'])
+        columns = ['path', 'parent', 'stem', 'suffix', 'size', 'mtime',
+                   'file_type']
+        self.assertListEqual(list(info.columns), columns)
+        self.assertTrue(str(info['mtime'].dtype).startswith('datetime64'))
+
+    @unittest.skipUnless(hasattr(time, 'tzset'), 'Requires time.tzset.')
+    def test_local_mtime(self):
+        '''Confirm that the modification time is local time, matching
+        get_file_mod_time.
+        '''
+        saved_zone = os.environ.get('TZ')
+        os.environ['TZ'] = 'America/Vancouver'
+        time.tzset()
+        try:
+            info = file_info_table(self.files['test_dir']).set_index('stem')
+            mod_time = get_file_mod_time(self.files['excel_file'])
+        finally:
+            if saved_zone is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = saved_zone
+            time.tzset()
+        self.assertEqual(
+            info.at['test_excel', 'mtime'].strftime('%Y-%m-%d %H:%M:%S'),
+            mod_time)
+
+    def test_file_type_group(self):
+        '''Confirm that the file type group is identified.
+        '''
+        info = file_info_table(self.files['test_dir']).set_index('stem')
+        self.assertEqual(info.at['test_excel', 'file_type'], 'Excel Files')
+        self.assertEqual(info.at['test_excel', 'suffix'], '.xls')
+
+    def test_file_type_selection(self):
+        '''Confirm that only files of the requested type are returned.
+        '''
+        info = file_info_table(self.files['test_dir'],
+                               file_type='Text File')
+        self.assertListEqual(list(info['path']),
+                             [str(self.files['text_file'])])
+
+
+class TestFindDuplicates(unittest.TestCase):
+    '''Check the duplicate file search.'''
+    def setUp(self):
+        '''Make test files with duplicated content.
+        Make two small identical text files and one that differs only in
+        its last character.
+        Make two large identical files and one that differs only in the
+        middle, so that it matches on the partial hash.
+        '''
+        self.files = build_test_directory()
+        test_dir = self.files['test_dir']
+        small_files = {'small_1': ('small_1.txt', 'duplicate text'),
+                       'small_2': ('small_2.txt', 'duplicate text'),
+                       'small_3': ('small_3.txt', 'duplicate texT')}
+        for file, (file_name, text) in small_files.items():
+            self.files[file] = test_dir / file_name
+            self.files[file].write_text(text)
+        large_content = bytes(range(256)) * 64
+        changed_content = bytearray(large_content)
+        changed_content[len(large_content)//2] += 1
+        large_files = {'large_1': ('large_1.dat', large_content),
+                       'large_2': ('large_2.dat', large_content),
+                       'large_3': ('large_3.dat', bytes(changed_content))}
+        for file, (file_name, content) in large_files.items():
+            self.files[file] = test_dir / file_name
+            self.files[file].write_bytes(content)
+
+    def tearDown(self):
+        '''Remove the test directory.
+        '''
+        remove_test_dir(self.files)
+
+    def test_duplicate_groups(self):
+        '''Confirm that only the identical files are grouped.
+        Empty files are ignored.
+        '''
+        duplicates = find_duplicates(self.files['test_dir'], block_size=1024)
+        expected = [[self.files['large_1'], self.files['large_2']],
+                    [self.files['small_1'], self.files['small_2']]]
+        self.assertListEqual(duplicates, expected)
+
+    def test_duplicate_file_type(self):
+        '''Confirm that only files of the requested type are compared.
+        '''
+        duplicates = find_duplicates(self.files['test_dir'],
+                                     file_type='Text File')
+        expected = [[self.files['small_1'], self.files['small_2']]]
+        self.assertListEqual(duplicates, expected)
+
+    def test_duplicate_suffix_list(self):
+        '''Confirm that a list of suffixes is used as in dir_iter.
+        '''
+        duplicates = find_duplicates(self.files['test_dir'],
+                                     file_type=['.dat'], block_size=1024)
+        expected = [[self.files['large_1'], self.files['large_2']]]
+        self.assertListEqual(duplicates, expected)
+
+
+DIR_LISTING = '''
+ Volume in drive C is OS
+
+ Directory of C:\\Test\\Top
+
+2016-04-21  02:06 PM    <DIR>          .
+2016-04-21  02:06 PM              3,491 xcopy.txt
+2017-03-07  09:45 AM         29274112 Course Planning.one
+2017-03-07  09:45 AM              100 my.data.file.csv
+               3 File(s)     29,277,703 bytes
+
+ Directory of C:\\Test\\Top\\Sub
+
+2018-01-01  11:15 PM                 12 README
+               1 File(s)             12 bytes
+
+     Total Files Listed:
+               4 File(s)     29,277,715 bytes
+               2 Dir(s)  100,000,000 bytes free
+'''
+
+
+DAY_FIRST_LISTING = '''
+ Directory of C:\\Test\\Top
+
+03/04/2016  02:06 PM              3,491 xcopy.txt
+05/06/2016  09:45 AM                100 early.csv
+21/04/2016  02:06 PM                 12 README
+07/03/2017  09:45 AM         29,274,112 Course Planning.one
+               4 File(s)     29,277,715 bytes
+'''
+
+
+MONTH_FIRST_LISTING = '''
+ Directory of C:\\Test\\Top
+
+03/04/2016  02:06 PM              3,491 xcopy.txt
+05/06/2016  09:45 AM                100 early.csv
+04/21/2016  02:06 PM                 12 README
+07/03/2017  09:45 AM         29,274,112 Course Planning.one
+               4 File(s)     29,277,715 bytes
+'''
+
+
+class TestDirListing(unittest.TestCase):
+    '''Check parsing of Windows dir output.'''
+    def setUp(self):
+        '''Write a dir listing file to the test directory.
+        '''
+        self.files = build_test_directory()
+        self.files['listing'] = self.files['test_dir'] / 'listing.txt'
+        self.files['listing'].write_text(DIR_LISTING)
+        self.date_format = '%Y-%m-%d %I:%M %p'
+
+    def tearDown(self):
+        '''Remove the test directory.
+        '''
+        remove_test_dir(self.files)
+
+    def test_file_lines(self):
+        '''Confirm the file names, extensions and sizes.
+        '''
+        file_table, _ = read_dir_listing(self.files['listing'],
+                                         date_format=self.date_format)
+        self.assertListEqual(list(file_table['name']),
+                             ['xcopy', 'Course Planning', 'my.data.file',
+                              'README'])
+        self.assertListEqual(list(file_table['ext']),
+                             ['.txt', '.one', '.csv', ''])
+        self.assertListEqual(list(file_table['size']),
+                             [3491, 29274112, 100, 12])
+        self.assertEqual(file_table.at[0, 'modified'].hour, 14)
+
+    def test_directory_across_chunks(self):
+        '''Confirm that the directory is carried between chunks.
+        '''
+        file_table, _ = read_dir_listing(self.files['listing'],
+                                         chunk_lines=3,
+                                         date_format=self.date_format)
+        directories = ['C:\\Test\\Top']*3 + ['C:\\Test\\Top\\Sub']
+        self.assertListEqual(list(file_table['directory']), directories)
+
+    def test_summary_lines(self):
+        '''Confirm that the directory and total summaries are identified.
+        '''
+        _, summary_table = read_dir_listing(self.files['listing'],
+                                            chunk_lines=4,
+                                            date_format=self.date_format)
+        self.assertListEqual(list(summary_table['num_files']), [3, 1, 4])
+        self.assertListEqual(list(summary_table['total']),
+                             [False, False, True])
+        self.assertEqual(summary_table.at[1, 'directory'],
+                         'C:\\Test\\Top\\Sub')
+
+    def test_inferred_date_format(self):
+        '''Confirm that the inferred date format is the same in every chunk.
+        '''
+        file_table, _ = read_dir_listing(self.files['listing'], chunk_lines=2)
+        self.assertFalse(file_table['modified'].isna().any())
+        self.assertEqual(file_table.at[3, 'modified'].hour, 23)
+
+    def test_day_first_chunks(self):
+        '''Confirm that day first dates do not depend on chunk_lines.
+        '''
+        self.files['listing'].write_text(DAY_FIRST_LISTING)
+        for chunk_lines in (2, 3, 100):
+            file_table, _ = read_dir_listing(self.files['listing'],
+                                             chunk_lines=chunk_lines)
+            modified = file_table['modified']
+            self.assertListEqual(list(modified.dt.month), [4, 6, 4, 3])
+            self.assertListEqual(list(modified.dt.day), [3, 5, 21, 7])
+
+    def test_month_first_chunks(self):
+        '''Confirm that month first dates are not read as day first when
+        the first chunk fits both.
+        '''
+        self.files['listing'].write_text(MONTH_FIRST_LISTING)
+        for chunk_lines in (2, 3, 100):
+            file_table, _ = read_dir_listing(self.files['listing'],
+                                             chunk_lines=chunk_lines)
+            modified = file_table['modified']
+            self.assertListEqual(list(modified.dt.month), [3, 5, 4, 7])
+            self.assertListEqual(list(modified.dt.day), [4, 6, 21, 3])
+
+    def test_ambiguous_dates(self):
+        '''Confirm that dates that fit both day first and month first
+        formats raise an error unless date_format is given.
+        '''
+        listing = MONTH_FIRST_LISTING.replace('04/21/2016', '04/11/2016')
+        self.files['listing'].write_text(listing)
+        with self.assertRaises(ValueError) as context:
+            read_dir_listing(self.files['listing'], chunk_lines=3)
+        self.assertIn('date_format', str(context.exception))
+        file_table, _ = read_dir_listing(self.files['listing'],
+                                         date_format='%m/%d/%Y %I:%M %p')
+        self.assertListEqual(list(file_table['modified'].dt.day),
+                             [4, 6, 11, 3])
+
+    def test_date_format_mismatch(self):
+        '''Confirm that a date that does not match the format raises an error.
+        '''
+        self.files['listing'].write_text(DAY_FIRST_LISTING)
+        with self.assertRaises(ValueError):
+            read_dir_listing(self.files['listing'], chunk_lines=3,
+                             date_format='%m/%d/%Y %I:%M %p')
+
+    def test_csv_output(self):
+        '''Confirm that the csv file contains one line per file.
+        '''
+        self.files['csv'] = self.files['test_dir'] / 'listing.csv'
+        num_files = dir_listing_to_csv(self.files['listing'],
+                                       self.files['csv'], chunk_lines=5,
+                                       date_format=self.date_format)
+        self.assertEqual(num_files, 4)
+        csv_lines = self.files['csv'].read_text().splitlines()
+        self.assertEqual(len(csv_lines), 5)
+
+
+class TestDirectoryWatcher(unittest.TestCase):
+    '''Check the directory watcher using polling.'''
+    use_inotify = False
+
+    def setUp(self):
+        '''Make txt, xls and log files and start watching for Excel files.
+        '''
+        self.files = build_test_directory()
+        self.watcher = DirectoryWatcher(self.files['test_dir'],
+                                        file_type='Excel Files',
+                                        debounce=0.2, poll_interval=0.05,
+                                        use_inotify=self.use_inotify)
+
+    def tearDown(self):
+        '''Stop watching and remove the test directory.
+        '''
+        self.watcher.close()
+        remove_test_dir(self.files)
+
+    def test_no_changes(self):
+        '''Confirm that an empty batch is returned on timeout.
+        '''
+        self.assertListEqual(self.watcher.next_batch(timeout=0.3), [])
+
+    def test_created_and_modified(self):
+        '''Confirm that a new file that is then modified is reported once
+        as created and that other file types are ignored.
+        '''
+        self.files['new_excel'] = self.files['test_dir'] / 'new.xlsx'
+        self.files['new_excel'].write_text('first')
+        self.files['new_excel'].write_text('second')
+        self.files['text_file'].write_text('changed')
+        changes = self.watcher.next_batch(timeout=2)
+        self.assertListEqual(changes,
+                             [FileEvent('created', self.files['new_excel'])])
+
+    def test_modified_and_deleted(self):
+        '''Confirm that modified and deleted files are reported.
+        '''
+        self.files['excel_file'].write_text('changed')
+        changes = self.watcher.next_batch(timeout=2)
+        self.assertListEqual(changes,
+                             [FileEvent('modified', self.files['excel_file'])])
+        excel_file = self.files.pop('excel_file')
+        os.remove(excel_file)
+        changes = self.watcher.next_batch(timeout=2)
+        self.assertListEqual(changes, [FileEvent('deleted', excel_file)])
+
+
+@unittest.skipUnless(sys.platform.startswith('linux'), 'Requires inotify.')
+class TestInotifyWatcher(TestDirectoryWatcher):
+    '''Check the directory watcher using inotify.'''
+    use_inotify = True
+
+    def test_directory_moved_away(self):
+        '''Confirm that the files in a directory moved out of the watched
+        tree are reported as deleted and are no longer watched.
+        '''
+        self.files['sub_dir'] = self.files['test_dir'] / 'sub'
+        self.files['sub_dir'].mkdir()
+        sub_file = self.files['sub_dir'] / 'sub.xls'
+        sub_file.write_text('first')
+        changes = self.watcher.next_batch(timeout=2)
+        self.assertListEqual(changes, [FileEvent('created', sub_file)])
+        self.files['moved_dir'] = self.files['test_dir'].parent / 'moved dir'
+        self.files['sub_dir'].rename(self.files['moved_dir'])
+        del self.files['sub_dir']
+        changes = self.watcher.next_batch(timeout=2)
+        self.assertListEqual(changes, [FileEvent('deleted', sub_file)])
+        self.files['moved_file'] = self.files['moved_dir'] / 'sub.xls'
+        self.files['moved_file'].write_text('second')
+        self.assertListEqual(self.watcher.next_batch(timeout=0.5), [])
+
+    def test_queue_overflow(self):
+        '''Confirm that changes lost when the event queue overflows are
+        found by scanning the tree.
+        '''
+        # Create and delete enough other files to fill the queue, so that
+        # the changes to the Excel files are lost.
+        overflow_file = self.files['test_dir'] / 'overflow.txt'
+        for _ in range(10000):
+            overflow_file.touch()
+            overflow_file.unlink()
+        self.files['new_excel'] = self.files['test_dir'] / 'new.xlsx'
+        self.files['new_excel'].write_text('new')
+        self.files['excel_file'].write_text('changed')
+        changes = self.watcher.next_batch(timeout=2)
+        self.assertCountEqual(changes,
+                              [FileEvent('created', self.files['new_excel']),
+                               FileEvent('modified',
+                                         self.files['excel_file'])])
+
+
+class TestPathResolver(unittest.TestCase):
+    '''Check the named root directory lookup.'''
+    def setUp(self):
+        '''Make test files.
+        Make Testing as the base root and write a configuration file.
+        '''
+        self.files = build_test_directory()
+        self.base_path = Path.cwd() / 'Testing'
+        self.files['config'] = self.files['test_dir'] / 'paths.ini'
+        self.files['config'].write_text('[roots]\n'
+                                        'base = {}\n'
+                                        'tests = test folder\n'.format(
+                                            self.base_path))
+        self.saved_resolver = get_resolver()
+
+    def tearDown(self):
+        '''Restore the shared resolver and remove the test directory.
+        '''
+        set_resolver(self.saved_resolver)
+        remove_test_dir(self.files)
+
+    def test_config_roots(self):
+        '''Confirm that roots are read from the configuration file and that
+        relative roots are relative to the base root.
+        '''
+        resolver = PathResolver(config_file=self.files['config'],
+                                use_environment=False)
+        self.assertEqual(resolver.root(), self.base_path)
+        self.assertEqual(resolver.root('tests'), self.files['test_dir'])
+
+    def test_environment_root(self):
+        '''Confirm that environment variables override the configuration
+        file.
+        '''
+        os.environ['UTILITIES_ROOT_TESTS'] = str(self.files['test_dir'])
+        try:
+            resolver = PathResolver(roots={'base': self.files['test_dir']})
+        finally:
+            del os.environ['UTILITIES_ROOT_TESTS']
+        self.assertEqual(resolver.root('tests'), self.files['test_dir'])
+        self.assertEqual(resolver.root(), self.files['test_dir'])
+
+    def test_unknown_root(self):
+        '''Confirm that an undefined root raises FileNotFoundError.
+        '''
+        resolver = PathResolver(use_environment=False)
+        with self.assertRaises(FileNotFoundError):
+            resolver.root('not_defined')
+
+    def test_default_base(self):
+        '''Confirm that the base root defaults to the current directory.
+        '''
+        resolver = PathResolver(base_options={}, use_environment=False)
+        self.assertEqual(resolver.root(), Path.cwd())
+
+    def test_cached_root(self):
+        '''Confirm that computed roots are cached until a root is changed.
+        '''
+        resolver = PathResolver(roots={'base': self.base_path},
+                                use_environment=False)
+        self.assertIs(resolver.root(), resolver.root())
+        resolver.add_root('base', self.files['test_dir'])
+        self.assertEqual(resolver.root(), self.files['test_dir'])
+
+    def test_get_file_path_root(self):
+        '''Confirm that get_file_path uses the shared resolver roots.
+        '''
+        set_resolver(PathResolver(config_file=self.files['config'],
+                                  use_environment=False))
+        text_file = get_file_path('test_file.txt', root='tests')
+        self.assertEqual(text_file, self.files['text_file'])
+        test_dir = get_file_path('test folder')
+        self.assertEqual(test_dir, self.files['test_dir'])
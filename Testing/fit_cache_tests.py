@@ -0,0 +1,251 @@
+'''The on-disk cache of fit results in DataFitting.fit_cache.
+    i. Verify cache hits and misses, including a changed cache format.
+    ii. Verify that the least recently used results are evicted.
+    iii. Verify that the shared cache does not change fit results, in
+        particular for initial values given by lambdas and closures.
+    iv. Verify that a changed model or initial_values strategy does not
+        reuse cached results.
+    v. Verify that failed group fits are not cached.
+The tests are skipped if the Tools package cannot be found.
+'''
+import unittest
+from unittest import mock
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+try:
+    from Tools.DataFitting import fit_cache, fit_models, ql_fit
+except ModuleNotFoundError as err:
+    if err.name != 'Tools':
+        raise
+    fit_cache = fit_models = ql_fit = None
+
+requires_tools = unittest.skipIf(fit_cache is None,
+                                 'The Tools package is not on the path.')
+
+
+def ql_data(points: int = 60, seed: int = 1):
+    '''Build noisy quadratic-linear data with a centre of 7.
+    '''
+    x = np.linspace(2.0, 15.0, points)
+    yi = ql_fit.q_l_curve_line(x, 7.0, -0.08, 0.2, 5.0)
+    return x, yi + np.random.default_rng(seed).normal(0, 0.02, points)
+
+
+def module_start(x, yi):
+    '''Module level starting values, which can be cached.
+    '''
+    return {'centre': 8.0, 'a2': -0.05, 'slope2': 0.0, 'intercept2': 7.0}
+
+
+class StartSwitch():
+    '''Controls whether switched_start fails.
+    '''
+    fail = False
+
+
+def switched_start(x, yi):
+    '''Module level starting values that fail while StartSwitch.fail is
+    True.
+    '''
+    if StartSwitch.fail:
+        raise ValueError('No starting values.')
+    return module_start(x, yi)
+
+
+def make_start(centre: float):
+    '''Return a closure giving starting values with the given centre.
+    '''
+    def start(x, yi):
+        return {'centre': centre, 'a2': 0.0, 'slope2': 0.0,
+                'intercept2': 0.0}
+    return start
+
+
+@requires_tools
+class TestFitCache(unittest.TestCase):
+    '''Test storing and evicting results in a FitCache.
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = fit_cache.FitCache(self.temp_dir.name)
+        self.x, self.yi = ql_data()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_hit(self):
+        '''Verify that a stored result is returned.
+        '''
+        key = fit_cache.fit_key('ql', self.x, self.yi)
+        result = {'centre': np.float64(7.5), 'status': 'ok'}
+        self.cache.put(key, result)
+        self.assertIn(key, self.cache)
+        self.assertDictEqual(self.cache.get(key), result)
+
+    def test_miss(self):
+        '''Verify that changed inputs give a different key and no result.
+        '''
+        key = fit_cache.fit_key('ql', self.x, self.yi)
+        self.cache.put(key, {'centre': 7.5})
+        changed_y = self.yi.copy()
+        changed_y[0] += 1e-9
+        other_keys = [fit_cache.fit_key('dual_line', self.x, self.yi),
+                      fit_cache.fit_key('ql', self.x, changed_y),
+                      fit_cache.fit_key('ql', self.x, self.yi,
+                                        {'centre': 7.0}),
+                      fit_cache.fit_key('ql', self.x, self.yi, module_start)]
+        for other_key in other_keys:
+            self.assertNotEqual(other_key, key)
+            self.assertIsNone(self.cache.get(other_key))
+
+    def test_format_version(self):
+        '''Verify that a new cache format version changes the keys.
+        '''
+        key = fit_cache.fit_key('ql', self.x, self.yi)
+        with mock.patch.object(fit_cache, 'CACHE_FORMAT_VERSION',
+                               fit_cache.CACHE_FORMAT_VERSION + 1):
+            self.assertNotEqual(fit_cache.fit_key('ql', self.x, self.yi),
+                                key)
+
+    def test_lru_eviction(self):
+        '''Verify that the least recently used results are removed first.
+        '''
+        keys = ['key{}'.format(index) for index in range(4)]
+        for index, key in enumerate(keys[:3]):
+            self.cache.put(key, {'value': index})
+            os.utime(str(self.cache.result_path(key)),
+                     (1000.0 + index, 1000.0 + index))
+        entry_size = self.cache.result_path(keys[0]).stat().st_size
+        # Reading the oldest result makes it the most recently used.
+        self.cache.get(keys[0])
+        self.cache.max_size = int(3.5*entry_size)
+        self.cache.put(keys[3], {'value': 3})
+        self.assertNotIn(keys[1], self.cache)
+        for key in (keys[0], keys[2], keys[3]):
+            self.assertIn(key, self.cache)
+        self.assertEqual(self.cache.size(), 3*entry_size)
+
+    def test_clear(self):
+        '''Verify that clear removes all results.
+        '''
+        self.cache.put('key', {'value': 1})
+        self.cache.clear()
+        self.assertEqual(self.cache.size(), 0)
+        self.assertIsNone(self.cache.get('key'))
+
+
+@requires_tools
+class TestCacheableValues(unittest.TestCase):
+    '''Test which initial values can be identified in a cache key.
+    '''
+    def test_cacheable(self):
+        '''Verify that data and module level functions are cacheable.
+        '''
+        for initial_values in (None, {'centre': 7.0}, module_start,
+                               ql_fit.ql_initial_values):
+            self.assertTrue(fit_cache.cacheable(initial_values))
+
+    def test_not_cacheable(self):
+        '''Verify that lambdas, closures and other callables are not.
+        '''
+        for initial_values in (lambda x, yi: {}, make_start(7.0),
+                               TestCacheableValues.test_cacheable.__get__(
+                                   self), max):
+            self.assertFalse(fit_cache.cacheable(initial_values))
+
+
+@requires_tools
+class TestSharedCache(unittest.TestCase):
+    '''Test that the shared cache does not change fit results.
+    '''
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = fit_cache.FitCache(self.temp_dir.name)
+        fit_cache.set_fit_cache(self.cache)
+        self.x, self.yi = ql_data()
+
+    def tearDown(self):
+        fit_cache.set_fit_cache(None)
+        self.temp_dir.cleanup()
+
+    def test_cached_fit(self):
+        '''Verify that a repeated fit is read from the cache.
+        '''
+        first = ql_fit.ql_fit(self.x, self.yi, initial_values=module_start)
+        self.assertEqual(len(list(os.scandir(self.temp_dir.name))), 1)
+        second = ql_fit.ql_fit(self.x, self.yi, initial_values=module_start)
+        self.assertDictEqual(first, second)
+
+    def test_closure_initial_values(self):
+        '''Verify that closures from the same factory do not share results.
+        '''
+        cached = [ql_fit.ql_fit(self.x, self.yi, make_start(centre))
+                  for centre in (7.0, 19.9)]
+        fit_cache.set_fit_cache(None)
+        expected = [ql_fit.ql_fit(self.x, self.yi, make_start(centre))
+                    for centre in (7.0, 19.9)]
+        self.assertDictEqual(cached[0], expected[0])
+        self.assertDictEqual(cached[1], expected[1])
+        self.assertNotEqual(cached[0]['centre'], cached[1]['centre'])
+        self.assertEqual(len(list(os.scandir(self.temp_dir.name))), 0)
+
+    def test_lambda_initial_values(self):
+        '''Verify that lambdas are not cached.
+        '''
+        ql_fit.ql_fit(self.x, self.yi, lambda x, yi: module_start(x, yi))
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_model_changes(self):
+        '''Verify that fits of a changed model, initial_values strategy or
+        fit option are not read from the cache.
+        '''
+        model = ql_fit.QL_MODEL
+        fit_models.fit_model(model, self.x, self.yi)
+        fit_models.fit_model(model, self.x, self.yi)
+        self.assertEqual(len(list(os.scandir(self.temp_dir.name))), 1)
+        changed_models = [model._replace(version=model.version + 1),
+                          model._replace(initial_values=module_start),
+                          model._replace(result_names=model.parameters)]
+        for changed_model in changed_models:
+            fit_models.fit_model(changed_model, self.x, self.yi)
+        fit_models.fit_model(model, self.x, self.yi, analytic_jacobian=False)
+        self.assertEqual(len(list(os.scandir(self.temp_dir.name))), 5)
+
+    def test_lambda_strategy(self):
+        '''Verify that a model whose initial_values strategy is a lambda is
+        not cached.
+        '''
+        model = ql_fit.QL_MODEL._replace(
+            initial_values=lambda x, yi: module_start(x, yi))
+        fit_models.fit_model(model, self.x, self.yi)
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_failed_groups(self):
+        '''Verify that failed group fits are not cached, so they are
+        fitted again.
+        '''
+        x, yi = ql_data(points=20)
+        data_set = pd.DataFrame({'group': ['a']*10 + ['b']*10, 'x': x,
+                                 'y': yi}).set_index(['group', 'x'])
+        StartSwitch.fail = True
+        fits = ql_fit.fit_ql_groups(data_set, 'y', 'x', ['group'],
+                                    initial_values=switched_start,
+                                    max_workers=0)
+        self.assertListEqual(list(fits['status']), ['failed', 'failed'])
+        self.assertEqual(self.cache.size(), 0)
+        StartSwitch.fail = False
+        fits = ql_fit.fit_ql_groups(data_set, 'y', 'x', ['group'],
+                                    initial_values=switched_start,
+                                    max_workers=0)
+        self.assertListEqual(list(fits['status']), ['ok', 'ok'])
+        self.assertEqual(len(list(os.scandir(self.temp_dir.name))), 2)
+        cached = ql_fit.fit_ql_groups(data_set, 'y', 'x', ['group'],
+                                      initial_values=switched_start,
+                                      max_workers=0)
+        pd.testing.assert_frame_equal(cached, fits)
+
+
+if __name__ == '__main__':
+    unittest.main()
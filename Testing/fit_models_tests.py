@@ -0,0 +1,150 @@
+'''The model registry and fitting engine in DataFitting.fit_models.
+    i. Verify that registered models are returned by name.
+    ii. Verify that an unknown model name raises a KeyError listing the
+        registered models.
+    iii. Verify that a new model can be fitted with fit_model and
+        fit_groups.
+The tests are skipped if the Tools package cannot be found.
+'''
+import unittest
+import numpy as np
+import pandas as pd
+try:
+    from Tools.DataFitting import fit_models
+    from Tools.DataFitting import ql_fit, dual_linear
+except ModuleNotFoundError as err:
+    if err.name != 'Tools':
+        raise
+    fit_models = None
+
+requires_tools = unittest.skipIf(fit_models is None,
+                                 'The Tools package is not on the path.')
+
+
+def exponential_curve(x, amplitude, rate):
+    '''The toy model: amplitude*exp(-rate*x).
+    '''
+    return amplitude*np.exp(-rate*np.asarray(x, dtype=float))
+
+
+def exponential_jacobian(x, amplitude, rate):
+    '''The derivatives of exponential_curve.
+    '''
+    x = np.asarray(x, dtype=float)
+    decay = np.exp(-rate*x)
+    return np.column_stack([decay, -amplitude*x*decay])
+
+
+def exponential_results(amplitude, rate, half_life=None):
+    '''Add the half life to the toy model parameters.
+    '''
+    return {'amplitude': amplitude, 'rate': rate,
+            'half_life': np.log(2)/rate}
+
+
+def exponential_start(x, yi):
+    '''Starting values for the toy model.
+    '''
+    return {'amplitude': float(np.max(yi)), 'rate': 1.0}
+
+
+if fit_models is not None:
+    TOY_MODEL = fit_models.FitModel(
+        name='test_exponential', parameters=['amplitude', 'rate'],
+        function=exponential_curve, jacobian=exponential_jacobian,
+        derived=exponential_results, initial_values=exponential_start,
+        result_names=['amplitude', 'rate', 'half_life'])
+
+
+@requires_tools
+class TestRegistry(unittest.TestCase):
+    '''Test registering and looking up models.
+    '''
+    def tearDown(self):
+        fit_models.MODELS.pop(TOY_MODEL.name, None)
+
+    def test_registered_models(self):
+        '''Verify that the DataFitting models are registered.
+        '''
+        self.assertIs(fit_models.get_model('ql'), ql_fit.QL_MODEL)
+        self.assertIs(fit_models.get_model('dual_line'),
+                      dual_linear.DUAL_LINE_MODEL)
+
+    def test_round_trip(self):
+        '''Verify that a registered model is returned by name.
+        '''
+        registered = fit_models.register_model(TOY_MODEL)
+        self.assertIs(registered, TOY_MODEL)
+        self.assertIs(fit_models.get_model(TOY_MODEL.name), TOY_MODEL)
+        self.assertIs(fit_models.get_model(TOY_MODEL), TOY_MODEL)
+
+    def test_unknown_model(self):
+        '''Verify that the KeyError names the registered models.
+        '''
+        with self.assertRaises(KeyError) as context:
+            fit_models.get_model('no_such_model')
+        message = str(context.exception)
+        self.assertIn('no_such_model', message)
+        for name in fit_models.MODELS:
+            self.assertIn(name, message)
+
+
+@requires_tools
+class TestToyModel(unittest.TestCase):
+    '''Test fitting a new model with the shared engine.
+    '''
+    def setUp(self):
+        fit_models.register_model(TOY_MODEL)
+        random_generator = np.random.default_rng(1)
+        tables = list()
+        for group, rate in enumerate((0.5, 1.0, 2.0)):
+            x = np.linspace(0.0, 4.0, 30)
+            yi = exponential_curve(x, 3.0, rate)
+            yi = yi + random_generator.normal(0, 0.005, x.size)
+            tables.append(pd.DataFrame({'group': group, 'x': x, 'y': yi}))
+        self.data_set = pd.concat(tables).set_index(['group', 'x'])
+
+    def tearDown(self):
+        fit_models.MODELS.pop(TOY_MODEL.name, None)
+
+    def test_fit_model(self):
+        '''Verify that fit_model fits the model by name.
+        '''
+        x = np.linspace(0.0, 4.0, 30)
+        yi = exponential_curve(x, 3.0, 0.5)
+        fit_results = fit_models.fit_model(TOY_MODEL.name, x, yi)
+        self.assertListEqual(list(fit_results), TOY_MODEL.columns())
+        self.assertAlmostEqual(fit_results['amplitude'], 3.0, places=6)
+        self.assertAlmostEqual(fit_results['rate'], 0.5, places=6)
+        self.assertAlmostEqual(fit_results['half_life'], np.log(2)/0.5,
+                               places=6)
+        curve = fit_models.evaluate(TOY_MODEL.name, x, fit_results)
+        np.testing.assert_allclose(curve, yi, atol=1e-6)
+
+    def test_fit_groups(self):
+        '''Verify that fit_groups fits every group of the model.
+        '''
+        fits = fit_models.fit_groups(TOY_MODEL.name, self.data_set, 'y', 'x',
+                                     ['group'], max_workers=0)
+        self.assertListEqual(list(fits.columns), TOY_MODEL.columns()
+                             + fit_models.DIAGNOSTIC_COLUMNS)
+        self.assertTrue((fits['status'] == 'ok').all())
+        np.testing.assert_allclose(fits['rate'], [0.5, 1.0, 2.0], rtol=0.01)
+        np.testing.assert_allclose(fits['amplitude'], 3.0, rtol=0.01)
+
+    def test_missing_initial_values(self):
+        '''Verify that a model without an initial_values strategy needs
+        starting parameters.
+        '''
+        model = TOY_MODEL._replace(initial_values=None)
+        x = np.linspace(0.0, 4.0, 30)
+        yi = exponential_curve(x, 3.0, 0.5)
+        with self.assertRaises(ValueError):
+            fit_models.fit_model(model, x, yi)
+        fit_results = fit_models.fit_model(model, x, yi,
+                                           {'amplitude': 1.0, 'rate': 1.0})
+        self.assertAlmostEqual(fit_results['rate'], 0.5, places=6)
+
+
+if __name__ == '__main__':
+    unittest.main()
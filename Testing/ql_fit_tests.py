@@ -0,0 +1,502 @@
+'''Fitting the quadratic-linear model in DataFitting.ql_fit.
+    i. Verify that the vectorised curve matches the point by point
+        calculation, including at the centre.
+    ii. Verify that fitting the vectorised curve gives the same parameters
+        as fitting the point by point calculation.
+    iii. Verify the analytical Jacobian against central differences on
+        both sides of the centre, and that fits with and without it agree.
+    iv. Verify that fit_ql_groups records failed groups and gives the same
+        results in this process and in a process pool.
+    v. Verify the profiled fit and the linear solution for centres at or
+        below the smallest x.
+    vi. Verify the batch fit convergence and the bootstrap intervals.
+    vii. Verify that the incremental fit matches the profiled fit.
+The tests are skipped if the Tools package cannot be found.
+'''
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+from scipy.optimize import curve_fit
+try:
+    from Tools.DataFitting import ql_fit
+except ModuleNotFoundError as err:
+    if err.name != 'Tools':
+        raise
+    ql_fit = None
+
+requires_tools = unittest.skipIf(ql_fit is None,
+                                 'The Tools package is not on the path.')
+if ql_fit is not None:
+    ql_point = ql_fit.__ql_l
+
+# The parameters used to build the synthetic data.
+TRUE_PARAMETERS = {'centre': 7.0, 'a2': -0.08, 'slope2': 0.2,
+                   'intercept2': 5.0}
+PARAMETER_ORDER = ['centre', 'a2', 'slope2', 'intercept2']
+
+
+def ql_data(points: int = 100, noise: float = 0.02, seed: int = 1):
+    '''Build noisy quadratic-linear data from TRUE_PARAMETERS.
+    Arguments:
+        points {int, optional} -- The number of points.  Default is 100.
+        noise {float, optional} -- The standard deviation of the noise.
+            Default is 0.02.
+        seed {int, optional} -- The seed for the noise.  Default is 1.
+    Returns:
+        Tuple[np.ndarray, np.ndarray] -- The x and y values.
+    '''
+    x = np.linspace(2.0, 15.0, points)
+    true_values = [TRUE_PARAMETERS[name] for name in PARAMETER_ORDER]
+    yi = ql_fit.q_l_curve_line(x, *true_values)
+    yi = yi + np.random.default_rng(seed).normal(0, noise, points)
+    return x, yi
+
+
+def group_data(groups: int = 5, points: int = 40):
+    '''Build a data set of noisy quadratic-linear groups.
+    Each group has its own seed.  The last group has only 3 points, too few
+    to fit.
+    Arguments:
+        groups {int, optional} -- The number of groups.  Default is 5.
+        points {int, optional} -- The number of points in each group that
+            can be fitted.  Default is 40.
+    Returns:
+        pd.DataFrame -- The y values in column 'y', indexed by 'group' and
+            'x'.
+    '''
+    tables = list()
+    for group in range(groups):
+        x, yi = ql_data(points if group < groups - 1 else 3, seed=group)
+        tables.append(pd.DataFrame({'group': group, 'x': x, 'y': yi}))
+    return pd.concat(tables).set_index(['group', 'x'])
+
+
+def central_differences(x, parameters, step=1e-6):
+    '''Calculate the derivatives of q_l_curve_line by central differences.
+    Arguments:
+        x {np.ndarray} -- The x values.
+        parameters {List[float]} -- centre, a2, slope2 and intercept2.
+        step {float, optional} -- The relative parameter step.
+    Returns:
+        np.ndarray -- An array of shape (len(x), 4).
+    '''
+    derivatives = np.empty((len(x), len(parameters)))
+    for column, value in enumerate(parameters):
+        change = step*max(abs(value), 1.0)
+        upper = list(parameters)
+        lower = list(parameters)
+        upper[column] = value + change
+        lower[column] = value - change
+        derivatives[:, column] = (ql_fit.q_l_curve_line(x, *upper)
+                                  - ql_fit.q_l_curve_line(x, *lower)
+                                  ) / (2*change)
+    return derivatives
+
+
+def point_curve(x, centre, a2, slope2, intercept2):
+    '''The quadratic-linear curve calculated one point at a time.
+    '''
+    return np.array([ql_point(x_value, centre, a2, slope2, intercept2)
+                     for x_value in x])
+
+
+@requires_tools
+class TestQLCurve(unittest.TestCase):
+    '''Compare the vectorised curve with the point by point calculation.
+    '''
+    def setUp(self):
+        self.parameters = [TRUE_PARAMETERS[name] for name in PARAMETER_ORDER]
+
+    def test_curve_points(self):
+        '''Verify that every point matches, including x == centre.
+        '''
+        x = np.concatenate([np.linspace(0.0, 20.0, 201), [7.0]])
+        self.assertIn(TRUE_PARAMETERS['centre'], x)
+        curve = ql_fit.q_l_curve_line(x, *self.parameters)
+        expected = point_curve(x, *self.parameters)
+        np.testing.assert_allclose(curve, expected, rtol=1e-14, atol=1e-14)
+
+    def test_centre_point(self):
+        '''Verify that the centre point is on the line.
+        '''
+        centre = TRUE_PARAMETERS['centre']
+        curve = ql_fit.q_l_curve_line([centre], *self.parameters)
+        line = (TRUE_PARAMETERS['slope2']*centre
+                + TRUE_PARAMETERS['intercept2'])
+        self.assertEqual(curve[0], line)
+        self.assertEqual(curve[0], ql_point(centre, *self.parameters))
+
+    def test_curve_dictionary(self):
+        '''Verify that q_l_curve accepts the a1 and a0 form.
+        '''
+        x = np.linspace(0.0, 20.0, 41)
+        parameter_set = ql_fit.extra_parameters(**TRUE_PARAMETERS)
+        del parameter_set['slope2'], parameter_set['intercept2']
+        np.testing.assert_allclose(ql_fit.q_l_curve(x, parameter_set),
+                                   point_curve(x, *self.parameters),
+                                   rtol=1e-12, atol=1e-12)
+
+
+@requires_tools
+class TestQLFitParameters(unittest.TestCase):
+    '''Compare fits of the vectorised and the point by point curves.
+    '''
+    def test_fit_unchanged(self):
+        '''Verify that the fitted parameters are unchanged.
+        '''
+        x, yi = ql_data()
+        p0 = {'centre': 8.0, 'a2': -0.05, 'slope2': 0.0, 'intercept2': 7.0}
+        fit_results = ql_fit.ql_fit(x, yi, p0, analytic_jacobian=False)
+        expected, _ = curve_fit(point_curve, x, yi,
+                                [p0[name] for name in PARAMETER_ORDER])
+        fitted = [fit_results[name] for name in PARAMETER_ORDER]
+        np.testing.assert_allclose(fitted, expected, rtol=1e-6)
+
+    def test_recovers_parameters(self):
+        '''Verify that the fit recovers the parameters of the data.
+        '''
+        x, yi = ql_data()
+        fit_results = ql_fit.ql_fit(x, yi)
+        for name in PARAMETER_ORDER:
+            self.assertAlmostEqual(fit_results[name], TRUE_PARAMETERS[name],
+                                   delta=0.05)
+
+
+@requires_tools
+class TestQLJacobian(unittest.TestCase):
+    '''Check the analytical derivatives of the quadratic-linear curve.
+    '''
+    def setUp(self):
+        self.parameters = [TRUE_PARAMETERS[name] for name in PARAMETER_ORDER]
+        # Points on both sides of the centre, away from the break point
+        # where the central differences straddle the two parts.
+        self.x = np.concatenate([np.linspace(0.0, 6.9, 30),
+                                 np.linspace(7.1, 20.0, 30)])
+
+    def test_shape(self):
+        '''Verify one row per point and one column per parameter.
+        '''
+        jacobian = ql_fit.q_l_jacobian(self.x, *self.parameters)
+        self.assertTupleEqual(jacobian.shape, (self.x.size, 4))
+
+    def test_central_differences(self):
+        '''Verify the derivatives on both sides of the centre.
+        '''
+        jacobian = ql_fit.q_l_jacobian(self.x, *self.parameters)
+        expected = central_differences(self.x, self.parameters)
+        np.testing.assert_allclose(jacobian, expected, rtol=1e-7, atol=1e-7)
+
+    def test_above_centre(self):
+        '''Verify that centre and a2 have no effect above the centre.
+        '''
+        jacobian = ql_fit.q_l_jacobian(self.x, *self.parameters)
+        above = self.x > TRUE_PARAMETERS['centre']
+        self.assertTrue(np.all(jacobian[above, :2] == 0))
+        self.assertTrue(np.all(jacobian[~above, :2] != 0))
+
+    def test_numeric_fit(self):
+        '''Verify that fits with and without the Jacobian agree.
+        '''
+        x, yi = ql_data()
+        p0 = {'centre': 8.0, 'a2': -0.05, 'slope2': 0.0, 'intercept2': 7.0}
+        analytic = ql_fit.ql_fit(x, yi, p0)
+        numeric = ql_fit.ql_fit(x, yi, p0, analytic_jacobian=False)
+        for name in ql_fit.PARAMETER_COLUMNS:
+            self.assertAlmostEqual(analytic[name], numeric[name], places=6)
+
+
+@requires_tools
+class TestQLGroups(unittest.TestCase):
+    '''Check fitting many groups with fit_ql_groups.
+    '''
+    def setUp(self):
+        self.data_set = group_data()
+
+    def test_failed_group(self):
+        '''Verify that a group with too few points is recorded as failed.
+        '''
+        fits = ql_fit.fit_ql_groups(self.data_set, 'y', 'x', ['group'],
+                                    max_workers=0)
+        self.assertListEqual(list(fits.columns), ql_fit.PARAMETER_COLUMNS
+                             + ql_fit.DIAGNOSTIC_COLUMNS)
+        failed = fits.loc[4]
+        self.assertEqual(failed['status'], 'failed')
+        self.assertIn('got 3', failed['message'])
+        self.assertEqual(failed['points'], 3)
+        self.assertTrue(failed[ql_fit.PARAMETER_COLUMNS].isna().all())
+        fitted = fits.loc[:3]
+        self.assertTrue((fitted['status'] == 'ok').all())
+        self.assertFalse(fitted[ql_fit.PARAMETER_COLUMNS].isna().any().any())
+        for name in PARAMETER_ORDER:
+            np.testing.assert_allclose(fitted[name], TRUE_PARAMETERS[name],
+                                       atol=0.2)
+
+    def test_process_pool(self):
+        '''Verify that the results do not depend on max_workers.
+        '''
+        serial = ql_fit.fit_ql_groups(self.data_set, 'y', 'x', ['group'],
+                                      max_workers=0)
+        pooled = ql_fit.fit_ql_groups(self.data_set, 'y', 'x', ['group'],
+                                      max_workers=2, chunk_size=2)
+        pd.testing.assert_frame_equal(serial, pooled)
+
+    def test_group_fit(self):
+        '''Verify that a group fit matches ql_fit.
+        '''
+        x, yi = ql_data()
+        result = ql_fit.fit_ql_group(x, yi)
+        fit_results = ql_fit.ql_fit(x, yi)
+        self.assertEqual(result['status'], 'ok')
+        for name in ql_fit.PARAMETER_COLUMNS:
+            self.assertAlmostEqual(result[name], fit_results[name], places=8)
+
+
+@requires_tools
+class TestQLProfile(unittest.TestCase):
+    '''Check the linear least squares scan of candidate centres.
+    '''
+    def setUp(self):
+        self.x, self.yi = ql_data(noise=0.05, seed=3)
+
+    def test_profiled_fit(self):
+        '''Verify that profiled_ql_fit matches ql_fit.
+        '''
+        profiled = ql_fit.profiled_ql_fit(self.x, self.yi)
+        fit_results = ql_fit.ql_fit(self.x, self.yi)
+        for name in ql_fit.PARAMETER_COLUMNS:
+            self.assertAlmostEqual(profiled[name], fit_results[name],
+                                   places=5)
+
+    def test_profile_matches_fit(self):
+        '''Verify that the profile at the fitted centre is the fit.
+        '''
+        fit_results = ql_fit.ql_fit(self.x, self.yi)
+        coefficients, residual_sum = ql_fit.ql_profile(
+            self.x, self.yi, [fit_results['centre']])
+        expected = [fit_results[name] for name in ('a2', 'slope2',
+                                                     'intercept2')]
+        np.testing.assert_allclose(coefficients[0], expected, rtol=1e-6)
+        residuals = self.yi - ql_fit.q_l_curve(self.x, fit_results)
+        self.assertAlmostEqual(residual_sum[0], np.sum(residuals**2),
+                               places=8)
+
+    def test_initial_values(self):
+        '''Verify that the starting centre is the best grid centre.
+        '''
+        initial_values = ql_fit.ql_initial_values(self.x, self.yi)
+        centres = np.linspace(self.x.min(), self.x.max(), ql_fit.CENTRE_GRID)
+        _, residual_sum = ql_fit.ql_profile(self.x, self.yi, centres)
+        self.assertEqual(initial_values['centre'],
+                         centres[np.argmin(residual_sum)])
+        self.assertAlmostEqual(initial_values['centre'],
+                               TRUE_PARAMETERS['centre'], delta=0.5)
+
+    def test_centre_below_data(self):
+        '''Verify that centres at or below min(x) give a2 = 0 and the
+        straight line fit.
+        '''
+        centres = [self.x.min() - 5.0, self.x.min()]
+        coefficients, residual_sum = ql_fit.ql_profile(self.x, self.yi,
+                                                       centres)
+        slope, intercept = np.polyfit(self.x, self.yi, 1)
+        line_sum = np.sum((self.yi - slope*self.x - intercept)**2)
+        for row in range(2):
+            a2, slope2, intercept2 = coefficients[row]
+            self.assertEqual(a2, 0.0)
+            self.assertAlmostEqual(slope2, slope, places=10)
+            self.assertAlmostEqual(intercept2, intercept, places=10)
+            self.assertAlmostEqual(residual_sum[row], line_sum, places=8)
+
+
+@requires_tools
+class TestBatchFit(unittest.TestCase):
+    '''Check fitting many data sets together with batch_ql_fit.
+    '''
+    def setUp(self):
+        data = [ql_data(30, seed=seed) for seed in range(4)]
+        self.x = np.array([x for x, _ in data])
+        self.yi = np.array([yi for _, yi in data])
+        self.p0 = [8.0, -0.05, 0.0, 7.0]
+
+    def test_matches_ql_fit(self):
+        '''Verify that each converged fit matches ql_fit.
+        '''
+        parameters, converged = ql_fit.batch_ql_fit(self.x, self.yi, self.p0)
+        self.assertTrue(converged.all())
+        for x, yi, fitted in zip(self.x, self.yi, parameters):
+            fit_results = ql_fit.ql_fit(x, yi)
+            expected = [fit_results[name] for name in PARAMETER_ORDER]
+            np.testing.assert_allclose(fitted, expected, rtol=1e-5)
+
+    def test_stalled_fit(self):
+        '''Verify that a fit which stalls away from a minimum is not
+        counted as converged.
+        '''
+        self.yi[1, 4] = np.nan
+        _, converged = ql_fit.batch_ql_fit(self.x, self.yi, self.p0)
+        self.assertListEqual(converged.tolist(), [True, False, True, True])
+
+    def test_unfinished_fit(self):
+        '''Verify that fits stopped by max_iterations are not converged.
+        '''
+        _, converged = ql_fit.batch_ql_fit(self.x, self.yi, self.p0,
+                                           max_iterations=2)
+        self.assertFalse(converged.any())
+
+
+@requires_tools
+class TestBootstrap(unittest.TestCase):
+    '''Check the bootstrap and jackknife intervals.
+    '''
+    def setUp(self):
+        self.x, self.yi = ql_data(40, noise=0.05, seed=5)
+
+    def check_contains(self, intervals):
+        '''Check that every interval contains the true parameter.
+        '''
+        for name in PARAMETER_ORDER:
+            lower, upper = intervals.loc[name, ['lower', 'upper']]
+            self.assertLess(lower, TRUE_PARAMETERS[name])
+            self.assertGreater(upper, TRUE_PARAMETERS[name])
+
+    def test_residual_intervals(self):
+        '''Verify that the residual bootstrap intervals contain the true
+        parameters.
+        '''
+        intervals = ql_fit.ql_bootstrap(self.x, self.yi, n_resamples=500,
+                                        confidence=0.99, seed=2)
+        self.assertListEqual(list(intervals.columns),
+                             ql_fit.INTERVAL_COLUMNS)
+        self.assertTrue((intervals['resamples'] == 500).all())
+        self.check_contains(intervals)
+
+    def test_jackknife_intervals(self):
+        '''Verify that the jackknife intervals contain the true parameters.
+        '''
+        intervals = ql_fit.ql_bootstrap(self.x, self.yi, method='jackknife',
+                                        confidence=0.99)
+        self.assertTrue((intervals['resamples'] == self.x.size).all())
+        self.check_contains(intervals)
+
+    def test_seed(self):
+        '''Verify that the same seed gives the same intervals.
+        '''
+        first = ql_fit.ql_bootstrap(self.x, self.yi, 200, 'points', seed=4)
+        second = ql_fit.ql_bootstrap(self.x, self.yi, 200, 'points', seed=4)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_invalid_method(self):
+        '''Verify that an unknown method raises ValueError.
+        '''
+        with self.assertRaises(ValueError):
+            ql_fit.ql_bootstrap(self.x, self.yi, method='shuffle')
+        with self.assertRaises(ValueError):
+            ql_fit.bootstrap_ql_groups(group_data(), 'y', 'x', ['group'],
+                                       method='shuffle')
+
+    def test_groups_independent_of_workers(self):
+        '''Verify that the group intervals do not depend on max_workers or
+        chunk_size.
+        '''
+        data_set = group_data()
+        serial = ql_fit.bootstrap_ql_groups(data_set, 'y', 'x', ['group'],
+                                            n_resamples=100, seed=9,
+                                            max_workers=0)
+        self.assertListEqual(serial.index.names, ['group', 'parameter'])
+        self.assertTrue(serial.loc[4]['lower'].isna().all())
+        self.assertTrue((serial.loc[4]['resamples'] == 0).all())
+        for max_workers, chunk_size in ((0, 1), (2, 1), (2, 3)):
+            pooled = ql_fit.bootstrap_ql_groups(
+                data_set, 'y', 'x', ['group'], n_resamples=100, seed=9,
+                max_workers=max_workers, chunk_size=chunk_size)
+            pd.testing.assert_frame_equal(serial, pooled)
+
+
+@requires_tools
+class TestIncrementalFit(unittest.TestCase):
+    '''Check the quadratic-linear fit updated one point at a time.
+    '''
+    def setUp(self):
+        self.x, self.yi = ql_data(200, noise=0.05, seed=7)
+
+    def check_matches(self, fit_results, places=4):
+        '''Check that the fit matches profiled_ql_fit, to within the
+        tolerance of its bounded centre search.
+        '''
+        expected = ql_fit.profiled_ql_fit(self.x, self.yi)
+        self.assertListEqual(list(fit_results), list(expected))
+        for name in ql_fit.PARAMETER_COLUMNS:
+            self.assertAlmostEqual(fit_results[name], expected[name],
+                                   places=places)
+
+    def test_matches_profiled_fit(self):
+        '''Verify that the incremental fit matches profiled_ql_fit.
+        '''
+        incremental = ql_fit.IncrementalQLFit(x_range=(2.0, 15.0))
+        incremental.push_points(self.x, self.yi)
+        self.assertEqual(incremental.points, self.x.size)
+        self.check_matches(incremental.parameters())
+
+    def test_unsorted_points(self):
+        '''Verify that the order of the points does not matter.
+        '''
+        order = np.random.default_rng(3).permutation(self.x.size)
+        incremental = ql_fit.IncrementalQLFit(x_range=(2.0, 15.0))
+        incremental.push_points(self.x[order], self.yi[order])
+        self.check_matches(incremental.parameters())
+
+    def test_points_outside_grid(self):
+        '''Verify points outside the candidate centres.
+        '''
+        incremental = ql_fit.IncrementalQLFit(x_range=(4.0, 12.0))
+        incremental.push_points(self.x, self.yi)
+        self.assertEqual(len(incremental.cell_points[0]), 0)
+        self.assertEqual(len(incremental.cell_points[-1]), 0)
+        self.check_matches(incremental.parameters())
+        with self.assertRaises(ValueError):
+            incremental.profile(3.0)
+
+    def test_too_few_points(self):
+        '''Verify that fewer than 4 points raise ValueError.
+        '''
+        incremental = ql_fit.IncrementalQLFit(x_range=(2.0, 15.0))
+        with self.assertRaises(ValueError):
+            incremental.parameters()
+        incremental.push_points(self.x[:3], self.yi[:3])
+        with self.assertRaises(ValueError):
+            incremental.parameters()
+        incremental.push(self.x[3], self.yi[3])
+        incremental.parameters()
+
+    def test_warm_start(self):
+        '''Verify that a repeated query starts from the previous centre.
+        '''
+        incremental = ql_fit.IncrementalQLFit(x_range=(2.0, 15.0))
+        incremental.push_points(self.x[::2], self.yi[::2])
+        first = incremental.parameters()
+        self.assertEqual(incremental.previous_centre, first['centre'])
+        incremental.push_points(self.x[1::2], self.yi[1::2])
+        with mock.patch.object(ql_fit, 'minimize_scalar',
+                               wraps=ql_fit.minimize_scalar) as minimize:
+            second = incremental.parameters()
+        bracket = minimize.call_args_list[0][1]['bracket']
+        self.assertEqual(bracket[1], first['centre'])
+        self.assertEqual(incremental.previous_centre, second['centre'])
+        self.check_matches(second)
+
+    def test_summarised_cells(self):
+        '''Verify that the stored points are limited by max_cell_points.
+        '''
+        incremental = ql_fit.IncrementalQLFit(x_range=(2.0, 15.0),
+                                              grid_size=16,
+                                              max_cell_points=8)
+        incremental.push_points(self.x, self.yi)
+        self.assertTrue(incremental.sub_cell_sums)
+        self.assertLessEqual(max(len(points) for points in
+                                 incremental.cell_points), 8)
+        self.check_matches(incremental.parameters(), places=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
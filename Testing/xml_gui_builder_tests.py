@@ -0,0 +1,106 @@
+'''Copying TK variable values to the application data in
+GUI_Management.xml_gui_builder.
+    i. Verify that update_data copies only the changed TK variables.
+    ii. Verify that a value rejected by the application data is reported and
+        stays marked as changed, so that it is copied again.
+The tests are skipped if the GUI dependencies cannot be imported.
+'''
+import unittest
+from CustomVariableSet.custom_variable_sets import IntegerV, StringV
+from CustomVariableSet.custom_variable_sets import CustomVariableSet
+from CustomVariableSet.custom_variable_sets import NotValidError
+try:
+    from GUI_Management.xml_gui_builder import GuiManager
+    from GUI_Management.object_reference_management import ReferenceTracker
+except ModuleNotFoundError:
+    GuiManager = None
+
+requires_gui = unittest.skipIf(GuiManager is None,
+                               'The GUI dependencies are not installed.')
+
+
+class TkVariable():
+    '''Holds a value in place of a TK variable, so that no display is
+    needed.
+    '''
+    def __init__(self, value=''):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+
+class GuiData(CustomVariableSet):
+    '''Application data linked to the TK variables.
+    '''
+    variable_definitions = [
+        {'name': 'count', 'variable_type': IntegerV, 'default': 0},
+        {'name': 'label', 'variable_type': StringV, 'default': 'none'}
+        ]
+
+
+def build_manager(data_set: CustomVariableSet):
+    '''Build a GuiManager with TK variables linked to data_set, without
+    loading an XML file or creating any windows.
+    '''
+    manager = GuiManager.__new__(GuiManager)
+    manager.reference = ReferenceTracker(GuiManager.identifier_list,
+                                         GuiManager.lookup_list)
+    manager.reference.add_lookup_group('Data', data_set)
+    manager.data_set = data_set
+    manager.data_link = dict()
+    manager.changed_variables = set()
+    for data_name in data_set.to_dict():
+        variable_name = data_name + '_variable'
+        manager.reference.set_item('Variable', variable_name, TkVariable())
+        manager.data_link[variable_name] = data_name
+    return manager
+
+
+@requires_gui
+class TestUpdateData(unittest.TestCase):
+    '''Test copying TK variable values to the application data.
+    '''
+    def setUp(self):
+        self.data_set = GuiData()
+        self.manager = build_manager(self.data_set)
+
+    def write(self, variable_name: str, value):
+        '''Set a TK variable and record the change like the write trace.
+        '''
+        variable = self.manager.reference.lookup_item('Variable',
+                                                      variable_name)
+        variable.set(value)
+        self.manager.variable_changed(variable_name)
+
+    def test_changed_only(self):
+        '''Verify that only the changed TK variables are copied.
+        '''
+        self.write('label_variable', 'new')
+        self.manager.update_data()
+        self.assertEqual(self.data_set['label'].value, 'new')
+        self.assertEqual(self.data_set['count'].value, 0)
+        self.assertSetEqual(self.manager.changed_variables, set())
+
+    def test_rejected_value(self):
+        '''Verify that a rejected value is reported and copied again on the
+        next update.
+        '''
+        self.write('count_variable', 'abc')
+        with self.assertRaises(NotValidError):
+            self.manager.update_data()
+        self.assertEqual(self.data_set['count'].value, 0)
+        self.assertIn('count_variable', self.manager.changed_variables)
+        with self.assertRaises(NotValidError):
+            self.manager.update_and_run(lambda: None)
+        self.write('count_variable', '5')
+        self.manager.update_data()
+        self.assertEqual(self.data_set['count'].value, 5)
+        self.assertSetEqual(self.manager.changed_variables, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
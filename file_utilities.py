@@ -2,64 +2,269 @@
 Created on Oct 19 2018
 @author: Greg Salomons
 A collection of file utility functions.
-    set_base_dir(sub_dir)- > Path:
-        Returns the Path to the  Queen's OneDrive directory
-    get_file_path(file_name, sub_dir)
+    set_base_dir(sub_dir, base_options)- > Path:
+        Returns the Path to the base directory
+    get_resolver()- > PathResolver:
+        Returns the shared PathResolver
+    set_resolver(resolver)
+        Replace the shared PathResolver
+    get_file_path(file_name, sub_dir, base_path, root)
         Returns the full Path to the file
     true_iterable(variable)
         Indicate if the variable is a non-string type iterable
     make_full_path(file_name, valid_types, must_exist, base_path)
         Build the full path to a file from the supplied parts.
+    check_paths(path_checks, max_workers)
+        Build and check a group of full paths, sharing directory listings.
     replace_top_dir(dir_path, file_path, new_name)
         Replace the first portion of the file path.
+    file_info_table(directory_to_scan, sub_dir, base_path, file_type,
+                    max_workers)
+        Collect the metadata for all files in a directory tree as a table.
+    find_duplicates(directory_to_scan, sub_dir, base_path, file_type,
+                    block_size, min_size, max_workers)
+        Find groups of files with identical content in a directory tree.
+    build_file_re(), build_summary_re(), build_directory_re()
+        Compile regular expressions for parsing Windows "dir" output.
+    parse_listing_chunk(lines)
+        Parse a block of lines from a "dir" listing.
+    infer_date_format(date_strings, candidates)
+        Find the "dir" listing date formats that match the date strings.
+    iter_dir_listing(listing_file, chunk_lines, max_workers, date_format)
+        Parse a "dir" listing file in chunks, yielding typed tables.
+    read_dir_listing(listing_file, chunk_lines, max_workers, date_format)
+        Parse a "dir" listing file into file and summary tables.
+    dir_listing_to_csv(listing_file, output_file, summary_file, chunk_lines,
+                       max_workers, date_format)
+        Parse a "dir" listing file, writing the results to csv files.
 Classes
+    PathResolver:
+        A cached lookup of named root directories.
+    FileEvent:
+        A created, modified or deleted file.
+    DirectoryWatcher:
+        Watch a directory tree for debounced file changes.
     FileTypes:
         A user select-able list of file type options
         Definition of file type groups
     FileTypeError:
         The file extension is not the appropriate type.
 '''
+import os
+import re
+import sys
 import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import hashlib
+import configparser
+from itertools import islice
+from collections import deque, Counter
 from pathlib import Path
 from collections.abc import Iterable
-from typing import Dict, List, Union, Iterator
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import Dict, List, Tuple, Union, Iterator, Pattern, NamedTuple
+from typing import Optional
 import pandas as pd
+from dateutil.tz import tzlocal
 
 
 Data = pd.DataFrame
 PathInput = Union[Path, str]
+ListingTables = Tuple[pd.DataFrame, pd.DataFrame]
+PathCheck = Tuple[PathInput, 'FileTypes', bool, Optional[Path]]
+
+
+# Host specific base directories used when no base root is configured.
+# The key is text to search for in the current working directory path.
+DEFAULT_BASE_OPTIONS = {
+    'Greg': r"C:\Users\Greg\OneDrive - Queen's University",  # Home laptop
+    'gsalomon': r"C:\Users\gsalomon\OneDrive - Queen's University"  # work PC
+    }
+PATH_CONFIG_VARIABLE = 'UTILITIES_PATH_CONFIG'
+ROOT_VARIABLE_PREFIX = 'UTILITIES_ROOT_'
+BASE_ROOT = 'base'
+
+
+class PathResolver():
+    '''A cached lookup of named root directories.
+    Root directories are defined once, from (in increasing priority):
+        A configuration file with a [roots] section, e.g.
+            [roots]
+            base = /srv/shared
+            templates = Work/Structure Dictionary
+          The file can be given directly or through the
+          UTILITIES_PATH_CONFIG environment variable.
+        Environment variables of the form UTILITIES_ROOT_<NAME>,
+            e.g. UTILITIES_ROOT_BASE=/srv/shared
+        Roots passed to the constructor.
+    Relative root definitions are relative to the "base" root.
+    If the "base" root is not defined, it is selected from base_options by
+    searching the current working directory path, falling back to the
+    current working directory.
+    Each root is only computed the first time it is requested.
+    '''
+    def __init__(self, roots: Dict[str, PathInput] = None,
+                 config_file: PathInput = None,
+                 base_options: Dict[str, str] = None,
+                 use_environment: bool = True):
+        '''Define the named roots.
+        Arguments:
+            roots {Dict[str, PathInput]} -- Root names and their paths.
+            config_file {PathInput} -- The path to a configuration file with
+                a [roots] section.
+            base_options {Dict[str, str]} -- Text to be searched for in the
+                current working directory path and the corresponding base
+                directory.  Default is DEFAULT_BASE_OPTIONS.
+            use_environment {bool} -- If True, read the configuration file
+                and root definitions from environment variables.
+                Default is True.
+        '''
+        if base_options is None:
+            base_options = DEFAULT_BASE_OPTIONS
+        self.base_options = base_options
+        self.root_definitions = dict()  # type: Dict[str, str]
+        self._root_cache = dict()  # type: Dict[str, Path]
+        if use_environment and os.environ.get(PATH_CONFIG_VARIABLE):
+            self.read_config(os.environ[PATH_CONFIG_VARIABLE])
+        if config_file:
+            self.read_config(config_file)
+        if use_environment:
+            for variable, value in os.environ.items():
+                if variable.upper().startswith(ROOT_VARIABLE_PREFIX):
+                    name = variable[len(ROOT_VARIABLE_PREFIX):].lower()
+                    self.root_definitions[name] = value
+        if roots:
+            for name, root_path in roots.items():
+                self.root_definitions[name.lower()] = str(root_path)
+
+    def read_config(self, config_file: PathInput):
+        '''Add the root definitions from the [roots] section of a
+        configuration file.
+        Arguments:
+            config_file {PathInput} -- The path to the configuration file.
+        Raises:
+            FileNotFoundError -- If the configuration file does not exist.
+        '''
+        config_path = Path(config_file).expanduser()
+        if not config_path.is_file():
+            msg = 'Path configuration file {} not found.'.format(config_path)
+            raise FileNotFoundError(msg)
+        config = configparser.ConfigParser(interpolation=None)
+        config.read(str(config_path))
+        if config.has_section('roots'):
+            self.root_definitions.update(config.items('roots'))
+        self.clear_cache()
+
+    def add_root(self, name: str, root_path: PathInput):
+        '''Add or replace a named root.
+        Arguments:
+            name {str} -- The name of the root.
+            root_path {PathInput} -- The path to the root directory.
+        '''
+        self.root_definitions[name.lower()] = str(root_path)
+        self.clear_cache()
+
+    def clear_cache(self):
+        '''Discard all computed roots.
+        '''
+        self._root_cache.clear()
+
+    def find_base(self)->Path:
+        '''Select the base directory from base_options using the current
+        working directory.
+        Returns:
+            Path to the base directory.
+        '''
+        cwd = str(Path.cwd())
+        for search_text, base_dir in self.base_options.items():
+            if search_text in cwd:
+                return Path(base_dir)
+        return Path.cwd()
+
+    def root(self, name: str = None)->Path:
+        '''Return the path to a named root directory.
+        Arguments:
+            name {str} -- The name of the root. Default is "base".
+        Raises:
+            FileNotFoundError -- If name is not a defined root.
+        Returns:
+            Path to the root directory.
+        '''
+        name = name.lower() if name else BASE_ROOT
+        root_path = self._root_cache.get(name)
+        if root_path is not None:
+            return root_path
+        definition = self.root_definitions.get(name)
+        if definition:
+            root_path = Path(os.path.expandvars(definition)).expanduser()
+            if not root_path.is_absolute() and name != BASE_ROOT:
+                root_path = self.root(BASE_ROOT) / root_path
+        elif name == BASE_ROOT:
+            root_path = self.find_base()
+        else:
+            raise FileNotFoundError('Unknown root: {}'.format(name))
+        self._root_cache[name] = root_path
+        return root_path
+
+    def __contains__(self, name: str)->bool:
+        return (name.lower() == BASE_ROOT or
+                name.lower() in self.root_definitions)
+
+
+_path_resolver = None  # type: PathResolver
+
+
+def get_resolver()->PathResolver:
+    '''Return the shared PathResolver, creating it on first use.
+    '''
+    global _path_resolver
+    if _path_resolver is None:
+        _path_resolver = PathResolver()
+    return _path_resolver
+
+
+def set_resolver(resolver: PathResolver):
+    '''Replace the shared PathResolver.
+    Arguments:
+        resolver {PathResolver} -- The new resolver. If None, a new default
+            resolver is created the next time one is needed.
+    '''
+    global _path_resolver
+    _path_resolver = resolver
 
 
 def set_base_dir(sub_dir: str = None,
                  base_options: Dict[str, str] = None)-> Path:
     '''Determine the base directory.
-    The base directory is the Queen's OneDrive, but the path to it changes
-    with PC location.
+    The base directory is the "base" root of the shared PathResolver.
     Arguments:
+        sub_dir {str} -- A string containing the directory path from the
+            base directory to the desired directory.
         base_options {Dict[str, str]} -- A dictionary describing conditions
             for setting the base directory. The key contains text to be
             searched for in the current working directory path.  The value is
             the base directory path to be set if the key is found.
-        sub_dir {str} -- A string containing the directory path from the
-            top directory to the desired base directory.
-            A string containing the directory path from the base_dir to
-            the file location.
+            If given, the shared PathResolver is not used.
     Raises:
-        FileNotFoundError
+        FileNotFoundError -- If base_options is given and none of its keys
+            are found in the current working directory path.
     Returns:
         Path to the base directory.
     '''
-    if not base_options:
-        # Use Queen's OneDrive as the starting point for the base directory
-        base_options = {'Greg': r"C:\Users\Greg\OneDrive - Queen's University", # Home laptop
-                        'gsalomon': r"C:\Users\gsalomon\OneDrive - Queen's University"} # work PC
-    cwd = str(Path.cwd())
-    if 'Greg' in cwd:  # Home laptop
-        base_dir = Path(r"C:\Users\Greg\OneDrive - Queen's University")
-    elif 'gsalomon' in cwd: # Work PC
-        base_dir = Path(r"C:\Users\gsalomon\OneDrive - Queen's University")
+    if base_options:
+        cwd = str(Path.cwd())
+        for search_text, base_path in base_options.items():
+            if search_text in cwd:
+                base_dir = Path(base_path)
+                break
+        else:
+            raise FileNotFoundError('Unknown Base Path')
     else:
-        raise FileNotFoundError('Unknown Base Path')
+        base_dir = get_resolver().root()
     if sub_dir:
         base_dir = base_dir / sub_dir
     return base_dir
@@ -145,22 +350,45 @@ class FileTypes(list):
         else:
             return False
 
-    def check_type(self, file_name: Path, must_exist = True)-> bool:
+    def type_group(self, extension: str)->str:
+        '''Return the name of the first file type group containing extension.
+        The extension string must be in the format ".???".
+        Arguments:
+            extension {str} -- The extension to be looked up.
+        Returns:
+            str -- The name of the matching file type group, or None if the
+                extension does not belong to any of the selected groups.
+        '''
+        pattern = '*' + extension.lower()
+        for type_name in self.selection_list:
+            if pattern in self.file_types.get(str(type_name), ()):
+                return str(type_name)
+        return None
+
+    def check_type(self, file_name: Path, must_exist = True,
+                   is_dir: Optional[bool] = None)-> bool:
         '''Indicate whether the file has one of the suffixes.
         Arguments:
             file_name {Path} -- The full path to a file or directory.
             file_name {bool} -- Indicates whether the file must exist.
+            is_dir {bool, optional} -- Whether file_name is known to be a
+                directory.  If given, the file system is not checked; an
+                existing path that is not a directory is treated as a file.
         Returns:
             True if file_name matches one of the suffixes otherwise False.
         '''
         is_match = False
         if self.is_dir:
             if must_exist:
-                is_match = file_name.is_dir()
+                if is_dir is None:
+                    is_dir = file_name.is_dir()
+                is_match = is_dir
             else:
                 is_match = not bool(file_name.suffix)
         elif self.all_types:
-            if must_exist:
+            if is_dir is not None:
+                is_match = not is_dir
+            elif must_exist:
                 is_match = file_name.is_file()
             else:
                 is_match = not file_name.is_dir()
@@ -178,17 +406,19 @@ class FileTypes(list):
 
 
 def get_file_path(file_name: PathInput, sub_dir: str = None,
-                  base_path: Path = None)-> Path:
+                  base_path: Path = None, root: str = None)-> Path:
     '''Build full file path from base directory and sub directories.
     Add the base path to a filename or relative string path.
-    Check for presence of ':' or './' as indications that file_name is
-        a full or relative path. Otherwise assume that file_name is a
-        name or partial path to a file or directory.
+    Check for an absolute path or the presence of ':' or './' as indications
+        that file_name is a full or relative path. Otherwise assume that
+        file_name is a name or partial path to a file or directory.
      Arguments:
         file_name {str, Path} -- a name or partial path to a file or directory.
         sub_dir {str} -- A string containing the directory path from the base path to
             the file location.
         base_path {Path} -- A path to the top directory where files may be located.
+        root {str} -- The name of a PathResolver root to use as the top
+            directory when base_path is not given. Default is the "base" root.
     Returns:
         A full path to the file or directory
     Raises
@@ -197,12 +427,13 @@ def get_file_path(file_name: PathInput, sub_dir: str = None,
     if isinstance(file_name, Path): # Already full path
         return file_name.resolve()
     file_name = str(file_name)
-    if any(a in file_name for a in[':', './/']):  #Full path of type str
+    if os.path.isabs(file_name) or any(a in file_name for a in[':', './/']):
+        #Full path of type str
         return Path(file_name).resolve()
     if base_path:
-        base_dir = base_path.resolve()
+        base_dir = Path(base_path)
     else:
-        base_dir = set_base_dir()
+        base_dir = get_resolver().root(root)
     if sub_dir:
         base_dir = base_dir / sub_dir
     full_path = base_dir / file_name
@@ -235,6 +466,137 @@ def make_full_path(file_name: PathInput, valid_types: FileTypes,
     return full_file_path
 
 
+_PATH_POOL = dict()  # type: Dict[int, ThreadPoolExecutor]
+# The smallest number of paths for which check_paths uses threads.
+PARALLEL_PATH_CHECKS = 4
+
+
+def _get_path_pool(max_workers: int = None)->ThreadPoolExecutor:
+    '''Return the shared thread pool used for path checks.
+    Arguments:
+        max_workers {int, optional} -- The number of threads. Default is 16.
+    Returns:
+        ThreadPoolExecutor -- The thread pool.
+    '''
+    if max_workers is None:
+        max_workers = 16
+    pool = _PATH_POOL.get(max_workers)
+    if pool is None:
+        for old_pool in _PATH_POOL.values():
+            old_pool.shutdown(wait=False)
+        _PATH_POOL.clear()
+        pool = ThreadPoolExecutor(max_workers=max_workers,
+                                  thread_name_prefix='check_paths')
+        _PATH_POOL[max_workers] = pool
+    return pool
+
+
+def _resolve_path(path_check: PathCheck)->Union[Path, Exception]:
+    '''Build the full path for one path check.
+    Arguments:
+        path_check {PathCheck} -- The file name, valid file types, must exist
+            flag and base path.
+    Returns:
+        Union[Path, Exception] -- The full path or the error raised.
+    '''
+    file_name, _, _, base_path = path_check
+    try:
+        return get_file_path(file_name=file_name, base_path=base_path)
+    except (TypeError, ValueError, OSError) as err:
+        return err
+
+
+def _path_status(full_path: Path)->Tuple[bool, bool]:
+    '''Check whether a path exists and whether it is a directory.
+    Arguments:
+        full_path {Path} -- The path to check.
+    Returns:
+        Tuple[bool, bool] -- (exists, is_dir)
+    '''
+    if os.path.isdir(full_path):
+        return True, True
+    return os.path.exists(full_path), False
+
+
+def _list_directory(directory: Path)->Optional[Dict[str, bool]]:
+    '''List a directory, recording which items are directories.
+    Arguments:
+        directory {Path} -- The directory to list.
+    Returns:
+        Optional[Dict[str, bool]] -- True for sub-directories, False for
+            other items, indexed by the case-normalized item name. None if
+            the directory can not be read.
+    '''
+    try:
+        with os.scandir(directory) as items:
+            return {os.path.normcase(item.name): item.is_dir()
+                    for item in items}
+    except OSError:
+        return None
+
+
+def check_paths(path_checks: List[PathCheck],
+                max_workers: int = None)->List[Union[Path, Exception]]:
+    '''Build and check a group of full paths.
+    This gives the same results as calling make_full_path for each path
+    check, but each parent directory shared by more than one of the paths
+    is listed only once and, for PARALLEL_PATH_CHECKS or more paths, the
+    file system is accessed from a thread pool.  Threads help when file
+    system access is slow (e.g. network drives); for a few local paths the
+    checks are done in sequence.
+    Arguments:
+        path_checks {List[PathCheck]} -- The make_full_path arguments for
+            each path: (file_name, valid_types, must_exist, base_path).
+        max_workers {int, optional} -- The number of threads to use.
+            The thread pool is kept for later calls and is only replaced if
+            a different number of threads is requested. Default is 16.
+            If 0, no threads are used.
+    Returns:
+        List[Union[Path, Exception]] -- For each path check, the full path,
+            or the FileTypeError or FileNotFoundError that make_full_path
+            would raise.
+    '''
+    if not path_checks:
+        return list()
+    if max_workers == 0 or len(path_checks) < PARALLEL_PATH_CHECKS:
+        map_function = map
+    else:
+        map_function = _get_path_pool(max_workers).map
+    full_paths = list(map_function(_resolve_path, path_checks))
+    valid_paths = [path for path in full_paths if isinstance(path, Path)]
+    parent_count = Counter(path.parent for path in valid_paths)
+    shared_parents = [parent for parent, count in parent_count.items()
+                      if count > 1]
+    listings = dict(zip(shared_parents,
+                        map_function(_list_directory, shared_parents)))
+    single_paths = list({path for path in valid_paths
+                         if listings.get(path.parent) is None})
+    statuses = dict(zip(single_paths,
+                        map_function(_path_status, single_paths)))
+    results = list()
+    for (_, valid_types, must_exist, _), full_path in zip(path_checks,
+                                                          full_paths):
+        if not isinstance(full_path, Path):
+            results.append(full_path)
+            continue
+        listing = listings.get(full_path.parent)
+        if listing is None:
+            exists, is_dir = statuses[full_path]
+        else:
+            item_name = os.path.normcase(full_path.name)
+            exists = item_name in listing
+            is_dir = listing.get(item_name, False)
+        if must_exist and not exists:
+            msg = 'The file path must refer to an existing file'
+            results.append(FileNotFoundError(msg))
+        elif not valid_types.check_type(full_path, must_exist, is_dir):
+            msg = '{} is not a valid file type.'.format(full_path)
+            results.append(FileTypeError(msg))
+        else:
+            results.append(full_path)
+    return results
+
+
 def replace_top_dir(dir_path: Path, file_path: Path, new_name: str)-> str:
     ''' Replace the first portion of the file path.
     Arguments:
@@ -330,5 +692,1032 @@ def dir_iter(directory_to_scan: Path, sub_dir: str = None,
                 yield file_item
         elif file_item.is_dir():
             # recursively scan sub-directories
-            for sub_file_item in dir_iter(file_item, file_type):
+            for sub_file_item in dir_iter(file_item, file_type=file_type):
                 yield sub_file_item
+
+
+def _scan_directory(scan_dir: str)->Tuple[List[tuple], List[str]]:
+    '''Collect the metadata for the files in a single directory.
+    The stat results are taken from the os.DirEntry objects, so each file
+    is only queried once.
+    Arguments:
+        scan_dir {str} -- The directory to scan.
+    Returns:
+        A tuple containing:
+            A list of (path, parent, stem, suffix, size, mtime) tuples, one
+                for each file in scan_dir.
+            A list of the sub-directories in scan_dir.
+    '''
+    file_records = list()
+    sub_dirs = list()
+    try:
+        with os.scandir(scan_dir) as dir_entries:
+            for entry in dir_entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        sub_dirs.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        (stem, suffix) = os.path.splitext(entry.name)
+                        file_records.append((entry.path, scan_dir, stem,
+                                             suffix, stat.st_size,
+                                             stat.st_mtime))
+                except OSError:
+                    # The file was removed or is not accessible; skip it.
+                    continue
+    except (PermissionError, FileNotFoundError):
+        pass
+    return file_records, sub_dirs
+
+
+def file_info_table(directory_to_scan: PathInput, sub_dir: str = None,
+                    base_path: Path = None,
+                    file_type: Union[FileTypes, str, List[str]] = None,
+                    max_workers: int = None)->Data:
+    '''Collect the metadata for all files in a directory tree as a table.
+    The directory tree is walked once using os.scandir, with the individual
+    directories scanned concurrently in a thread pool.
+    Arguments:
+        directory_to_scan {PathInput} -- The top directory to scan for files.
+        sub_dir {str} -- A string containing the directory path from the base
+            path to the file location.
+        base_path {Path} -- A path to the top directory where files may be
+            located.
+        file_type {Optional, FileTypes, str, List[str]} -- The file type
+            group(s) to include. Default is all file types.
+        max_workers {Optional, int} -- The maximum number of threads used to
+            scan directories. Default is the ThreadPoolExecutor default.
+    Returns {pd.DataFrame}:
+        A table with one row for each file, containing the columns:
+            path {str} -- The full path to the file.
+            parent {category} -- The directory containing the file.
+            stem {str} -- The file name without the suffix.
+            suffix {category} -- The file extension including the '.'.
+            size {int64} -- The file size in bytes.
+            mtime {datetime64} -- The file modification time in local
+                time, as reported by get_file_mod_time.
+            file_type {category} -- The name of the FileTypes group that the
+                file belongs to.
+    '''
+    if isinstance(file_type, FileTypes):
+        type_selection = file_type
+    elif file_type is None:
+        type_selection = FileTypes()
+    else:
+        type_selection = FileTypes(file_type)
+    scan_dir_path = get_file_path(directory_to_scan, sub_dir, base_path)
+    file_records = list()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_scan_directory, str(scan_dir_path))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for scan in done:
+                dir_records, sub_dirs = scan.result()
+                file_records.extend(dir_records)
+                for dir_name in sub_dirs:
+                    pending.add(executor.submit(_scan_directory, dir_name))
+    columns = ['path', 'parent', 'stem', 'suffix', 'size', 'mtime']
+    file_table = pd.DataFrame.from_records(file_records, columns=columns)
+    suffix_group = {suffix: type_selection.type_group(suffix)
+                    for suffix in file_table['suffix'].unique()}
+    file_table['file_type'] = file_table['suffix'].map(suffix_group)
+    if not type_selection.all_types:
+        file_table = file_table[file_table['suffix'].str.lower().isin(
+            type_selection.type_select)]
+    file_table = file_table.assign(
+        size=file_table['size'].astype('int64'),
+        mtime=pd.to_datetime(file_table['mtime'], unit='s', utc=True
+                             ).dt.tz_convert(tzlocal()).dt.tz_localize(None),
+        parent=file_table['parent'].astype('category'),
+        suffix=file_table['suffix'].astype('category'),
+        file_type=file_table['file_type'].astype('category'))
+    file_table = file_table.sort_values('path')
+    return file_table.reset_index(drop=True)
+
+
+def _hash_file(file_path: Path, block_size: int = 65536,
+               partial: bool = False)->str:
+    '''Calculate a content hash for a file.
+    Arguments:
+        file_path {Path} -- The path to the file.
+        block_size {int} -- The number of bytes read at a time.
+        partial {bool} -- If True only the first and last blocks of the file
+            are hashed. Default is False.
+    Returns:
+        str -- The hexadecimal hash digest.
+    '''
+    file_hash = hashlib.blake2b()
+    with open(str(file_path), 'rb') as file:
+        if partial:
+            file_hash.update(file.read(block_size))
+            file.seek(0, os.SEEK_END)
+            file_size = file.tell()
+            if file_size > block_size:
+                file.seek(max(file_size - block_size, block_size))
+                file_hash.update(file.read(block_size))
+        else:
+            for block in iter(lambda: file.read(block_size), b''):
+                file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def find_duplicates(directory_to_scan: PathInput, sub_dir: str = None,
+                    base_path: Path = None,
+                    file_type: Union[FileTypes, str, List[str]] = None,
+                    block_size: int = 65536, min_size: int = 1,
+                    max_workers: int = None)->List[List[Path]]:
+    '''Find groups of files with identical content in a directory tree.
+    Files are compared in three stages so that most files are never read:
+        1. Files are grouped by size.
+        2. Files with a matching size are grouped by a hash of their first
+            and last blocks.
+        3. The remaining candidates are grouped by a hash of their full
+            content, calculated in a process pool.
+    Files no larger than two blocks are completely covered by the partial
+    hash and are not read a second time.
+    Because a process pool is used, on Windows this must be called from
+    within an `if __name__ == '__main__':` block.
+    Arguments:
+        directory_to_scan {PathInput} -- The top directory to scan for files.
+        sub_dir {str} -- A string containing the directory path from the base
+            path to the file location.
+        base_path {Path} -- A path to the top directory where files may be
+            located.
+        file_type {Optional, FileTypes, str, List[str]} -- A file type
+            group name, a FileTypes selection, or a list of suffixes as
+            used by dir_iter. Default is all file types.
+        block_size {int} -- The number of bytes in the blocks used for
+            partial hashing. Default is 64 kB.
+        min_size {int} -- Files smaller than this (in bytes) are ignored.
+            Default is 1, which excludes empty files.
+        max_workers {Optional, int} -- The maximum number of processes used
+            for full content hashing. Default is the number of processors.
+    Returns {List[List[Path]]}:
+        A list of duplicate groups. Each group is a sorted list of the paths
+        to files with identical content.
+    '''
+    if isinstance(file_type, str):
+        file_type = FileTypes(file_type)
+    # Stage 1: group by file size.
+    size_groups = dict()  # type: Dict[int, List[Path]]
+    for file_path in dir_iter(directory_to_scan, sub_dir, base_path,
+                              file_type):
+        try:
+            file_size = file_path.stat().st_size
+        except OSError:
+            continue
+        if file_size >= min_size:
+            size_groups.setdefault(file_size, list()).append(file_path)
+    # Stage 2: group by a hash of the first and last blocks.
+    partial_groups = dict()  # type: Dict[tuple, List[Path]]
+    for file_size, group in size_groups.items():
+        if len(group) < 2:
+            continue
+        for file_path in group:
+            try:
+                partial_hash = _hash_file(file_path, block_size, partial=True)
+            except OSError:
+                continue
+            key = (file_size, partial_hash)
+            partial_groups.setdefault(key, list()).append(file_path)
+    duplicates = list()
+    candidates = list()  # type: List[Tuple[int, Path]]
+    for (file_size, partial_hash), group in partial_groups.items():
+        if len(group) < 2:
+            continue
+        if file_size <= 2 * block_size:
+            duplicates.append(group)
+        else:
+            candidates.extend((file_size, file_path) for file_path in group)
+    # Stage 3: group the remaining candidates by a full content hash.
+    if candidates:
+        full_groups = dict()  # type: Dict[tuple, List[Path]]
+        candidate_paths = [file_path for (file_size, file_path) in candidates]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            full_hashes = executor.map(_hash_file, candidate_paths,
+                                       [block_size]*len(candidates))
+            for (file_size, file_path), full_hash in zip(candidates,
+                                                         full_hashes):
+                key = (file_size, full_hash)
+                full_groups.setdefault(key, list()).append(file_path)
+        duplicates.extend(group for group in full_groups.values()
+                          if len(group) > 1)
+    return sorted(sorted(group) for group in duplicates)
+
+
+def build_file_re()->Pattern:
+    '''Compile a regular expression for parsing a dir file line.
+    Parses file data in the format:
+        date  time  file size file name
+    eg:
+        07/03/2017  09:45          29274112 Course Planning.one
+        2016-04-21  02:06 PM              3491 xcopy.txt
+    Allows for the following date and time formats
+    Short date
+        yyyy-MM-dd, dd/MM/yyyy, dd/MM/yy, d/M/yy, yy-MM-dd, M/dd/yy,
+        dd-MMM-yy
+    Long date
+        MMMM d, yyyy, dddd, MMMM dd, yyyy, MMMM-dd-yy, d-MMM-yy
+    Long time
+        h:mm:ss tt, hh:mm:ss tt, HH:mm:ss, H:mm:ss
+    Short Time
+        h:mm tt, hh:mm tt, HH:mm tt, H:mm
+    Returns:
+        The compiled regular expression with the groups:
+            date, time, size, name, ext
+    '''
+    pattern = (
+        r'^'                 # beginning of string
+        r'(?P<date>'         # beginning of date string group
+         r'[a-zA-Z0-9]+'     # Month Day or year as a number or text
+         r'[\s,-/]{1,2}'     # Date delimiter one of '-' '/' or ', '
+         r'[a-zA-Z0-9]+'     # Month Day or year as a number or text
+         r'[\s,-/]{1,2}'     # Date delimiter one of '-' '/' or ', '
+         r'\d{2,4}'          # day or year as a number
+         r'((?<=, )\d{2,4})?'# Additional year section if the day name was included
+        r')'                 # end of date string group
+        r'\s+'               # gap between date and time
+        r'(?P<time>'         # beginning of time string group
+         r'\d{1,2}'          # Hour as 1 or 2 digits
+         r':'                # Time delimiter
+         r'\d{1,2}'          # Minutes as 1 or 2 digits
+         r':?'               # Time delimiter
+         r'\d{0,2}'          # Seconds (optional) as 0,  1 or 2 digits
+         r'\s?'              # possible space separating time from AM/PM indicator
+         r'[aApPmM]{0,2}'    # possible AM/PM in upper or lower case
+        r')'                 # end of time string group
+        r'\s+'               # space between date & time and file size
+        r'(?P<size>[\d,]+)'  # file size as digits, possibly with commas
+        r'\s+'               # space between file size and file name
+        r'(?P<name>.+?)'     # File name (group)
+        r'(?P<ext>[.]\w*)?'  # Optional extension including '.' (group)
+        r'\s*$'              # end of string
+        )
+    file_re_p = re.compile(pattern)
+    return file_re_p
+
+
+def build_summary_re()->Pattern:
+    '''Compile a regular expression for parsing a dir summary line.
+    eg:
+                   2 File(s)         32,765 bytes
+    Returns:
+        The compiled regular expression with the groups:
+            num_files, size
+    '''
+    num_files_pattern = (
+        r'^'                # beginning of string
+        r'\s*'              # possible initial white space
+        r'(?P<num_files>'   # beginning of number of files string group
+        r'[\d,]+'           # Digits and comma to form an integer
+        r')'                # end of number of files string group
+        r'\s+'              # gap between number and text
+        r'File\(s\)'        # Files delimiter
+        )
+    size_pattern = (
+        r'\s+'              # gap between number of files and dir size
+        r'(?P<size>'        # beginning of dir size string group
+        r'[\d,]+'           # Digits and comma to form an integer
+        r')'                # end of dir size string group
+        r'\s+'              # gap between number and text
+        r'bytes'            # dir size delimiter
+        r'\s*'              # ending white space
+        r'$'                # end of string
+        )
+    summary_re = re.compile(num_files_pattern + size_pattern)
+    return summary_re
+
+
+def build_directory_re()->Pattern:
+    '''Compile a regular expression for parsing a dir directory header line.
+    eg:
+         Directory of C:\\Users\\Greg\\Documents
+    Returns:
+        The compiled regular expression with the group:
+            directory
+    '''
+    pattern = (
+        r'^'                   # beginning of string
+        r'\s*'                 # possible initial white space
+        r'Directory of\s+'     # Directory header text
+        r'(?P<directory>.+?)'  # Directory path (group)
+        r'\s*$'                # end of string
+        )
+    return re.compile(pattern)
+
+
+FILE_RE = build_file_re()
+SUMMARY_RE = build_summary_re()
+DIRECTORY_RE = build_directory_re()
+TOTAL_MARKER = 'Total Files Listed:'
+# The strftime forms of the date and time formats accepted by FILE_RE.  They
+# are tried in order by infer_date_format.
+LISTING_DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%d/%m/%y',
+                        '%m/%d/%y', '%y-%m-%d', '%d-%b-%y', '%B %d, %Y',
+                        '%A, %B %d, %Y', '%B-%d-%y']
+LISTING_TIME_FORMATS = ['%I:%M %p', '%I:%M%p', '%I:%M:%S %p', '%H:%M:%S',
+                        '%H:%M']
+
+
+def parse_listing_chunk(lines: List[str])->Tuple[List[tuple], List[tuple],
+                                                 str]:
+    '''Parse a block of lines from a Windows "dir" listing.
+    Lines before the first "Directory of" header in the block are given a
+    directory of None, so that blocks can be parsed independently and the
+    directory context filled in from the preceding block afterwards.
+    Arguments:
+        lines {List[str]} -- The lines of the listing to parse.
+    Returns:
+        A tuple containing:
+            A list of (directory, date, time, size, name, ext) tuples, one for
+                each file line.
+            A list of (directory, num_files, size) tuples, one for each
+                summary line.  Summary lines following the
+                "Total Files Listed:" line have a directory of TOTAL_MARKER.
+            The directory context at the end of the block, or None if the
+                block does not contain a "Directory of" header.
+    '''
+    file_records = list()
+    summary_records = list()
+    directory = None
+    file_match = FILE_RE.match
+    summary_match = SUMMARY_RE.match
+    directory_match = DIRECTORY_RE.match
+    for line in lines:
+        found = file_match(line)
+        if found:
+            (date, time_str, size, name, ext) = found.group(
+                'date', 'time', 'size', 'name', 'ext')
+            file_records.append((directory, date, time_str.strip(),
+                                 int(size.replace(',', '')), name,
+                                 ext or ''))
+            continue
+        found = summary_match(line)
+        if found:
+            summary_records.append(
+                (directory, int(found.group('num_files').replace(',', '')),
+                 int(found.group('size').replace(',', ''))))
+            continue
+        found = directory_match(line)
+        if found:
+            directory = found.group('directory')
+        elif TOTAL_MARKER in line:
+            directory = TOTAL_MARKER
+    return file_records, summary_records, directory
+
+
+def _read_chunks(listing_file: Path, chunk_lines: int,
+                 encoding: str = None)->Iterator[List[str]]:
+    '''Read a text file in blocks of lines.
+    Arguments:
+        listing_file {Path} -- The file to read.
+        chunk_lines {int} -- The number of lines in each block.
+        encoding {str} -- The text encoding of the file. Default is the
+            system default.
+    Returns {Iterator[List[str]]}:
+        An iterator through the blocks of lines.
+    '''
+    with open(str(listing_file), 'r', encoding=encoding,
+              errors='replace') as listing:
+        # Always yield the first block, so that an empty file produces
+        # empty tables.
+        chunk = list(islice(listing, chunk_lines))
+        yield chunk
+        while chunk:
+            chunk = list(islice(listing, chunk_lines))
+            if chunk:
+                yield chunk
+
+
+def _parsed_chunks(listing_file: Path, chunk_lines: int, max_workers: int,
+                   encoding: str = None)->Iterator[Tuple[List[tuple],
+                                                         List[tuple], str]]:
+    '''Parse the blocks of a listing file, in order.
+    If max_workers is greater than 0, the blocks are parsed in a process
+    pool, with at most twice max_workers blocks held in memory at a time.
+    '''
+    chunks = _read_chunks(listing_file, chunk_lines, encoding)
+    if not max_workers:
+        for chunk in chunks:
+            yield parse_listing_chunk(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(parse_listing_chunk, chunk))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def infer_date_format(date_strings: pd.Series,
+                      candidates: List[str] = None)->List[str]:
+    '''Find the listing date formats that match all of the date strings.
+    Each of candidates is tried in order.  A format that reads the strings
+    as the same dates as an earlier matching format is left out, so more
+    than one returned format means that the dates are ambiguous.  For
+    example, dates with no day greater than 12 fit both dd/MM and MM/dd.
+    Arguments:
+        date_strings {pd.Series} -- The combined "date time" strings.
+        candidates {List[str], optional} -- The formats to try.  Default is
+            None, which tries every combination of LISTING_DATE_FORMATS and
+            LISTING_TIME_FORMATS.
+    Raises:
+        ValueError -- If none of the formats match all of the strings.
+    Returns:
+        List[str] -- The strftime formats that match the date strings.
+    '''
+    if candidates is None:
+        candidates = [date_part + ' ' + time_part
+                      for date_part in LISTING_DATE_FORMATS
+                      for time_part in LISTING_TIME_FORMATS]
+    samples = date_strings.drop_duplicates()
+    matching = list()
+    readings = list()
+    for date_format in candidates:
+        try:
+            dates = pd.to_datetime(samples, format=date_format)
+        except ValueError:
+            continue
+        if not any(dates.equals(reading) for reading in readings):
+            matching.append(date_format)
+            readings.append(dates)
+    if not matching:
+        msg = 'Unable to infer the date format of "{}". Use date_format to ' \
+              'supply it.'.format(samples.iloc[0])
+        raise ValueError(msg)
+    return matching
+
+
+def _typed_listing_tables(file_table: pd.DataFrame,
+                          summary_table: pd.DataFrame,
+                          date_strings: pd.Series,
+                          date_format: str)->ListingTables:
+    '''Convert the parsed listing records of one block to typed tables.
+    Arguments:
+        file_table {pd.DataFrame} -- The parsed file records.
+        summary_table {pd.DataFrame} -- The parsed summary records.
+        date_strings {pd.Series} -- The combined "date time" strings.
+        date_format {str} -- The strftime format of date_strings.
+    Raises:
+        ValueError -- If a file date does not match the date format.
+    Returns {Tuple[pd.DataFrame, pd.DataFrame]}:
+        The file table and the summary table. See iter_dir_listing for the
+        table columns.
+    '''
+    modified = pd.to_datetime(date_strings, format=date_format,
+                              errors='coerce')
+    failed = modified.isna()
+    if failed.any():
+        msg = 'The date "{}" does not match the date format "{}".'.format(
+            date_strings[failed].iloc[0], date_format)
+        raise ValueError(msg)
+    file_table = pd.DataFrame({
+        'directory': file_table['directory'].astype('category'),
+        'name': file_table['name'],
+        'ext': file_table['ext'].astype('category'),
+        'size': file_table['size'].astype('int64'),
+        'modified': modified})
+    is_total = summary_table['directory'] == TOTAL_MARKER
+    summary_table = pd.DataFrame({
+        'directory': summary_table['directory'].mask(is_total),
+        'num_files': summary_table['num_files'].astype('int64'),
+        'size': summary_table['size'].astype('int64'),
+        'total': is_total})
+    return file_table, summary_table
+
+
+def iter_dir_listing(listing_file: PathInput, chunk_lines: int = 100000,
+                     max_workers: int = 0, date_format: str = None,
+                     encoding: str = None)->Iterator[ListingTables]:
+    '''Parse a Windows "dir" listing file in chunks, yielding typed tables.
+    The listing is read in blocks of lines, so the whole file is never held
+    in memory.  The directory context and the date format are carried from
+    one block to the next.
+    When the date format is inferred and the dates read so far fit more
+    than one format (e.g. dd/MM and MM/dd when no day is greater than 12),
+    the blocks are held back until a later date settles the format.  Give
+    date_format to avoid holding blocks back.
+    Arguments:
+        listing_file {PathInput} -- The path to the "dir" output text file.
+        chunk_lines {int} -- The number of lines parsed at a time.
+            Default is 100000.
+        max_workers {int} -- The number of processes used to parse blocks.
+            If 0, the blocks are parsed in the calling process.  Default is 0.
+            On Windows a value greater than 0 requires the call to be made
+            within an `if __name__ == '__main__':` block.
+        date_format {str} -- The strftime format of the combined
+            "date time" strings. Default is None, which infers the format
+            from the file dates (see infer_date_format).
+        encoding {str} -- The text encoding of the listing file.
+            Default is the system default.
+    Returns {Iterator[Tuple[pd.DataFrame, pd.DataFrame]]}:
+        An iterator of (file table, summary table) pairs, one for each block.
+        The file table contains the columns:
+            directory, name, ext, size, modified
+        The summary table contains the columns:
+            directory, num_files, size, total
+            total is True for the grand total summary.
+    Raises:
+        ValueError -- If a file date does not match the date format, or if
+            the date format is inferred and the dates of the whole listing
+            fit more than one format.
+    '''
+    file_columns = ['directory', 'date', 'time', 'size', 'name', 'ext']
+    summary_columns = ['directory', 'num_files', 'size']
+    directory = None
+    candidates = None
+    pending = list()
+    listing_path = get_file_path(listing_file)
+    for file_records, summary_records, last_directory in _parsed_chunks(
+            listing_path, chunk_lines, max_workers, encoding):
+        file_table = pd.DataFrame.from_records(file_records,
+                                               columns=file_columns)
+        summary_table = pd.DataFrame.from_records(summary_records,
+                                                  columns=summary_columns)
+        file_table['directory'] = file_table['directory'].fillna(directory)
+        summary_table['directory'] = summary_table['directory'].fillna(
+            directory)
+        if last_directory is not None:
+            directory = last_directory
+        date_strings = file_table['date'] + ' ' + file_table['time']
+        if date_format is None and len(date_strings):
+            candidates = infer_date_format(date_strings, candidates)
+            if len(candidates) == 1:
+                date_format = candidates[0]
+        pending.append((file_table, summary_table, date_strings))
+        if date_format is None:
+            continue
+        for parsed_tables in pending:
+            yield _typed_listing_tables(*parsed_tables, date_format)
+        pending = list()
+    if date_format is None and candidates:
+        msg = 'The listing dates fit more than one format: {}. Use ' \
+              'date_format to choose one.'.format(', '.join(candidates))
+        raise ValueError(msg)
+    for parsed_tables in pending:
+        yield _typed_listing_tables(*parsed_tables, date_format)
+
+
+def read_dir_listing(listing_file: PathInput, chunk_lines: int = 100000,
+                     max_workers: int = 0, date_format: str = None,
+                     encoding: str = None)->ListingTables:
+    '''Parse a Windows "dir" listing file into file and summary tables.
+    Arguments:
+        listing_file {PathInput} -- The path to the "dir" output text file.
+        chunk_lines {int} -- The number of lines parsed at a time.
+            Default is 100000.
+        max_workers {int} -- The number of processes used to parse blocks.
+            If 0, the blocks are parsed in the calling process.  Default is 0.
+        date_format {str} -- The strftime format of the combined
+            "date time" strings. Default is None, which infers the format
+            from the file dates (see iter_dir_listing).
+        encoding {str} -- The text encoding of the listing file.
+            Default is the system default.
+    Returns {Tuple[pd.DataFrame, pd.DataFrame]}:
+        The file table and the summary table. See iter_dir_listing for the
+        table columns.
+    '''
+    file_tables = list()
+    summary_tables = list()
+    for file_table, summary_table in iter_dir_listing(
+            listing_file, chunk_lines, max_workers, date_format, encoding):
+        file_tables.append(file_table)
+        summary_tables.append(summary_table)
+    file_table = pd.concat(file_tables, ignore_index=True)
+    summary_table = pd.concat(summary_tables, ignore_index=True)
+    file_table['directory'] = file_table['directory'].astype('category')
+    file_table['ext'] = file_table['ext'].astype('category')
+    return file_table, summary_table
+
+
+def dir_listing_to_csv(listing_file: PathInput, output_file: PathInput,
+                       summary_file: PathInput = None,
+                       chunk_lines: int = 100000, max_workers: int = 0,
+                       date_format: str = None, encoding: str = None)->int:
+    '''Parse a Windows "dir" listing file, writing the results to csv files.
+    Each parsed block is appended to the output files as soon as it is
+    available, so memory use does not grow with the size of the listing.
+    Arguments:
+        listing_file {PathInput} -- The path to the "dir" output text file.
+        output_file {PathInput} -- The csv file to write the file table to.
+        summary_file {PathInput} -- The csv file to write the summary table
+            to. Default is None, which does not save the summary lines.
+        chunk_lines {int} -- The number of lines parsed at a time.
+            Default is 100000.
+        max_workers {int} -- The number of processes used to parse blocks.
+            If 0, the blocks are parsed in the calling process.  Default is 0.
+        date_format {str} -- The strftime format of the combined
+            "date time" strings. Default is None, which infers the format
+            from the file dates (see iter_dir_listing).
+        encoding {str} -- The text encoding of the listing file.
+            Default is the system default.
+    Returns:
+        int -- The number of file lines written.
+    '''
+    output_path = get_file_path(output_file)
+    summary_path = get_file_path(summary_file) if summary_file else None
+    num_files = 0
+    write_header = True
+    for file_table, summary_table in iter_dir_listing(
+            listing_file, chunk_lines, max_workers, date_format, encoding):
+        write_mode = 'w' if write_header else 'a'
+        file_table.to_csv(str(output_path), mode=write_mode,
+                          header=write_header, index=False)
+        if summary_path:
+            summary_table.to_csv(str(summary_path), mode=write_mode,
+                                 header=write_header, index=False)
+        num_files += len(file_table)
+        write_header = False
+    return num_files
+
+
+class FileEvent(NamedTuple):
+    '''A change to a file in a watched directory.
+    Attributes
+        event_type: {str} -- One of 'created', 'modified' or 'deleted'.
+        path: {Path} -- The full path to the file.
+    '''
+    event_type: str
+    path: Path
+
+
+# How a new event combines with an event already pending for the same file.
+# None means the two events cancel.
+EVENT_MERGE = {('created', 'modified'): 'created',
+               ('created', 'deleted'): None,
+               ('modified', 'created'): 'modified',
+               ('modified', 'deleted'): 'deleted',
+               ('deleted', 'created'): 'modified',
+               ('deleted', 'modified'): 'modified'}
+
+
+def _file_snapshot(watch_dir: Path,
+                   file_type: FileTypes)->Dict[str, Tuple[int, int]]:
+    '''Return the size and modification time of every matching file.
+    Arguments:
+        watch_dir {Path} -- The top of the directory tree to scan.
+        file_type {FileTypes} -- The file types to include.
+    Returns:
+        Dict[str, Tuple[int, int]] -- The size and modification time in
+            nanoseconds, indexed by the full file path.
+    '''
+    snapshot = dict()
+    for dir_path, _, file_names in os.walk(str(watch_dir)):
+        for file_name in file_names:
+            if not file_type.valid_extension(os.path.splitext(file_name)[1]):
+                continue
+            file_path = os.path.join(dir_path, file_name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            snapshot[file_path] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class _PollingBackend():
+    '''Detect file changes by comparing directory snapshots.
+    '''
+    def __init__(self, watch_dir: Path, file_type: FileTypes,
+                 poll_interval: float):
+        self.watch_dir = watch_dir
+        self.file_type = file_type
+        self.poll_interval = poll_interval
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot(self)->Dict[str, Tuple[int, int]]:
+        '''Return the size and modification time of every matching file.
+        '''
+        return _file_snapshot(self.watch_dir, self.file_type)
+
+    def read_events(self, timeout: float)->List[FileEvent]:
+        '''Wait up to one poll interval and return the changes found.
+        '''
+        time.sleep(min(timeout, self.poll_interval))
+        snapshot = self.take_snapshot()
+        old_snapshot = self.snapshot
+        self.snapshot = snapshot
+        events = [FileEvent('deleted', Path(file_path))
+                  for file_path in old_snapshot.keys() - snapshot.keys()]
+        for file_path, file_stat in snapshot.items():
+            old_stat = old_snapshot.get(file_path)
+            if old_stat is None:
+                events.append(FileEvent('created', Path(file_path)))
+            elif old_stat != file_stat:
+                events.append(FileEvent('modified', Path(file_path)))
+        return events
+
+    def close(self):
+        '''Nothing to release.
+        '''
+        pass
+
+
+class _InotifyBackend():
+    '''Receive file changes from the Linux inotify interface.
+    The matching files in the tree are tracked, so that the files in a
+    directory that is moved away can be reported as deleted, and so that the
+    changes lost when the event queue overflows can be found by scanning
+    the tree again.
+    '''
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE)
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, watch_dir: Path, file_type: FileTypes):
+        self.watch_dir = watch_dir
+        self.file_type = file_type
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches = dict()  # type: Dict[int, str]
+        try:
+            for dir_path, _, _ in os.walk(str(watch_dir)):
+                self.add_watch(dir_path)
+        except OSError:
+            self.close()
+            raise
+        # The size and modification time of the matching files when the
+        # tree was last scanned; None for files changed since then.
+        self.files = _file_snapshot(watch_dir, file_type)
+
+    def add_watch(self, dir_path: str):
+        '''Start watching a directory.
+        '''
+        watch = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path),
+                                            self.WATCH_MASK)
+        if watch < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), dir_path)
+        self.watches[watch] = dir_path
+
+    def remove_watch(self, watch: int):
+        '''Stop watching a directory.
+        The kernel has already removed the watch if the directory was
+        deleted, so errors are ignored.
+        '''
+        self.libc.inotify_rm_watch(self.fd, watch)
+        self.watches.pop(watch, None)
+
+    def record(self, event: FileEvent):
+        '''Update the tracked files for a file event.
+        '''
+        file_path = str(event.path)
+        if event.event_type == 'deleted':
+            self.files.pop(file_path, None)
+        elif self.file_type.valid_extension(event.path.suffix):
+            self.files[file_path] = None
+
+    def add_new_dir(self, dir_path: str)->List[FileEvent]:
+        '''Watch a newly created directory tree.
+        Files created before the watch was in place are reported as created.
+        '''
+        events = list()
+        for new_dir, _, file_names in os.walk(dir_path):
+            self.add_watch(new_dir)
+            events.extend(FileEvent('created',
+                                    Path(os.path.join(new_dir, file_name)))
+                          for file_name in file_names)
+        for event in events:
+            self.record(event)
+        return events
+
+    def remove_dir(self, dir_path: str)->List[FileEvent]:
+        '''Stop watching a directory tree that was deleted or moved away.
+        The tracked files in the tree are reported as deleted.
+        '''
+        dir_prefix = os.path.join(dir_path, '')
+        for watch, watched_dir in list(self.watches.items()):
+            if watched_dir == dir_path or watched_dir.startswith(dir_prefix):
+                self.remove_watch(watch)
+        removed = [file_path for file_path in self.files
+                   if file_path.startswith(dir_prefix)]
+        for file_path in removed:
+            del self.files[file_path]
+        return [FileEvent('deleted', Path(file_path))
+                for file_path in removed]
+
+    def rescan(self)->List[FileEvent]:
+        '''Find the changes lost when the event queue overflowed.
+        Directories added since the last scan are watched and the watches
+        of directories that no longer exist are removed.  The tree is then
+        compared with the tracked files.  Files that changed since the last
+        scan are reported as modified, since later changes may have been
+        lost.
+        '''
+        tree_dirs = set()
+        watched_dirs = set(self.watches.values())
+        for dir_path, _, _ in os.walk(str(self.watch_dir)):
+            tree_dirs.add(dir_path)
+            if dir_path not in watched_dirs:
+                try:
+                    self.add_watch(dir_path)
+                except OSError:
+                    continue
+        for watch, watched_dir in list(self.watches.items()):
+            if watched_dir not in tree_dirs:
+                self.remove_watch(watch)
+        old_files = self.files
+        self.files = _file_snapshot(self.watch_dir, self.file_type)
+        events = [FileEvent('deleted', Path(file_path))
+                  for file_path in old_files.keys() - self.files.keys()]
+        for file_path, file_stat in self.files.items():
+            if file_path not in old_files:
+                events.append(FileEvent('created', Path(file_path)))
+            elif old_files[file_path] != file_stat:
+                events.append(FileEvent('modified', Path(file_path)))
+        return events
+
+    def read_events(self, timeout: float)->List[FileEvent]:
+        '''Wait up to timeout seconds and return the changes received.
+        If the event queue overflowed, the changes are found by scanning
+        the directory tree.
+        '''
+        (ready, _, _) = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return list()
+        buffer = os.read(self.fd, 65536)
+        events = list()
+        offset = 0
+        while offset < len(buffer):
+            (watch, mask, _, name_length) = self.EVENT_HEADER.unpack_from(
+                buffer, offset)
+            offset += self.EVENT_HEADER.size
+            name = buffer[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+            if mask & self.IN_Q_OVERFLOW:
+                events.extend(self.rescan())
+                continue
+            dir_path = self.watches.get(watch)
+            if mask & self.IN_IGNORED:
+                self.watches.pop(watch, None)
+                continue
+            if dir_path is None or not name:
+                continue
+            file_path = os.path.join(dir_path, os.fsdecode(name))
+            if mask & self.IN_ISDIR:
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    try:
+                        events.extend(self.add_new_dir(file_path))
+                    except OSError:
+                        continue
+                elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                    events.extend(self.remove_dir(file_path))
+                continue
+            if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                event_type = 'created'
+            elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                event_type = 'deleted'
+            else:
+                event_type = 'modified'
+            event = FileEvent(event_type, Path(file_path))
+            self.record(event)
+            events.append(event)
+        return events
+
+    def close(self):
+        '''Release the inotify file descriptor.
+        '''
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class DirectoryWatcher():
+    '''Watch a directory tree for debounced file changes.
+    On Linux the inotify interface is used; elsewhere, or if inotify is not
+    available, the directory tree is polled.
+    Changes to the same file are combined, and a batch of changes is only
+    returned once no new changes have been seen for the debounce period,
+    so a file being written is reported once, after it is complete.
+    Example:
+        with DirectoryWatcher(template_dir, file_type='Excel Files') as watcher:
+            for changes in watcher:
+                for event in changes:
+                    rescan(event.path)
+    '''
+    def __init__(self, directory_to_scan: PathInput, sub_dir: str = None,
+                 base_path: Path = None,
+                 file_type: Union[FileTypes, str, List[str]] = None,
+                 debounce: float = 0.5, poll_interval: float = 1.0,
+                 use_inotify: bool = None):
+        '''Start watching a directory tree.
+        Arguments:
+            directory_to_scan {PathInput} -- The top directory to watch.
+            sub_dir {str} -- A string containing the directory path from the
+                base path to the directory.
+            base_path {Path} -- A path to the top directory where files may
+                be located.
+            file_type {Optional, FileTypes, str, List[str]} -- The file type
+                group(s) to report changes for. Default is all file types.
+            debounce {float} -- The number of seconds without new changes
+                before a batch of changes is returned. Default is 0.5.
+            poll_interval {float} -- The number of seconds between directory
+                scans when polling. Default is 1.0.
+            use_inotify {bool} -- If True, inotify must be used; if False,
+                polling is always used. Default is None, which uses inotify
+                when it is available.
+        '''
+        if isinstance(file_type, FileTypes):
+            self.file_type = file_type
+        elif file_type is None:
+            self.file_type = FileTypes('All Files')
+        else:
+            self.file_type = FileTypes(file_type)
+        self.watch_dir = get_file_path(directory_to_scan, sub_dir, base_path)
+        self.debounce = debounce
+        self.closed = False
+        self.backend = None
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith('linux')
+            required = False
+        else:
+            required = use_inotify
+        if use_inotify:
+            try:
+                self.backend = _InotifyBackend(self.watch_dir, self.file_type)
+            except (OSError, AttributeError):
+                if required:
+                    raise
+        if self.backend is None:
+            self.backend = _PollingBackend(self.watch_dir, self.file_type,
+                                           poll_interval)
+
+    def is_selected(self, event: FileEvent)->bool:
+        '''True if the file in event is one of the selected file types.
+        '''
+        return self.file_type.valid_extension(event.path.suffix)
+
+    def next_batch(self, timeout: float = None)->List[FileEvent]:
+        '''Wait for and return the next batch of file changes.
+        Arguments:
+            timeout {float} -- The maximum number of seconds to wait for a
+                change. Default is None, which waits until a change occurs
+                or the watcher is closed.
+        Returns:
+            List[FileEvent] -- The combined file changes, in the order first
+                seen. An empty list if no changes occurred before timeout.
+        '''
+        pending = dict()  # type: Dict[Path, str]
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        while not self.closed:
+            if pending:
+                wait_time = self.debounce
+            elif timeout is None:
+                wait_time = 1.0
+            else:
+                wait_time = deadline - time.monotonic()
+                if wait_time <= 0:
+                    break
+            new_events = [event for event in self.backend.read_events(
+                wait_time) if self.is_selected(event)]
+            if not new_events:
+                if pending:
+                    break
+                continue
+            for event in new_events:
+                if event.path in pending:
+                    merge_key = (pending[event.path], event.event_type)
+                    event_type = EVENT_MERGE.get(merge_key, event.event_type)
+                    if event_type is None:
+                        del pending[event.path]
+                        continue
+                    pending[event.path] = event_type
+                else:
+                    pending[event.path] = event.event_type
+        return [FileEvent(event_type, path)
+                for path, event_type in pending.items()]
+
+    def __iter__(self)->Iterator[List[FileEvent]]:
+        '''Yield batches of file changes until the watcher is closed.
+        '''
+        while not self.closed:
+            changes = self.next_batch()
+            if changes:
+                yield changes
+
+    def close(self):
+        '''Stop watching the directory tree.
+        '''
+        self.closed = True
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -124,7 +124,10 @@ def ch_logger(logger: logging.Logger = None, level: str = 'DEBUG', prefix=__name
 
 def log_dict(logger: logging.Logger, dict_var: dict, text: str = None):
     '''Logger output dictionary values formatted
+    The dictionary is only formatted if debug messages are enabled.
     '''
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     var_list = ['{}:\t{}'.format(key,item) for key, item in dict_var.items()]
     var_str = '\n'.join(var_list)
     if text:
@@ -150,7 +150,7 @@ def get_data_sheet(workbook: xw.Book, sheet_name: str,
 
 
 def select_sheet(file_name: FileName, sub_dir: str = None,
-                 base_path: Path = None, new_file=False,
+                 base_path: Path = None, new_file=False, root: str = None,
                  **sheet_info)->xw.Sheet:
     '''Open the excel file specified by file_name and returns the requested
     sheet.
@@ -161,6 +161,8 @@ def select_sheet(file_name: FileName, sub_dir: str = None,
             working directory.
         base_path (Path): A full path of type Pathto the starting directory.
         new_file: True if a new book is to be created. Default is False.
+        root (str): The name of a PathResolver root to use as the starting
+            directory when base_path is not given. Default is the base root.
         sheet_name (str): The name of the desired worksheet.
         new_sheet (bool): If True, a new sheet will be created in the
             specified workbook if it does not already exist. Default is True.
@@ -170,14 +172,15 @@ def select_sheet(file_name: FileName, sub_dir: str = None,
     Returns:
         An XLWings Sheet object pointing to the requested sheet.
     '''
-    data_file_path = get_file_path(file_name, sub_dir, base_path)
+    data_file_path = get_file_path(file_name, sub_dir, base_path, root)
     data_book = open_book(data_file_path, new_file)
     data_sheet = get_data_sheet(data_book, **sheet_info)
     return data_sheet
 
 
 def create_output_file(file_name: FileName, sub_dir: str = None,
-                       base_path: Path = None, new_file=True)->xw.Book:
+                       base_path: Path = None, new_file=True,
+                       root: str = None)->xw.Book:
     '''Create an output spreadsheet.
     Args:
         file_name {FileName} --  A full Path or a string file name of an
@@ -186,12 +189,14 @@ def create_output_file(file_name: FileName, sub_dir: str = None,
             base_path to the excel file.
         base_path {Path} -- A full path of type Path to the top directory.
         new_file {bool} -- True if a new book is to be created. Default is False.
+        root {str} -- The name of a PathResolver root to use as the top
+            directory when base_path is not given. Default is the base root.
     Raises:
         FileNotFoundError
     Returns:
         An XLWings Book object pointing to the requested Excel workbook.
     '''
-    file_path = get_file_path(file_name, sub_dir, base_path)
+    file_path = get_file_path(file_name, sub_dir, base_path, root)
     workbook = open_book(file_path, new_file)
     workbook.save(str(file_path))
     return workbook